@@ -1,26 +1,28 @@
-from fastapi import Depends, HTTPException, status
+from typing import Any, Dict, List, Optional
+
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db, get_read_db
 from app.core.security import TokenPayload
 from app.models.user import User
-from app.repository.user import UserRepository
+from app.repository.user import AsyncUserRepository, UserRepository
+from app.repository.pagination import InvalidCursorError, decode_cursor, next_cursor
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/auth/login")
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+def _token_data(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
-        token_data = TokenPayload(**payload)
+        return TokenPayload(**payload)
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -28,9 +30,8 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user_repo = UserRepository(db)
-    user = user_repo.get(id=token_data.sub)
 
+def _require_user(user: Optional[User]) -> User:
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -39,12 +40,104 @@ def get_current_user(
     return user
 
 
-def get_current_verified_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
-    if not current_user.is_verified:
+def _require_verified(user: User) -> User:
+    if not user.is_verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Аккаунт не подтвержден. Пожалуйста, подтвердите свой email",
         )
-    return current_user
+    return user
+
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    token_data = _token_data(token)
+    user_repo = UserRepository(db)
+    return _require_user(user_repo.get(id=token_data.sub))
+
+
+def get_current_verified_user(
+    current_user: User = Depends(get_current_user),
+) -> User:
+    return _require_verified(current_user)
+
+
+async def get_async_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """get_current_user for async endpoints, loaded in the request's async session"""
+    token_data = _token_data(token)
+    user_repo = AsyncUserRepository(db)
+    return _require_user(await user_repo.get(id=token_data.sub))
+
+
+async def get_async_current_verified_user(
+    current_user: User = Depends(get_async_current_user),
+) -> User:
+    return _require_verified(current_user)
+
+
+class Pagination:
+    """
+    Page or cursor pagination parameters of list endpoints
+
+    ``page`` keeps working as before. Clients that follow ``next_cursor``
+    instead get keyset pagination, whose cost does not grow with the depth of
+    the page. ``count`` selects an exact total, the query planner's estimate
+    or none; cursor requests default to an estimate.
+    """
+
+    def __init__(
+        self,
+        page: int = Query(1, ge=1),
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = Query(
+            None, description="next_cursor of the previous page"
+        ),
+        count: Optional[str] = Query(
+            None,
+            pattern="^(exact|estimate|none)$",
+            description="Total to return: exact, estimate or none",
+        ),
+    ):
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except InvalidCursorError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Некорректный курсор пагинации",
+                )
+        self.page = page
+        self.limit = limit
+        self.cursor = cursor or None
+        self.count = count or ("estimate" if self.cursor else "exact")
+
+    @property
+    def skip(self) -> int:
+        return (self.page - 1) * self.limit
+
+    @property
+    def wants_total(self) -> bool:
+        return self.count != "none"
+
+    @property
+    def estimate(self) -> bool:
+        return self.count == "estimate"
+
+    def response(
+        self, items: List[Any], total: Optional[int], sort_attr: str
+    ) -> Dict[str, Any]:
+        pages = None
+        if total is not None:
+            pages = (total + self.limit - 1) // self.limit if total > 0 else 1
+        return {
+            "items": items,
+            "total": total,
+            "total_is_estimate": self.estimate and total is not None,
+            "page": self.page,
+            "limit": self.limit,
+            "pages": pages,
+            "next_cursor": next_cursor(items, self.limit, sort_attr),
+        }
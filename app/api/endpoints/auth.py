@@ -4,13 +4,15 @@ import secrets
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import ValidationError
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_async_db, get_db, get_current_user
 from app.core.config import settings
 from app.core.security import create_access_token, create_refresh_token
-from app.repository.user import UserRepository
+from app.repository.user import AsyncUserRepository, UserRepository
+from app.repository.unit_of_work import async_unit_of_work, unit_of_work
 from app.services.notification_service import NotificationService
 from app.schemas.auth import (
     Token,
@@ -26,24 +28,26 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=User)
-async def register(user_in: UserCreate, db: Session = Depends(get_db)) -> Any:
-    user_repo = UserRepository(db)
+async def register(
+    user_in: UserCreate, db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    user_repo = AsyncUserRepository(db)
 
-    if user_repo.get_by_email(email=user_in.email):
+    if await user_repo.get_by_email(email=user_in.email):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Пользователь с таким email уже существует",
         )
 
-    user = user_repo.create(obj_in=user_in)
-
     verification_code = "".join([str(secrets.randbelow(10)) for _ in range(6)])
 
-    user_repo.store_verification_code(
-        user_id=user.id,
-        code=verification_code,
-        expires_minutes=settings.VERIFICATION_CODE_EXPIRE_MINUTES,
-    )
+    async with async_unit_of_work(db):
+        user = await user_repo.create(obj_in=user_in)
+        await user_repo.store_verification_code(
+            user_id=user.id,
+            code=verification_code,
+            expires_minutes=settings.VERIFICATION_CODE_EXPIRE_MINUTES,
+        )
 
     notification_service = NotificationService(db)
     await notification_service.send_verification_email(
@@ -116,17 +120,18 @@ def refresh_token(
 
         device_info = request.headers.get("User-Agent", "")
 
-        user_repo.revoke_token(token=refresh_token_data.refresh_token)
-
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             token_data.sub, expires_delta=access_token_expires
         )
         refresh_token = create_refresh_token(token_data.sub)
 
-        user_repo.store_token(
-            user_id=token_data.sub, token=refresh_token, device_info=device_info
-        )
+        # The old token is revoked only together with storing the new one
+        with unit_of_work(db):
+            user_repo.revoke_token(token=refresh_token_data.refresh_token)
+            user_repo.store_token(
+                user_id=token_data.sub, token=refresh_token, device_info=device_info
+            )
 
         return {
             "access_token": access_token,
@@ -144,15 +149,15 @@ def refresh_token(
 
 @router.post("/forgot-password", response_model=dict)
 async def forgot_password(
-    email_in: ForgotPassword, db: Session = Depends(get_db)
+    email_in: ForgotPassword, db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    user_repo = UserRepository(db)
-    user = user_repo.get_by_email(email=email_in.email)
+    user_repo = AsyncUserRepository(db)
+    user = await user_repo.get_by_email(email=email_in.email)
 
     if user:
         reset_token = secrets.token_urlsafe(32)
 
-        user_repo.store_reset_token(
+        await user_repo.store_reset_token(
             user_id=user.id,
             token=reset_token,
             expires_minutes=settings.VERIFICATION_CODE_EXPIRE_MINUTES,
@@ -186,19 +191,21 @@ def reset_password(reset_data: PasswordReset, db: Session = Depends(get_db)) ->
             detail="Срок действия токена истек",
         )
 
-    user_repo.update_password(user_id=user.id, new_password=reset_data.new_password)
-
-    user_repo.invalidate_reset_token(token=reset_data.token)
+    with unit_of_work(db):
+        user_repo.update_password(
+            user_id=user.id, new_password=reset_data.new_password
+        )
+        user_repo.invalidate_reset_token(token=reset_data.token)
 
     return {"message": "Пароль успешно сброшен"}
 
 
 @router.post("/request-verification-email", response_model=dict)
 async def request_verification_email(
-    email_in: ForgotPassword, db: Session = Depends(get_db)
+    email_in: ForgotPassword, db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    user_repo = UserRepository(db)
-    user = user_repo.get_by_email(email=email_in.email)
+    user_repo = AsyncUserRepository(db)
+    user = await user_repo.get_by_email(email=email_in.email)
 
     if not user:
         return {
@@ -212,7 +219,7 @@ async def request_verification_email(
 
     verification_code = "".join([str(secrets.randbelow(10)) for _ in range(6)])
 
-    user_repo.store_verification_code(
+    await user_repo.store_verification_code(
         user_id=user.id,
         code=verification_code,
         expires_minutes=settings.VERIFICATION_CODE_EXPIRE_MINUTES,
@@ -264,11 +271,11 @@ def verify_email(
             detail="Срок действия кода истек",
         )
 
-    user_repo.mark_verified(user_id=user.id)
-
-    user_repo.invalidate_verification_code(
-        user_id=user.id, code=verification_data.verification_code
-    )
+    with unit_of_work(db):
+        user_repo.mark_verified(user_id=user.id)
+        user_repo.invalidate_verification_code(
+            user_id=user.id, code=verification_data.verification_code
+        )
 
     return {"message": "Электронная почта успешно подтверждена"}
 
@@ -281,8 +288,8 @@ def logout(
 ) -> Any:
     user_repo = UserRepository(db)
 
-    user_repo.revoke_token(token=refresh_token_data.refresh_token)
-
-    user_repo.clean_expired_tokens()
+    with unit_of_work(db):
+        user_repo.revoke_token(token=refresh_token_data.refresh_token)
+        user_repo.clean_expired_tokens()
 
     return {"message": "Вы успешно вышли из системы"}
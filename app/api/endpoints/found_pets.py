@@ -1,3 +1,4 @@
+import asyncio
 from typing import Any, Optional, Dict, List
 from datetime import date
 from uuid import UUID
@@ -14,9 +15,15 @@ from fastapi import (
     BackgroundTasks,
     Body,
 )
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_user, get_current_verified_user
+from app.api.deps import (
+    Pagination,
+    get_async_db,
+    get_read_db,
+    get_async_current_verified_user,
+)
 from app.models.user import User
 from app.repository.found_pet import FoundPetRepository
 from app.repository.pet import PetRepository, PetPhotoRepository
@@ -48,8 +55,8 @@ async def report_found_pet(
     size: Optional[str] = Form(None),
     photo: UploadFile = File(...),
     background_tasks: BackgroundTasks = BackgroundTasks(),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     if not photo.content_type.startswith("image/"):
         raise HTTPException(
@@ -95,8 +102,7 @@ async def report_found_pet(
 
 @router.get("", response_model=FoundPetListResponse)
 def get_found_pets(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
+    pagination: Pagination = Depends(),
     species: Optional[str] = None,
     location: Optional[str] = None,
     radius: Optional[float] = None,
@@ -108,12 +114,12 @@ def get_found_pets(
     max_results: int = Query(
         20, ge=1, le=50, description="Maximum number of matched results to return"
     ),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Any:
     if pet_photo_id:
         try:
             photo_repo = PetPhotoRepository(db)
-            source_photo = photo_repo.get(id=pet_photo_id)
+            source_photo = photo_repo.get(id=pet_photo_id, with_vectors=True)
 
             if not source_photo or not source_photo.feature_vector:
                 raise HTTPException(
@@ -131,12 +137,17 @@ def get_found_pets(
                 )
 
             found_pet_repo = FoundPetRepository(db)
-            candidates = found_pet_repo.get_found_pets(
-                species=species or source_photo.detected_attributes.get("species"),
+            cv_service = CVService()
+            candidates = _found_pet_candidates(
+                found_pet_repo,
+                cv_service,
+                source_photo.feature_vector,
+                species=species
+                or (source_photo.detected_attributes or {}).get("species")
+                or source_photo.pet.species,
                 location=location,
                 date_from=found_date_from,
                 date_to=found_date_to,
-                limit=100,
             )
 
             target_features = []
@@ -154,8 +165,8 @@ def get_found_pets(
                 return {
                     "items": [],
                     "total": 0,
-                    "page": page,
-                    "limit": limit,
+                    "page": pagination.page,
+                    "limit": pagination.limit,
                     "pages": 1,
                     "search_metadata": {
                         "source_id": pet_photo_id,
@@ -165,7 +176,6 @@ def get_found_pets(
                     },
                 }
 
-            cv_service = CVService()
             result = cv_service.find_potential_matches(
                 pet_photo_id=pet_photo_id,
                 feature_vector=source_photo.feature_vector,
@@ -175,7 +185,7 @@ def get_found_pets(
 
             if "comparisons" in result:
                 matched_ids = [
-                    match["id"] for match in result["comparisons"][:max_results]
+                    match["target_id"] for match in result["comparisons"][:max_results]
                 ]
                 matched_pets = []
 
@@ -218,33 +228,67 @@ def get_found_pets(
             )
 
     found_pet_repo = FoundPetRepository(db)
-    skip = (page - 1) * limit
 
     found_pets = found_pet_repo.get_found_pets(
-        skip=skip,
-        limit=limit,
+        skip=pagination.skip,
+        limit=pagination.limit,
+        cursor=pagination.cursor,
         species=species,
         location=location,
         date_from=found_date_from,
         date_to=found_date_to,
     )
 
-    total = found_pet_repo.count_found_pets(
-        species=species,
-        location=location,
-        date_from=found_date_from,
-        date_to=found_date_to,
-    )
+    total = None
+    if pagination.wants_total:
+        total = found_pet_repo.count_found_pets(
+            species=species,
+            location=location,
+            date_from=found_date_from,
+            date_to=found_date_to,
+            estimate=pagination.estimate,
+        )
+
+    return pagination.response(found_pets, total, sort_attr="found_date")
 
-    pages = (total + limit - 1) // limit if total > 0 else 1
 
-    return {
-        "items": found_pets,
-        "total": total,
-        "page": page,
-        "limit": limit,
-        "pages": pages,
-    }
+def _found_pet_candidates(
+    found_pet_repo: FoundPetRepository,
+    cv_service: CVService,
+    feature_vector: bytes,
+    *,
+    species: Optional[str],
+    location: Optional[str],
+    date_from: Optional[date],
+    date_to: Optional[date],
+) -> List:
+    """
+    Found pets worth scoring in full against a lost pet photo
+
+    With the embedding index these are the CV_INDEX_CANDIDATES visually
+    nearest found pets out of all of them, otherwise the 100 most recently
+    found ones. The filters apply to the candidates either way.
+    """
+    filters = dict(
+        species=species, location=location, date_from=date_from, date_to=date_to
+    )
+    if not settings.CV_INDEX_ENABLED:
+        return found_pet_repo.get_found_pets(limit=100, with_vectors=True, **filters)
+
+    hits = cv_service.find_found_pet_candidates(species, feature_vector)
+    candidates = found_pet_repo.get_found_pets(
+        found_pet_ids=[UUID(found_pet_id) for found_pet_id, _ in hits],
+        limit=len(hits),
+        with_vectors=True,
+        **filters,
+    )
+    candidates_by_id = {str(candidate.id): candidate for candidate in candidates}
+    # Keep the index order
+    return [
+        candidates_by_id[found_pet_id]
+        for found_pet_id, _ in hits
+        if found_pet_id in candidates_by_id
+    ]
 
 
 @router.get("/{found_pet_id}", response_model=FoundPet)
@@ -253,10 +297,12 @@ def get_found_pet(
     compare_with: Optional[str] = Query(
         None, description="Pet photo ID to compare with"
     ),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Any:
     found_pet_repo = FoundPetRepository(db)
-    found_pet = found_pet_repo.get_with_details(found_pet_id=found_pet_id)
+    found_pet = found_pet_repo.get_with_details(
+        found_pet_id=found_pet_id, with_vectors=compare_with is not None
+    )
 
     if not found_pet:
         raise HTTPException(
@@ -266,7 +312,7 @@ def get_found_pet(
     if compare_with:
         try:
             photo_repo = PetPhotoRepository(db)
-            source_photo = photo_repo.get(id=compare_with)
+            source_photo = photo_repo.get(id=compare_with, with_vectors=True)
 
             if not source_photo or not source_photo.feature_vector:
                 raise HTTPException(
@@ -311,8 +357,7 @@ def get_found_pet(
 @router.post("/analyze-image")
 async def analyze_image(
     image: UploadFile = File(...),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
 ) -> Any:
     """
     Analyze a pet image to detect species, features and attributes.
@@ -339,7 +384,8 @@ async def analyze_image(
     cv_service = CVService()
 
     try:
-        result = cv_service.analyze_image_content(image.file)
+        # The pipeline and the first model load block, keep them off the loop
+        result = await asyncio.to_thread(cv_service.analyze_image_content, image.file)
 
         if "error" in result:
             logger.error(f"Error analyzing image: {result['error']}")
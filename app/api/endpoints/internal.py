@@ -0,0 +1,37 @@
+import secrets
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.core.config import settings
+from app.core.database import replicas
+from app.core.db_pool import pool_statistics
+
+router = APIRouter()
+
+
+def require_internal_token(
+    x_internal_token: Optional[str] = Header(None),
+) -> None:
+    # Without a configured token the internal endpoints do not exist
+    if not settings.INTERNAL_METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if not x_internal_token or not secrets.compare_digest(
+        x_internal_token, settings.INTERNAL_METRICS_TOKEN
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Доступ запрещен"
+        )
+
+
+@router.get(
+    "/metrics",
+    response_model=Dict[str, Any],
+    dependencies=[Depends(require_internal_token)],
+)
+def get_metrics() -> Any:
+    """
+    Live database pool statistics of this process: connections checked out,
+    overflow in use, and histograms of checkout wait and hold times; and the
+    last measured lag of the read replicas
+    """
+    return {"db_pools": pool_statistics(), "replicas": replicas.statistics()}
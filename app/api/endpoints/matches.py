@@ -1,12 +1,18 @@
 from typing import Any, List, Optional
 from pydantic import UUID4
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
-from sqlalchemy.orm import Session
-
-from app.api.deps import get_db, get_current_user, get_current_verified_user
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import (
+    Pagination,
+    get_async_db,
+    get_async_current_user,
+    get_async_current_verified_user,
+)
 from app.models.user import User
-from app.repository.match import MatchRepository
+from app.repository.match import AsyncMatchRepository
+from app.repository.pagination import next_cursor
 from app.services.notification_service import NotificationService
 from app.schemas.match import MatchDetail, MatchStatusUpdate, MatchResponse
 
@@ -16,12 +22,12 @@ router = APIRouter()
 @router.get("/{match_id}", response_model=MatchDetail)
 async def get_match(
     match_id: UUID4 = Path(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    match_repo = MatchRepository(db)
+    match_repo = AsyncMatchRepository(db)
 
-    match = match_repo.get_with_details(match_id=match_id)
+    match = await match_repo.get_with_details(match_id=match_id)
 
     if not match:
         raise HTTPException(
@@ -43,12 +49,12 @@ async def get_match(
 async def update_match_status(
     status_in: MatchStatusUpdate,
     match_id: UUID4 = Path(...),  # Updated to use UUID4 validation
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    match_repo = MatchRepository(db)
+    match_repo = AsyncMatchRepository(db)
 
-    match = match_repo.get_with_details(match_id=match_id)
+    match = await match_repo.get_with_details(match_id=match_id)
 
     if not match:
         raise HTTPException(
@@ -67,7 +73,7 @@ async def update_match_status(
             detail="Неверный статус. Допустимые значения: confirmed, rejected",
         )
 
-    updated_match = match_repo.update_match_status(
+    updated_match = await match_repo.update_match_status(
         match_id=match_id, status=status_in.status
     )
 
@@ -82,35 +88,51 @@ async def update_match_status(
 
 @router.get("/mine", response_model=List[MatchDetail])
 async def get_user_matches(
+    response: Response,
     status: Optional[str] = None,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    pagination: Pagination = Depends(),
+    current_user: User = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    match_repo = MatchRepository(db)
-    skip = (page - 1) * limit
-
-    matches = match_repo.get_user_matches(
-        user_id=current_user.id, status=status, skip=skip, limit=limit
+    match_repo = AsyncMatchRepository(db)
+
+    matches = await match_repo.get_user_matches(
+        user_id=current_user.id,
+        status=status,
+        skip=pagination.skip,
+        limit=pagination.limit,
+        cursor=pagination.cursor,
     )
 
+    # The body stays a plain list, the cursor of the next page is a header
+    cursor = next_cursor(matches, pagination.limit, "created_at")
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
     return matches
 
 
 @router.get("/finder", response_model=List[MatchDetail])
 async def get_finder_matches(
+    response: Response,
     status: Optional[str] = None,
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    pagination: Pagination = Depends(),
+    current_user: User = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    match_repo = MatchRepository(db)
-    skip = (page - 1) * limit
-
-    matches = match_repo.get_finder_matches(
-        user_id=current_user.id, status=status, skip=skip, limit=limit
+    match_repo = AsyncMatchRepository(db)
+
+    matches = await match_repo.get_finder_matches(
+        user_id=current_user.id,
+        status=status,
+        skip=pagination.skip,
+        limit=pagination.limit,
+        cursor=pagination.cursor,
     )
 
+    # The body stays a plain list, the cursor of the next page is a header
+    cursor = next_cursor(matches, pagination.limit, "created_at")
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
     return matches
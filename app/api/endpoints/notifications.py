@@ -1,10 +1,10 @@
 from typing import Any
 from pydantic import UUID4
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Path
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import Pagination, get_db, get_current_user
 from app.models.user import User
 from app.repository.notification import NotificationRepository
 from app.schemas.notification import Notification, NotificationUpdate, NotificationList
@@ -14,8 +14,7 @@ router = APIRouter()
 
 @router.get("", response_model=NotificationList)
 def get_notifications(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
+    pagination: Pagination = Depends(),
     is_read: bool = None,
     type: str = None,
     current_user: User = Depends(get_current_user),
@@ -23,30 +22,30 @@ def get_notifications(
 ) -> Any:
     notification_repo = NotificationRepository(db)
 
-    skip = (page - 1) * limit
-
     notifications = notification_repo.get_user_notifications(
-        user_id=current_user.id, skip=skip, limit=limit, is_read=is_read, type=type
+        user_id=current_user.id,
+        skip=pagination.skip,
+        limit=pagination.limit,
+        cursor=pagination.cursor,
+        is_read=is_read,
+        type=type,
     )
 
-    total = notification_repo.count_user_notifications(
-        user_id=current_user.id, is_read=is_read, type=type
-    )
+    # Per-user counts are cheap, so an estimate is only skipped, not used
+    total = None
+    if pagination.wants_total:
+        total = notification_repo.count_user_notifications(
+            user_id=current_user.id, is_read=is_read, type=type
+        )
 
     unread_count = notification_repo.count_user_notifications(
         user_id=current_user.id, is_read=False
     )
 
-    pages = (total + limit - 1) // limit if total > 0 else 1
-
-    return {
-        "items": notifications,
-        "total": total,
-        "page": page,
-        "limit": limit,
-        "pages": pages,
-        "unread_count": unread_count,
-    }
+    response = pagination.response(notifications, total, sort_attr="created_at")
+    response["total_is_estimate"] = False
+    response["unread_count"] = unread_count
+    return response
 
 
 @router.patch("/{notification_id}", response_model=Notification)
@@ -6,19 +6,24 @@ from fastapi import (
     Depends,
     HTTPException,
     status,
-    Query,
     File,
     UploadFile,
     Form,
     Path,
     BackgroundTasks,
 )
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import UUID4
 
-from app.api.deps import get_db, get_current_user, get_current_verified_user
+from app.api.deps import (
+    Pagination,
+    get_async_db,
+    get_read_db,
+    get_async_current_verified_user,
+)
 from app.models.user import User
-from app.repository.pet import PetRepository
+from app.repository.pet import AsyncPetRepository, PetRepository
 from app.services.pets_service import PetsService
 from app.services.notification_service import NotificationService
 from app.schemas.pet import (
@@ -51,8 +56,8 @@ async def create_pet(
     is_main_photo: bool = Form(True),
     photo_description: Optional[str] = Form(None),
     background_tasks: BackgroundTasks = BackgroundTasks(),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     pet_in = PetCreate(
         name=name,
@@ -102,44 +107,43 @@ async def create_pet(
 
 @router.get("/lost", response_model=PetListResponse)
 def get_lost_pets(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
+    pagination: Pagination = Depends(),
     species: Optional[str] = None,
     location: Optional[str] = None,
     radius: Optional[float] = None,
     lost_date_from: Optional[date] = None,
     lost_date_to: Optional[date] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Any:
     pet_repo = PetRepository(db)
 
-    skip = (page - 1) * limit
-
     pets = pet_repo.get_lost_pets(
-        skip=skip,
-        limit=limit,
-        species=species,
-        location=location,
-        date_from=lost_date_from,
-        date_to=lost_date_to,
-    )
-
-    total = pet_repo.count_lost_pets(
+        skip=pagination.skip,
+        limit=pagination.limit,
+        cursor=pagination.cursor,
         species=species,
         location=location,
         date_from=lost_date_from,
         date_to=lost_date_to,
     )
 
-    pages = (total + limit - 1) // limit
+    total = None
+    if pagination.wants_total:
+        total = pet_repo.count_lost_pets(
+            species=species,
+            location=location,
+            date_from=lost_date_from,
+            date_to=lost_date_to,
+            estimate=pagination.estimate,
+        )
 
-    return {"items": pets, "total": total, "page": page, "limit": limit, "pages": pages}
+    return pagination.response(pets, total, sort_attr="lost_date")
 
 
 @router.get("/{pet_id}", response_model=Pet)
 def get_pet(
     pet_id: UUID4 = Path(...),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Any:
     pet_repo = PetRepository(db)
     pet = pet_repo.get_with_details(pet_id=pet_id)
@@ -156,11 +160,11 @@ def get_pet(
 async def update_pet(
     pet_in: PetUpdate,
     pet_id: UUID4 = Path(...),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    pet_repo = PetRepository(db)
-    pet = pet_repo.get(id=pet_id)
+    pet_repo = AsyncPetRepository(db)
+    pet = await pet_repo.get(id=pet_id)
 
     if not pet:
         raise HTTPException(
@@ -180,11 +184,11 @@ async def update_pet(
 async def update_pet_status(
     status_in: PetStatusUpdate,
     pet_id: UUID4 = Path(...),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    pet_repo = PetRepository(db)
-    pet = pet_repo.get(id=pet_id)
+    pet_repo = AsyncPetRepository(db)
+    pet = await pet_repo.get(id=pet_id)
 
     if not pet:
         raise HTTPException(
@@ -217,11 +221,11 @@ async def upload_pet_photo(
     is_main: bool = Form(False),
     description: Optional[str] = Form(None),
     background_tasks: BackgroundTasks = BackgroundTasks(),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    pet_repo = PetRepository(db)
-    pet = pet_repo.get(id=pet_id)
+    pet_repo = AsyncPetRepository(db)
+    pet = await pet_repo.get(id=pet_id)
 
     if not pet:
         raise HTTPException(
@@ -1,8 +1,8 @@
 from typing import Any, Dict
 from fastapi import APIRouter, Depends, HTTPException, status, Path
 
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_verified_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_async_current_verified_user
 from app.models.user import User
 from app.services.pets_service import PetsService
 
@@ -12,8 +12,8 @@ router = APIRouter()
 @router.get("/{task_id}", response_model=Dict[str, Any])
 async def get_task_status(
     task_id: str = Path(..., title="ID of the background task"),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     """
     Get the status of a background task
@@ -32,8 +32,8 @@ async def get_task_status(
 @router.delete("/{task_id}", response_model=Dict[str, Any])
 async def cancel_task(
     task_id: str = Path(..., title="ID of the background task to cancel"),
-    current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_async_current_verified_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     """
     Cancel a running background task if possible
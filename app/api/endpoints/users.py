@@ -2,11 +2,18 @@ from typing import Any, List
 import secrets
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import (
+    get_async_db,
+    get_db,
+    get_async_current_user,
+    get_current_user,
+)
 from app.core.security import verify_password
-from app.repository.user import UserRepository
+from app.repository.user import AsyncUserRepository, UserRepository
 from app.repository.pet import PetRepository
 from app.schemas.user import UserUpdate, User, UserProfile
 from app.schemas.auth import ChangePassword, RequestEmailChange, EmailVerification
@@ -70,16 +77,18 @@ def change_password(
 @router.post("/me/change-email/request", response_model=dict)
 async def request_email_change(
     data: RequestEmailChange,
-    current_user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
-    if not verify_password(data.password, current_user.password_hash):
+    if not await run_in_threadpool(
+        verify_password, data.password, current_user.password_hash
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный пароль"
         )
 
-    user_repo = UserRepository(db)
-    if user_repo.get_by_email(email=data.new_email):
+    user_repo = AsyncUserRepository(db)
+    if await user_repo.get_by_email(email=data.new_email):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Этот email уже используется другим пользователем",
@@ -90,7 +99,7 @@ async def request_email_change(
     from app.core.config import settings
 
     metadata = {"new_email": data.new_email}
-    user_repo.store_verification_code(
+    await user_repo.store_verification_code(
         user_id=current_user.id,
         code=verification_code,
         expires_minutes=settings.VERIFICATION_CODE_EXPIRE_MINUTES,
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, users, pets, found_pets, tasks
+from app.api.endpoints import auth, users, pets, found_pets, tasks, internal
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -8,3 +8,6 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(pets.router, prefix="/pets", tags=["pets"])
 api_router.include_router(found_pets.router, prefix="/found-pets", tags=["found-pets"])
 api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
+api_router.include_router(
+    internal.router, prefix="/internal", tags=["internal"], include_in_schema=False
+)
@@ -21,6 +21,22 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: PostgresDsn
 
+    # Database connection pool, one per engine (sync and async) and process
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10  # extra connections opened under load
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # wait for a free connection
+    DB_POOL_RECYCLE_SECONDS: int = 300  # -1 = never
+    DB_POOL_PRE_PING: str = "always"  # always, idle, never
+    DB_POOL_PRE_PING_IDLE_SECONDS: int = 60  # "idle" pings connections unused longer
+
+    # Read replicas for read-only endpoints and queries, comma-separated URLs
+    DATABASE_REPLICA_URLS: str = ""
+    DB_REPLICA_MAX_LAG_SECONDS: float = 2.0  # read from the primary beyond this
+    DB_REPLICA_LAG_CHECK_SECONDS: float = 5.0  # how often the lag is measured
+
+    # Internal endpoints, disabled while empty
+    INTERNAL_METRICS_TOKEN: str = ""
+
     # File storage
     UPLOADS_DIR: str = "uploads"
     MAX_UPLOAD_SIZE_MB: int = 10
@@ -47,6 +63,40 @@ class Settings(BaseSettings):
     CV_SIMILARITY_THRESHOLD: float = 0.6
     CV_MAX_IMAGE_SIZE_MB: int = 10
     CV_PROCESS_TIMEOUT_SECONDS: int = 30
+    CV_SHARED_BACKBONE: bool = False
+    CV_INFERENCE_BACKEND: str = "eager"  # eager, torchscript, onnx
+    CV_PRECISION: str = "fp32"  # fp32, int8
+    CV_QUANT_CALIBRATION_DIR: str = ""  # images for int8 backbone calibration
+    CV_QUANT_CALIBRATION_IMAGES: int = 64
+    CV_MODEL_VERSION: str = "1"  # bump when model weights change
+    CV_OFFLINE_MODELS: bool = True  # load only from the bundle in CV_MODEL_PATH
+    CV_WARMUP_ON_STARTUP: bool = True
+
+    # CV execution: "thread" runs the pipeline in the API process, "process"
+    # in a pool of worker processes that each load the models once
+    CV_EXECUTION_MODE: str = "thread"
+    CV_WORKER_PROCESSES: int = 2
+    CV_TORCH_THREADS: int = 0  # 0 keeps the torch default
+
+    # CV inference batching
+    CV_BATCHING_ENABLED: bool = True
+    CV_BATCH_MAX_SIZE: int = 8
+    CV_BATCH_MAX_WAIT_MS: float = 10.0
+
+    # CV analysis cache (keyed by image SHA-256 and model version)
+    CV_CACHE_ENABLED: bool = True
+    CV_CACHE_MEMORY_MAX_MB: int = 64
+    CV_CACHE_DB_MAX_MB: int = 512
+
+    # In-memory lost pet embedding index used for match search
+    CV_INDEX_ENABLED: bool = True
+    CV_INDEX_CANDIDATES: int = 200  # nearest pets scored in full per search
+    CV_INDEX_REFRESH_SECONDS: int = 300  # rebuild to pick up other processes
+    CV_INDEX_TYPE: str = "ivf"  # exact, ivf
+    CV_INDEX_IVF_NLIST: int = 0  # inverted lists, 0 = 4 * sqrt(size)
+    CV_INDEX_IVF_NPROBE: int = 8  # lists searched per query
+    CV_INDEX_EXACT_THRESHOLD: int = 10000  # exact search below this size
+    CV_INDEX_PATH: str = ""  # directory to persist the IVF index, empty = off
 
     # Comparison component weights
     CV_WEIGHT_VISUAL: float = 0.6
@@ -1,27 +1,88 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from typing import Generator
+from typing import AsyncGenerator, Generator
 import ssl
 
 from app.core.config import settings
+from app.core.db_pool import instrument_engine, pool_options
+from app.core.db_routing import ReplicaSet, RoutingSession
 
 ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
-connect_args = {}
-if "neon.tech" in str(settings.DATABASE_URL):
-    connect_args = {"sslmode": "require", "connect_timeout": 30}
 
+def sync_connect_args(url: str) -> dict:
+    if "neon.tech" in url:
+        return {"sslmode": "require", "connect_timeout": 30}
+    return {}
+
+
+# Sync engine, used by sync endpoints, scripts, migrations and the CV threads
 engine = create_engine(
     str(settings.DATABASE_URL),
-    connect_args=connect_args,
-    pool_pre_ping=True,
-    pool_recycle=300,
+    connect_args=sync_connect_args(str(settings.DATABASE_URL)),
+    **pool_options(),
+)
+instrument_engine(engine, "sync")
+
+# Read replicas, see app/core/db_routing.py
+replica_urls = [
+    url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()
+]
+replica_engines = []
+for number, replica_url in enumerate(replica_urls, start=1):
+    replica_engine = create_engine(
+        replica_url, connect_args=sync_connect_args(replica_url), **pool_options()
+    )
+    instrument_engine(replica_engine, f"replica-{number}")
+    replica_engines.append(replica_engine)
+
+replicas = ReplicaSet(
+    replica_engines,
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_seconds=settings.DB_REPLICA_LAG_CHECK_SECONDS,
+)
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    replicas=replicas,
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL for the asyncpg driver, which does not accept libpq options"""
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    return url.difference_update_query(["sslmode", "connect_timeout"]).render_as_string(
+        hide_password=False
+    )
+
+
+async_connect_args = {}
+if "neon.tech" in str(settings.DATABASE_URL) or "sslmode=require" in str(
+    settings.DATABASE_URL
+):
+    async_connect_args = {"ssl": ssl_context, "timeout": 30}
+
+# Async engine, used by the async endpoints so queries do not block the event loop
+async_engine = create_async_engine(
+    async_database_url(str(settings.DATABASE_URL)),
+    connect_args=async_connect_args,
+    **pool_options(async_engine=True),
+)
+instrument_engine(async_engine.sync_engine, "async")
+
+# Objects stay readable after commit, an expired attribute would need a lazy
+# load, which is not possible outside of an await
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
@@ -32,3 +93,17 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator:
+    """get_db for read-only endpoints, their SELECTs may go to a replica"""
+    db = SessionLocal(info={"read_only": True})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
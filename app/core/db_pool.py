@@ -0,0 +1,223 @@
+"""
+Connection pool configuration and live pool statistics
+
+Both engines in app/core/database.py use a QueuePool sized by the DB_POOL_*
+settings. The pools are instrumented: each one counts checkouts, timeouts,
+new connections and invalidations, and keeps histograms of how long a
+checkout waited for a free connection and how long the connection was then
+held. The statistics are served by GET /internal/metrics.
+"""
+
+import time
+import logging
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+# Upper bounds in seconds, the last bucket is unbounded
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HOLD_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and maximum of observed durations"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else f"{bound:g}"] = cumulative
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+        }
+
+
+class PoolMetrics:
+    """Counters and histograms of one engine's pool, safe across threads"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pings = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.hold = Histogram(HOLD_BUCKETS)
+
+    def observe_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.wait.observe(seconds)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def observe_hold(self, seconds: float) -> None:
+        with self._lock:
+            self.hold.observe(seconds)
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+                "timeout_seconds": settings.DB_POOL_TIMEOUT_SECONDS,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "pre_pings": self.pings,
+                "wait_seconds": self.wait.snapshot(),
+                "hold_seconds": self.hold.snapshot(),
+            }
+
+
+class _TimedCheckout:
+    """Measures how long a checkout waits for a connection"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics:
+                self.metrics.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.metrics:
+            self.metrics.observe_wait(time.perf_counter() - start, timed_out=False)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() replaces the pool, the statistics carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(async_engine: bool = False) -> Dict[str, Any]:
+    """create_engine / create_async_engine keyword arguments of the pool"""
+    strategy = settings.DB_POOL_PRE_PING
+    if strategy not in PRE_PING_STRATEGIES:
+        raise ValueError(
+            f"DB_POOL_PRE_PING must be one of {', '.join(PRE_PING_STRATEGIES)}, "
+            f"not {strategy!r}"
+        )
+    poolclass = InstrumentedAsyncQueuePool if async_engine else InstrumentedQueuePool
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": strategy == "always",
+    }
+
+
+_metrics: Dict[str, PoolMetrics] = {}
+_engines: Dict[str, Any] = {}
+
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """
+    Collect statistics of ``engine``'s pool and apply the idle pre-ping
+
+    Args:
+        engine: A sync Engine, or the sync_engine of an AsyncEngine
+        name: Key of the pool in the metrics output
+    """
+    metrics = PoolMetrics(name)
+    engine.pool.metrics = metrics
+    _metrics[name] = metrics
+    _engines[name] = engine
+
+    idle_seconds = settings.DB_POOL_PRE_PING_IDLE_SECONDS
+    ping_idle = settings.DB_POOL_PRE_PING == "idle"
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.pop("checked_in_at", None)
+        if (
+            ping_idle
+            and checked_in_at is not None
+            and time.monotonic() - checked_in_at > idle_seconds
+        ):
+            # Only connections that sat unused long enough to have been
+            # dropped by the server or a proxy are pinged
+            metrics.increment("pings")
+            try:
+                engine.dialect.do_ping(dbapi_connection)
+            except Exception as e:
+                logger.info(f"Discarding stale {name} connection: {e}")
+                # The pool replaces the connection and retries the checkout
+                raise exc.DisconnectionError() from e
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            metrics.observe_hold(time.perf_counter() - checked_out_at)
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidations")
+
+    return metrics
+
+
+def pool_statistics() -> Dict[str, Any]:
+    """Live statistics of every instrumented pool, by name"""
+    return {
+        name: metrics.snapshot(_engines[name].pool)
+        for name, metrics in _metrics.items()
+    }
@@ -0,0 +1,175 @@
+"""
+Read replica routing
+
+Sessions made by SessionLocal are RoutingSessions. They send everything to
+the primary unless reads were asked for on a replica: by the get_read_db
+dependency of the read-only endpoints, or by repository methods decorated
+with @read_replica. Even then only SELECTs go to a replica; flushes, DML,
+raw SQL and SELECT ... FOR UPDATE stay on the primary, and a session that
+wrote once reads from the primary from then on so it sees its writes.
+
+A replica is used only while its measured replication lag is within
+DB_REPLICA_MAX_LAG_SECONDS, otherwise reads fall back to the primary.
+"""
+
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind, 0 when it has replayed all WAL it received
+# and NULL when it has not replayed anything yet
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+class Replica:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+
+class ReplicaSet:
+    """Replica engines with a cached replication lag check"""
+
+    def __init__(
+        self, engines: List[Engine], max_lag_seconds: float, check_seconds: float
+    ):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self._next = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Engine]:
+        """A replica within the lag limit, round robin, or None for the primary"""
+        self._check_lag()
+        healthy = [
+            replica
+            for replica in self.replicas
+            if replica.lag is not None and replica.lag <= self.max_lag_seconds
+        ]
+        if not healthy:
+            return None
+        self._next += 1
+        return healthy[self._next % len(healthy)].engine
+
+    def _check_lag(self) -> None:
+        now = time.monotonic()
+        for replica in self.replicas:
+            if now - replica.checked_at < self.check_seconds:
+                continue
+            # One thread measures, the others use the last value meanwhile
+            if not replica._lock.acquire(blocking=False):
+                continue
+            try:
+                replica.checked_at = now
+                replica.lag = self._measure_lag(replica.engine)
+            finally:
+                replica._lock.release()
+
+    def _measure_lag(self, engine: Engine) -> Optional[float]:
+        try:
+            with engine.connect() as connection:
+                lag = connection.exec_driver_sql(LAG_SQL).scalar()
+        except Exception as e:
+            logger.warning(f"Replica {engine.url.host} lag check failed: {e}")
+            return None
+        if lag is None:
+            return None
+        if float(lag) > self.max_lag_seconds:
+            logger.info(
+                f"Replica {engine.url.host} is {float(lag):.1f}s behind, "
+                f"reading from the primary"
+            )
+        return float(lag)
+
+    def statistics(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "host": replica.engine.url.host,
+                "lag_seconds": replica.lag,
+                "healthy": replica.lag is not None
+                and replica.lag <= self.max_lag_seconds,
+                "checked_seconds_ago": (
+                    round(now - replica.checked_at, 1) if replica.checked_at else None
+                ),
+            }
+            for replica in self.replicas
+        ]
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+        elif (
+            self.replicas
+            and self.info.get("read_only")
+            and not self.info.get("wrote")
+            and self._is_plain_select(clause)
+        ):
+            if "replica" not in self.info:
+                # Chosen once, so the reads of a session see one replica
+                self.info["replica"] = self.replicas.choose()
+            if self.info["replica"] is not None:
+                return self.info["replica"]
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    @staticmethod
+    def _is_plain_select(clause) -> bool:
+        return (
+            getattr(clause, "is_select", False)
+            and getattr(clause, "_for_update_arg", None) is None
+        )
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _mark_flush_as_write(session, flush_context, instances):
+    # Set before the flush runs, so its statements and every later read of
+    # the session go to the primary
+    session.info["wrote"] = True
+
+
+@contextmanager
+def replica_reads(db: Session):
+    """Let the SELECTs run on ``db`` inside the block go to a replica"""
+    previous = db.info.get("read_only", False)
+    db.info["read_only"] = True
+    try:
+        yield db
+    finally:
+        db.info["read_only"] = previous
+
+
+def read_replica(method):
+    """Runs a read-only repository method's queries on a replica if possible"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with replica_reads(self.db):
+            return method(self, *args, **kwargs)
+
+    return wrapper
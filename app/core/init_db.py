@@ -0,0 +1,40 @@
+"""
+Create any missing database tables from the SQLAlchemy models
+
+Usage:
+    python -m app.core.init_db
+
+Migrations (``alembic upgrade head``, run by run.py) remain the source of the
+schema. This is for local databases and tests that are bootstrapped from the
+models directly.
+"""
+
+import logging
+
+from app.core.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+
+def init_db() -> None:
+    # Register every model on Base.metadata before creating tables
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    try:
+        init_db()
+        logger.info("Database tables created successfully")
+    except Exception as e:
+        logger.error(f"Database initialization error: {str(e)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
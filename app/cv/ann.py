@@ -0,0 +1,299 @@
+import json
+import heapq
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.cv.index import EmbeddingIndex, _normalize
+
+logger = logging.getLogger(__name__)
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 256
+# Retrain the centroids once the index has grown this much since training
+RETRAIN_GROWTH = 4
+# Initial rows per inverted list; lists grow by doubling
+LIST_CAPACITY = 16
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest neighbour index in pure NumPy
+
+    Vectors are clustered around ``nlist`` centroids trained with spherical
+    k-means. A query scores the centroids, then searches only the ``nprobe``
+    closest lists exactly, so ``nprobe`` trades recall for latency. Each list
+    is an EmbeddingIndex, so inserts and deletes stay O(dim).
+
+    Collections smaller than ``exact_threshold`` are searched exhaustively and
+    are not clustered at all. The index trains itself when it first grows past
+    the threshold and retrains after growing RETRAIN_GROWTH times since.
+    """
+
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        exact_threshold: Optional[int] = None,
+        centroids: Optional[np.ndarray] = None,
+    ):
+        self.nlist = nlist if nlist is not None else settings.CV_INDEX_IVF_NLIST
+        self.nprobe = nprobe or settings.CV_INDEX_IVF_NPROBE
+        self.exact_threshold = (
+            settings.CV_INDEX_EXACT_THRESHOLD
+            if exact_threshold is None
+            else exact_threshold
+        )
+        self._lists: List[EmbeddingIndex] = [EmbeddingIndex()]
+        self._centroids: Optional[np.ndarray] = None
+        self._list_of: Dict[str, int] = {}
+        self._trained_size = 0
+        self._lock = threading.RLock()
+        if centroids is not None:
+            self._set_centroids(np.asarray(centroids, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self._list_of)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._list_of
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._list_of)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def dim(self) -> Optional[int]:
+        if self._centroids is not None:
+            return self._centroids.shape[1]
+        return self._lists[0].dim
+
+    def upsert(self, key: str, vector) -> bool:
+        vector = _normalize(vector)
+        if vector is None:
+            return False
+
+        with self._lock:
+            if self.dim is not None and vector.shape[0] != self.dim:
+                logger.warning(
+                    f"Skipping vector of dimension {vector.shape[0]} for {key}, "
+                    f"index dimension is {self.dim}"
+                )
+                return False
+
+            list_id = int(self._assign(vector[None, :])[0])
+            previous = self._list_of.get(key)
+            if previous is not None and previous != list_id:
+                self._lists[previous].remove(key)
+            if not self._lists[list_id].upsert(key, vector):
+                return False
+            self._list_of[key] = list_id
+
+            if self._needs_training():
+                self.train()
+            return True
+
+    def upsert_many(self, keys: List[str], vectors) -> None:
+        """Bulk load new keys, training at most once at the end"""
+        normalized = [(key, _normalize(vector)) for key, vector in zip(keys, vectors)]
+        dim = self.dim or next(
+            (vector.shape[0] for _, vector in normalized if vector is not None), None
+        )
+        usable = [
+            (key, vector)
+            for key, vector in normalized
+            if vector is not None and vector.shape[0] == dim
+        ]
+        if len(usable) < len(normalized):
+            logger.warning(
+                f"Skipped {len(normalized) - len(usable)} unusable vectors in bulk load"
+            )
+        if not usable:
+            return
+
+        with self._lock:
+            current_keys, current_vectors = self._all_items()
+            new_keys = {key for key, _ in usable}
+            kept = [i for i, key in enumerate(current_keys) if key not in new_keys]
+            all_keys = [current_keys[i] for i in kept] + [key for key, _ in usable]
+            all_vectors = np.concatenate(
+                [current_vectors[kept].reshape(len(kept), dim)]
+                + [np.stack([vector for _, vector in usable])]
+            )
+            self._rebuild_lists(all_keys, all_vectors)
+
+            if self.trained and self._trained_size == 0:
+                # Centroids were given (e.g. loaded from disk), not trained here
+                self._trained_size = len(self)
+            if self._needs_training():
+                self.train()
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            list_id = self._list_of.pop(key, None)
+            if list_id is None:
+                return False
+            return self._lists[list_id].remove(key)
+
+    def search(
+        self, vector, k: int, nprobe: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Return up to ``k`` (key, cosine similarity) pairs, most similar first
+
+        Args:
+            vector: Query vector
+            k: Number of results
+            nprobe: Lists to search, the index default if not given
+        """
+        query = _normalize(vector)
+        with self._lock:
+            if query is None or not self._list_of or k <= 0:
+                return []
+            if query.shape[0] != self.dim:
+                logger.warning(
+                    f"Query dimension {query.shape[0]} does not match index "
+                    f"dimension {self.dim}"
+                )
+                return []
+
+            if not self.trained or len(self) < self.exact_threshold:
+                probes = range(len(self._lists))
+            else:
+                nprobe = min(nprobe or self.nprobe, len(self._lists))
+                scores = self._centroids @ query
+                probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+            hits = []
+            for list_id in probes:
+                hits.extend(self._lists[list_id].search(query, k))
+            return heapq.nlargest(k, hits, key=lambda hit: hit[1])
+
+    def train(self, nlist: Optional[int] = None) -> None:
+        """Cluster the stored vectors and rebuild the inverted lists"""
+        with self._lock:
+            keys, vectors = self._all_items()
+            if not keys:
+                return
+
+            nlist = nlist or self.nlist or int(4 * np.sqrt(len(keys)))
+            nlist = max(1, min(nlist, len(keys)))
+            centroids = _spherical_kmeans(vectors, nlist)
+            self._set_centroids(centroids)
+            self._rebuild_lists(keys, vectors)
+            self._trained_size = len(keys)
+            logger.info(f"Trained IVF index with {nlist} lists on {len(keys)} vectors")
+
+    def save(self, path: str) -> None:
+        """Write the centroids and every stored vector to an .npz file"""
+        with self._lock:
+            keys, vectors = self._all_items()
+            meta = {
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "exact_threshold": self.exact_threshold,
+                "trained_size": self._trained_size,
+            }
+            arrays = {
+                "keys": np.array(keys, dtype=str),
+                "vectors": vectors,
+                "meta": np.array(json.dumps(meta)),
+            }
+            if self._centroids is not None:
+                arrays["centroids"] = self._centroids
+            with open(path, "wb") as f:
+                np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            index = cls(
+                nlist=meta["nlist"],
+                nprobe=meta["nprobe"],
+                exact_threshold=meta["exact_threshold"],
+                centroids=data["centroids"] if "centroids" in data else None,
+            )
+            index._rebuild_lists([str(key) for key in data["keys"]], data["vectors"])
+            index._trained_size = meta["trained_size"]
+        return index
+
+    def _needs_training(self) -> bool:
+        size = len(self)
+        if size < self.exact_threshold:
+            return False
+        if not self.trained:
+            return True
+        return size >= self._trained_size * RETRAIN_GROWTH
+
+    def _set_centroids(self, centroids: np.ndarray) -> None:
+        self._centroids = centroids
+        self._lists = [
+            EmbeddingIndex(capacity=LIST_CAPACITY) for _ in range(len(centroids))
+        ]
+        self._list_of = {}
+        self._trained_size = 0
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.zeros(len(vectors), dtype=np.int64)
+        assignments = []
+        for start in range(0, len(vectors), 4096):
+            chunk = vectors[start : start + 4096]
+            assignments.append(np.argmax(chunk @ self._centroids.T, axis=1))
+        return np.concatenate(assignments)
+
+    def _rebuild_lists(self, keys: List[str], vectors: np.ndarray) -> None:
+        self._list_of = {}
+        if not keys:
+            self._lists = [EmbeddingIndex(capacity=LIST_CAPACITY) for _ in self._lists]
+            return
+
+        assignments = self._assign(vectors)
+        counts = np.bincount(assignments, minlength=len(self._lists))
+        self._lists = [
+            EmbeddingIndex(capacity=max(int(count), LIST_CAPACITY)) for count in counts
+        ]
+        for key, vector, list_id in zip(keys, vectors, assignments):
+            self._lists[list_id].upsert(key, vector)
+            self._list_of[key] = int(list_id)
+
+    def _all_items(self) -> Tuple[List[str], np.ndarray]:
+        keys, blocks = [], []
+        for inverted_list in self._lists:
+            list_keys, vectors = inverted_list.items()
+            if list_keys:
+                keys.extend(list_keys)
+                blocks.append(vectors)
+        if not blocks:
+            return [], np.empty((0, self.dim or 0), dtype=np.float32)
+        return keys, np.concatenate(blocks)
+
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """K-means on unit vectors with cosine similarity, on a sample of the data"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLES_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+
+        # Restart empty clusters from random samples
+        empty = np.bincount(assignments, minlength=nlist) == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+
+    return centroids.astype(np.float32)
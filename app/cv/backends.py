@@ -0,0 +1,146 @@
+import os
+import logging
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Modules of SimplePetFinder that can be exported and run from artifacts
+EXPORTABLE_MODULES = ["feature_extractor", "secondary_extractor", "attribute_heads"]
+DETECTOR_NAME = "yolov5s"
+
+
+class InferenceBackend:
+    """
+    Eager PyTorch backend, also the fallback for the optimized backends
+
+    A backend decides how each SimplePetFinder module is run. ``wrap`` returns
+    a callable taking and returning a torch tensor, so the pet finder code is
+    the same for every backend.
+    """
+
+    name = "eager"
+    suffix: Optional[str] = None
+    detector_suffix: Optional[str] = None
+
+    def __init__(self, model_dir: Optional[str] = None, precision: str = "fp32"):
+        self.model_dir = model_dir or settings.CV_MODEL_PATH
+        self.precision = precision
+
+    def artifact_path(self, module_name: str) -> Optional[str]:
+        if self.suffix is None:
+            return None
+        # The detector always runs in fp32, only the other modules get int8 artifacts
+        precision = ".int8" if self.precision == "int8" else ""
+        return os.path.join(self.model_dir, f"{module_name}{precision}{self.suffix}")
+
+    def detector_path(self) -> Optional[str]:
+        """Path of an exported detector, or None to load the eager YOLOv5 model"""
+        if self.detector_suffix is None:
+            return None
+        path = os.path.join(self.model_dir, f"{DETECTOR_NAME}{self.detector_suffix}")
+        if not os.path.exists(path):
+            logger.warning(
+                f"No exported detector at {path}, falling back to eager PyTorch"
+            )
+            return None
+        return path
+
+    def wrap(self, module_name: str, module):
+        if module is None:
+            return None
+
+        path = self.artifact_path(module_name)
+        if path is None:
+            return module
+
+        if not os.path.exists(path):
+            logger.warning(
+                f"No {self.name} artifact for {module_name} at {path}, "
+                "falling back to eager PyTorch"
+            )
+            return module
+
+        try:
+            runner = self.load(path)
+            logger.info(f"Running {module_name} with the {self.name} backend")
+            return runner
+        except Exception as e:
+            logger.error(
+                f"Error loading {self.name} artifact {path}: {e}, "
+                "falling back to eager PyTorch",
+                exc_info=True,
+            )
+            return module
+
+    def load(self, path: str):
+        raise NotImplementedError
+
+
+class TorchScriptBackend(InferenceBackend):
+    name = "torchscript"
+    suffix = ".torchscript.pt"
+    detector_suffix = ".torchscript"
+
+    def load(self, path: str):
+        import torch
+
+        module = torch.jit.load(path, map_location="cpu")
+        module.eval()
+        try:
+            return torch.jit.optimize_for_inference(module)
+        except Exception as e:
+            logger.warning(f"Could not optimize {path} for inference: {e}")
+            return module
+
+
+class OnnxModule:
+    """Callable wrapper running an ONNX Runtime session on torch tensors"""
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        import torch
+
+        output = self.session.run(
+            None, {self.input_name: x.detach().cpu().numpy().astype("float32")}
+        )[0]
+        return torch.from_numpy(output)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    name = "onnx"
+    suffix = ".onnx"
+    detector_suffix = ".onnx"
+
+    def load(self, path: str):
+        return OnnxModule(path)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (InferenceBackend, TorchScriptBackend, OnnxRuntimeBackend)
+}
+
+
+def get_backend(
+    name: Optional[str] = None,
+    model_dir: Optional[str] = None,
+    precision: str = "fp32",
+) -> InferenceBackend:
+    name = (name or settings.CV_INFERENCE_BACKEND).lower()
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        logger.warning(f"Unknown CV inference backend '{name}', using eager PyTorch")
+        backend_class = InferenceBackend
+    return backend_class(model_dir, precision=precision)
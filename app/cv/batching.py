@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent inference requests and runs them as one batch
+
+    Callers submit single items from any thread and get back a Future. A
+    daemon thread waits for the first item, then keeps collecting until either
+    ``max_batch_size`` items are queued or ``max_wait_ms`` has passed, and hands
+    the whole batch to ``batch_fn``. ``batch_fn`` must return one result per
+    item, in order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    async def run_async(self, item: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"cv-batcher-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"Batch function returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                logger.error(f"Error in {self.name} batch: {e}", exc_info=True)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class InferenceScheduler:
+    """
+    Batches CV pipeline requests for a shared SimplePetFinder
+
+    Images are decoded in the caller's thread, so the batch thread only runs
+    the models. With batching disabled the calls go straight to the pet
+    finder, so callers can always use the scheduler.
+    """
+
+    def __init__(self, pet_finder, enabled: Optional[bool] = None):
+        self.pet_finder = pet_finder
+        self.enabled = settings.CV_BATCHING_ENABLED if enabled is None else enabled
+        self._analyze_batcher = MicroBatcher(
+            "analyze",
+            pet_finder.analyze_batch,
+            max_batch_size=settings.CV_BATCH_MAX_SIZE,
+            max_wait_ms=settings.CV_BATCH_MAX_WAIT_MS,
+        )
+
+    def analyze(self, image) -> Dict[str, Any]:
+        """Decode ``image`` once and run detection, attributes and embedding on it"""
+        image = self.pet_finder.load_image(image)
+        if not self.enabled:
+            return self.pet_finder.analyze(image)
+        return self._analyze_batcher(image)
+
+    async def analyze_async(self, image) -> Dict[str, Any]:
+        image = await asyncio.to_thread(self.pet_finder.load_image, image)
+        if not self.enabled:
+            return await asyncio.to_thread(self.pet_finder.analyze, image)
+        return await self._analyze_batcher.run_async(image)
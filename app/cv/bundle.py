@@ -0,0 +1,231 @@
+"""
+Offline model bundle
+
+Usage:
+    python -m app.cv.bundle prepare-models [--output DIR] [--force]
+    python -m app.cv.bundle verify [--output DIR]
+
+``prepare-models`` needs network access once. It stores the YOLOv5 hub code,
+the YOLOv5s weights and the torchvision backbone weights under CV_MODEL_PATH
+next to a manifest with their checksums. With CV_OFFLINE_MODELS enabled
+SimplePetFinder only loads from this bundle and never touches the network.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+
+YOLOV5_REPO = "ultralytics/yolov5"
+YOLOV5_REPO_DIR = "yolov5"
+YOLOV5_WEIGHTS = "yolov5s.pt"
+YOLOV5_WEIGHTS_URL = (
+    "https://github.com/ultralytics/yolov5/releases/download/v7.0/yolov5s.pt"
+)
+EFFICIENTNET_WEIGHTS = "efficientnet_b3.pth"
+RESNET_WEIGHTS = "resnet50.pth"
+
+# Optional trained attribute heads, bundled when present
+HEAD_WEIGHTS = [
+    f"{name}{suffix}.pt"
+    for name in ("breed_classifier", "color_classifier", "age_size_classifier")
+    for suffix in ("", "_effnet")
+]
+
+
+class ModelBundleError(RuntimeError):
+    pass
+
+
+class ModelBundle:
+    """Paths and integrity checks of a prepared model bundle"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.CV_MODEL_PATH
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def yolov5_repo(self) -> str:
+        return self.file(YOLOV5_REPO_DIR)
+
+    @property
+    def yolov5_weights(self) -> str:
+        return self.file(YOLOV5_WEIGHTS)
+
+    @property
+    def efficientnet_weights(self) -> str:
+        return self.file(EFFICIENTNET_WEIGHTS)
+
+    @property
+    def resnet_weights(self) -> str:
+        return self.file(RESNET_WEIGHTS)
+
+    def manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.file(MANIFEST_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def exists(self) -> bool:
+        return self.manifest() is not None
+
+    def verify(self, checksums: bool = False) -> Dict:
+        """
+        Check that every bundled file is present, optionally with its checksum
+
+        Raises:
+            ModelBundleError: If the bundle is missing, incomplete or corrupt
+        """
+        manifest = self.manifest()
+        if manifest is None:
+            raise ModelBundleError(
+                f"No model bundle at {self.path}. Run "
+                "'python -m app.cv.bundle prepare-models' with network access "
+                "or set CV_OFFLINE_MODELS=False"
+            )
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ModelBundleError(
+                f"Unsupported model bundle format {manifest.get('format')} "
+                f"in {self.path}, expected {BUNDLE_FORMAT}"
+            )
+
+        if not os.path.isfile(os.path.join(self.yolov5_repo, "hubconf.py")):
+            raise ModelBundleError(f"YOLOv5 code missing from {self.yolov5_repo}")
+
+        for name, expected in manifest["files"].items():
+            path = self.file(name)
+            if not os.path.exists(path):
+                raise ModelBundleError(f"Bundled file missing: {path}")
+            if checksums and _sha256(path) != expected:
+                raise ModelBundleError(f"Checksum mismatch for {path}")
+
+        return manifest
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prepare_models(output: Optional[str] = None, force: bool = False) -> Dict:
+    """
+    Download every model weight and the YOLOv5 code into a bundle directory
+
+    Args:
+        output: Bundle directory, CV_MODEL_PATH by default
+        force: Download again even if a complete bundle exists
+
+    Returns:
+        The written manifest
+    """
+    import torch
+    import torchvision
+    from torchvision.models import EfficientNet_B3_Weights, ResNet50_Weights
+
+    bundle = ModelBundle(output)
+    os.makedirs(bundle.path, exist_ok=True)
+
+    if bundle.exists() and not force:
+        try:
+            manifest = bundle.verify(checksums=True)
+            logger.info(f"Model bundle at {bundle.path} is complete")
+            return manifest
+        except ModelBundleError as e:
+            logger.warning(f"Rebuilding model bundle: {e}")
+
+    # YOLOv5 hub code, fetched into a scratch hub dir and copied into the bundle
+    with tempfile.TemporaryDirectory() as hub_dir:
+        previous_hub_dir = torch.hub.get_dir()
+        torch.hub.set_dir(hub_dir)
+        try:
+            repo_dir = torch.hub._get_cache_or_reload(
+                YOLOV5_REPO,
+                force_reload=True,
+                trust_repo=True,
+                calling_fn="prepare_models",
+            )
+        finally:
+            torch.hub.set_dir(previous_hub_dir)
+
+        if os.path.exists(bundle.yolov5_repo):
+            shutil.rmtree(bundle.yolov5_repo)
+        shutil.copytree(
+            repo_dir, bundle.yolov5_repo, ignore=shutil.ignore_patterns(".git")
+        )
+    logger.info(f"Stored YOLOv5 code in {bundle.yolov5_repo}")
+
+    torch.hub.download_url_to_file(YOLOV5_WEIGHTS_URL, bundle.yolov5_weights)
+    logger.info(f"Stored YOLOv5 weights in {bundle.yolov5_weights}")
+
+    for weights, path in (
+        (EfficientNet_B3_Weights.DEFAULT, bundle.efficientnet_weights),
+        (ResNet50_Weights.DEFAULT, bundle.resnet_weights),
+    ):
+        torch.save(weights.get_state_dict(progress=True), path)
+        logger.info(f"Stored {weights} in {path}")
+
+    files = [YOLOV5_WEIGHTS, EFFICIENTNET_WEIGHTS, RESNET_WEIGHTS]
+    files += [name for name in HEAD_WEIGHTS if os.path.exists(bundle.file(name))]
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "model_version": settings.CV_MODEL_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "torch": torch.__version__,
+        "torchvision": torchvision.__version__,
+        "files": {name: _sha256(bundle.file(name)) for name in files},
+    }
+    with open(bundle.file(MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Model bundle written to {bundle.path}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the offline CV model bundle")
+    parser.add_argument("command", choices=["prepare-models", "verify"])
+    parser.add_argument("--output", default=settings.CV_MODEL_PATH)
+    parser.add_argument(
+        "--force", action="store_true", help="Download again even if complete"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    if args.command == "prepare-models":
+        prepare_models(args.output, force=args.force)
+        return
+
+    try:
+        manifest = ModelBundle(args.output).verify(checksums=True)
+    except ModelBundleError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    logger.info(f"Model bundle OK: {len(manifest['files'])} files")
+
+
+if __name__ == "__main__":
+    main()
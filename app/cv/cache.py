@@ -0,0 +1,271 @@
+import copy
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fields of a pet finder analysis that are stored in the cache. The crop is a
+# PIL image of the decoded photo and is never cached.
+CACHED_FIELDS = ("species", "confidence", "bounding_box", "boxes", "attributes")
+
+# Check the DB tier size after this many writes instead of after every one
+DB_EVICTION_INTERVAL = 50
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def model_version(backend: str, precision: str, shared_backbone: bool) -> str:
+    """Identifies the weights and settings that produced an analysis"""
+    return "-".join(
+        [
+            settings.CV_MODEL_VERSION,
+            backend,
+            precision,
+            "shared" if shared_backbone else "dual",
+        ]
+    )
+
+
+def default_model_version() -> str:
+    """Model version of a pet finder built from the current settings"""
+    from app.cv.backends import BACKENDS
+    from app.cv.quantization import PRECISIONS
+
+    backend = settings.CV_INFERENCE_BACKEND.lower()
+    precision = settings.CV_PRECISION.lower()
+    return model_version(
+        backend if backend in BACKENDS else "eager",
+        precision if precision in PRECISIONS else "fp32",
+        settings.CV_SHARED_BACKBONE,
+    )
+
+
+class AnalysisCache:
+    """
+    Two-tier cache of pet finder analyses keyed by image hash and model version
+
+    Re-uploads of the same photo (to several pets, as lost and later as found,
+    or on retries) skip the models entirely. Entries live in an in-memory LRU
+    bounded by CV_CACHE_MEMORY_MAX_MB, backed by the ``imageanalysiscache``
+    table bounded by CV_CACHE_DB_MAX_MB. Both tiers evict least recently used
+    entries first. Only analyses with a detected pet are cached, so a photo
+    that failed because of a transient error is analyzed again next time.
+    """
+
+    def __init__(
+        self,
+        model_version: str,
+        enabled: Optional[bool] = None,
+        memory_max_bytes: Optional[int] = None,
+        db_max_bytes: Optional[int] = None,
+        session_factory: Optional[Callable] = None,
+    ):
+        self.model_version = model_version
+        self.enabled = settings.CV_CACHE_ENABLED if enabled is None else enabled
+        self.memory_max_bytes = (
+            settings.CV_CACHE_MEMORY_MAX_MB * 1024 * 1024
+            if memory_max_bytes is None
+            else memory_max_bytes
+        )
+        self.db_max_bytes = (
+            settings.CV_CACHE_DB_MAX_MB * 1024 * 1024
+            if db_max_bytes is None
+            else db_max_bytes
+        )
+        if session_factory is None:
+            from app.core.database import SessionLocal
+
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db_writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        """Return a cached analysis for the image hash, or None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._memory.get(image_hash)
+            if entry is not None:
+                self._memory.move_to_end(image_hash)
+                self.hits += 1
+                return self._to_analysis(entry[0])
+
+        record = self._db_get(image_hash)
+        if record is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        self._memory_put(image_hash, record)
+        return self._to_analysis(record)
+
+    def put(self, image_hash: str, analysis: Dict[str, Any]) -> None:
+        """Store an analysis in both tiers if a pet was detected"""
+        if not self.enabled or analysis.get("species") is None:
+            return
+
+        feature_vector = analysis.get("feature_vector")
+        record = {field: analysis.get(field) for field in CACHED_FIELDS}
+        record["feature_vector"] = (
+            np.asarray(feature_vector, dtype=np.float32).tobytes()
+            if feature_vector is not None
+            else None
+        )
+        record["size_bytes"] = self._record_size(record)
+
+        self._memory_put(image_hash, record)
+        self._db_put(image_hash, record)
+
+    def get_or_analyze(
+        self, content: bytes, analyze: Callable[[bytes], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Return the cached analysis of ``content`` or run ``analyze`` on a miss
+
+        Args:
+            content: Raw image bytes
+            analyze: Callable running the CV pipeline on the bytes
+
+        Returns:
+            Analysis dictionary; ``crop`` is None and ``cached`` True on a hit
+        """
+        image_hash = content_hash(content)
+        analysis = self.get(image_hash)
+        if analysis is not None:
+            logger.info(f"CV analysis cache hit for image {image_hash[:12]}")
+            return analysis
+
+        analysis = analyze(content)
+        self.put(image_hash, analysis)
+        return analysis
+
+    async def get_or_analyze_async(
+        self, content: bytes, analyze: Callable[[bytes], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        image_hash = await asyncio.to_thread(content_hash, content)
+        analysis = await asyncio.to_thread(self.get, image_hash)
+        if analysis is not None:
+            logger.info(f"CV analysis cache hit for image {image_hash[:12]}")
+            return analysis
+
+        analysis = await analyze(content)
+        await asyncio.to_thread(self.put, image_hash, analysis)
+        return analysis
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def _to_analysis(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        analysis = {field: copy.deepcopy(record[field]) for field in CACHED_FIELDS}
+        analysis["boxes"] = analysis["boxes"] or []
+        analysis["crop"] = None
+        analysis["feature_vector"] = (
+            np.frombuffer(record["feature_vector"], dtype=np.float32).copy()
+            if record["feature_vector"] is not None
+            else None
+        )
+        analysis["cached"] = True
+        return analysis
+
+    def _record_size(self, record: Dict[str, Any]) -> int:
+        vector_size = len(record["feature_vector"] or b"")
+        metadata = {field: record[field] for field in CACHED_FIELDS}
+        return vector_size + len(json.dumps(metadata, default=str))
+
+    def _memory_put(self, image_hash: str, record: Dict[str, Any]) -> None:
+        size = record["size_bytes"]
+        if size > self.memory_max_bytes:
+            return
+
+        with self._lock:
+            previous = self._memory.pop(image_hash, None)
+            if previous is not None:
+                self._memory_bytes -= previous[1]
+
+            self._memory[image_hash] = (record, size)
+            self._memory_bytes += size
+
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+
+    def _db_get(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        from app.repository.analysis_cache import AnalysisCacheRepository
+
+        try:
+            db = self.session_factory()
+            try:
+                entry = AnalysisCacheRepository(db).get_entry(
+                    content_hash=image_hash, model_version=self.model_version
+                )
+                if entry is None:
+                    return None
+                return {
+                    "species": entry.species,
+                    "confidence": entry.confidence,
+                    "bounding_box": entry.bounding_box,
+                    "boxes": entry.boxes,
+                    "attributes": entry.detected_attributes,
+                    "feature_vector": entry.feature_vector,
+                    "size_bytes": entry.size_bytes,
+                }
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"Error reading CV analysis cache: {e}")
+            return None
+
+    def _db_put(self, image_hash: str, record: Dict[str, Any]) -> None:
+        from app.repository.analysis_cache import AnalysisCacheRepository
+
+        try:
+            db = self.session_factory()
+            try:
+                repo = AnalysisCacheRepository(db)
+                repo.upsert_entry(
+                    content_hash=image_hash,
+                    model_version=self.model_version,
+                    values={
+                        "species": record["species"],
+                        "confidence": record["confidence"],
+                        "bounding_box": record["bounding_box"],
+                        "boxes": record["boxes"],
+                        "detected_attributes": record["attributes"],
+                        "feature_vector": record["feature_vector"],
+                        "size_bytes": record["size_bytes"],
+                    },
+                )
+
+                with self._lock:
+                    self._db_writes += 1
+                    evict = self._db_writes % DB_EVICTION_INTERVAL == 1
+                if evict:
+                    evicted = repo.evict_to_size(max_bytes=self.db_max_bytes)
+                    if evicted:
+                        logger.info(f"Evicted {evicted} CV analysis cache entries")
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"Error writing CV analysis cache: {e}")
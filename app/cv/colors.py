@@ -0,0 +1,57 @@
+import numpy as np
+
+# Fur color rules on (R, G, B) values. Rules may overlap, so a pixel can count
+# towards several colors.
+COLOR_RULES = {
+    "black": lambda r, g, b: (r < 50) & (g < 50) & (b < 50),
+    "white": lambda r, g, b: (r > 200) & (g > 200) & (b > 200),
+    "gray": lambda r, g, b: (np.abs(r - g) < 20)
+    & (np.abs(g - b) < 20)
+    & (np.abs(r - b) < 20)
+    & (r >= 50)
+    & (r <= 200),
+    "brown": lambda r, g, b: (r > g + 20) & (r > b + 20) & (g < 150) & (b < 150),
+    "golden": lambda r, g, b: (r > 180) & (g > 140) & (b < 100),
+    "cream": lambda r, g, b: (r > 200) & (g > 180) & (b > 150),
+    "orange": lambda r, g, b: (r > 180) & (g > 100) & (g < 150) & (b < 100),
+    "tabby": lambda r, g, b: (r > 130)
+    & (r < 180)
+    & (g > 100)
+    & (g < 150)
+    & (b > 50)
+    & (b < 100),
+}
+
+COLOR_NAMES = list(COLOR_RULES)
+
+
+def color_counts(pixels):
+    """
+    Count the pixels matching each color rule
+
+    Args:
+        pixels: Array of RGB values with shape (..., 3)
+
+    Returns:
+        Integer array of counts in COLOR_NAMES order
+    """
+    pixels = np.asarray(pixels, dtype=np.int16).reshape(-1, 3)
+    r, g, b = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+    return np.array(
+        [np.count_nonzero(rule(r, g, b)) for rule in COLOR_RULES.values()]
+    )
+
+
+def color_histogram(counts, total):
+    """Share of pixels matching each color rule, keyed by color name"""
+    total = max(int(total), 1)
+    return {
+        name: round(float(count) / total, 4)
+        for name, count in zip(COLOR_NAMES, counts)
+    }
+
+
+def dominant_color(counts):
+    """Color with the most pixels (first in COLOR_NAMES on ties), or None"""
+    index = int(np.argmax(counts))
+    return COLOR_NAMES[index] if counts[index] > 0 else None
@@ -0,0 +1,154 @@
+"""
+Versioned storage format of pet embeddings
+
+Layout of an encoded embedding (little endian):
+
+    magic     4 bytes  b"PEMB"
+    version   uint8    FORMAT_VERSION
+    dtype     uint8    code from DTYPES
+    id_length uint16   length of the model id
+    dim       uint32   number of components
+    model_id  id_length bytes of UTF-8
+    payload   dim components of the unit-normalized vector
+
+Vectors stored before this format are raw float32 bytes without a header.
+They are still read, as legacy embeddings without a model id, and are
+normalized on read.
+"""
+
+import struct
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PEMB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBHI")
+
+DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+# The backbone whose pooled features are stored as the pet embedding
+EMBEDDING_BACKBONE = "efficientnet_b3"
+
+
+class EmbeddingFormatError(ValueError):
+    pass
+
+
+@dataclass
+class Embedding:
+    vector: np.ndarray
+    # None for legacy vectors stored without a header
+    model_id: Optional[str]
+    normalized: bool
+
+    @property
+    def dim(self) -> int:
+        return self.vector.shape[0]
+
+    @property
+    def legacy(self) -> bool:
+        return self.model_id is None
+
+
+def embedding_model_id() -> str:
+    """Model id of embeddings produced with the current settings"""
+    return f"{EMBEDDING_BACKBONE}-v{settings.CV_MODEL_VERSION}"
+
+
+def encode_embedding(
+    vector, model_id: Optional[str] = None, dtype=np.float32
+) -> bytes:
+    """
+    Serialize a feature vector as a unit-normalized, versioned embedding
+
+    Args:
+        vector: Feature vector, raw or already normalized
+        model_id: Model that produced the vector, the current model by default
+        dtype: Payload dtype, float32 or float16
+
+    Returns:
+        Encoded bytes for the ``feature_vector`` columns
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if dtype not in DTYPE_CODES:
+        raise EmbeddingFormatError(f"Unsupported embedding dtype {dtype}")
+
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    if np.isfinite(norm) and norm > 0:
+        vector = vector / norm
+
+    model = (model_id or embedding_model_id()).encode()
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, DTYPE_CODES[dtype], len(model), vector.shape[0]
+    )
+    return header + model + vector.astype(dtype).tobytes()
+
+
+def is_versioned(data) -> bool:
+    return data is not None and bytes(data[:4]) == MAGIC
+
+
+def decode_embedding(data) -> Embedding:
+    """
+    Read an embedding in the versioned or the legacy raw float32 format
+
+    Raises:
+        EmbeddingFormatError: If the data is truncated or of an unknown version
+    """
+    data = bytes(data)
+    if not is_versioned(data) or len(data) < HEADER.size:
+        return _decode_legacy(data)
+
+    _, version, dtype_code, id_length, dim = HEADER.unpack_from(data)
+    dtype = DTYPES.get(dtype_code)
+    payload_start = HEADER.size + id_length
+    if dtype is None or len(data) != payload_start + dim * dtype.itemsize:
+        # Not a valid header, a legacy vector that happens to start with MAGIC
+        return _decode_legacy(data)
+    if version != FORMAT_VERSION:
+        raise EmbeddingFormatError(f"Unsupported embedding format version {version}")
+
+    model_id = data[HEADER.size : payload_start].decode()
+    vector = np.frombuffer(data, dtype=dtype, offset=payload_start, count=dim)
+    return Embedding(vector.astype(np.float32), model_id, normalized=True)
+
+
+def _decode_legacy(data: bytes) -> Embedding:
+    if len(data) % 4:
+        raise EmbeddingFormatError(
+            f"Legacy embedding of {len(data)} bytes is not a float32 array"
+        )
+    return Embedding(
+        np.frombuffer(data, dtype=np.float32).copy(), None, normalized=False
+    )
+
+
+def unit_vector(embedding: Embedding) -> np.ndarray:
+    """The embedding's vector with unit length, zero vectors stay zero"""
+    if embedding.normalized:
+        return embedding.vector
+    norm = np.linalg.norm(embedding.vector)
+    if not np.isfinite(norm) or norm == 0:
+        return np.zeros_like(embedding.vector)
+    return embedding.vector / norm
+
+
+def compatible(a: Embedding, b: Embedding) -> bool:
+    """
+    Whether two embeddings live in the same vector space
+
+    Legacy embeddings have no model id and are assumed to come from the model
+    that was current before the versioned format.
+    """
+    if a.dim != b.dim:
+        return False
+    return a.legacy or b.legacy or a.model_id == b.model_id
@@ -0,0 +1,212 @@
+"""
+Export the CV models to graph-optimized artifacts
+
+Usage:
+    python -m app.cv.export --format torchscript
+    python -m app.cv.export --format onnx --shared-backbone
+    python -m app.cv.export --format all --precision int8
+
+Artifacts are written to CV_MODEL_PATH (or --output) and picked up at startup
+when CV_INFERENCE_BACKEND is set to the matching backend.
+"""
+
+import os
+import json
+import logging
+import argparse
+
+import torch
+
+from app.core.config import settings
+from app.cv.backends import DETECTOR_NAME, OnnxRuntimeBackend, TorchScriptBackend
+from app.cv.quantization import PRECISIONS, quantize_onnx_artifact
+
+logger = logging.getLogger(__name__)
+
+DETECTOR_INPUT_SHAPE = (1, 3, 640, 640)
+BACKBONE_INPUT_SHAPE = (1, 3, 224, 224)
+
+
+def _exportable_modules(pet_finder):
+    """Yield (artifact name, module, example input) for every loaded module"""
+    suffix = "_effnet" if pet_finder.shared_backbone else ""
+    backbone_input = torch.zeros(BACKBONE_INPUT_SHAPE)
+
+    yield "feature_extractor", pet_finder.feature_extractor, backbone_input
+
+    if pet_finder.secondary_extractor is not None:
+        yield "secondary_extractor", pet_finder.secondary_extractor, backbone_input
+
+    head_input_size = pet_finder.attribute_heads.hidden.in_features
+    yield (
+        f"attribute_heads{suffix}",
+        pet_finder.attribute_heads,
+        torch.zeros(1, head_input_size),
+    )
+
+
+def _detection_model(pet_finder):
+    """Return the raw YOLOv5 DetectionModel behind the AutoShape wrapper"""
+    model = pet_finder.detector.model.model
+    model.eval()
+    for module in model.modules():
+        if type(module).__name__ == "Detect":
+            module.inplace = False
+            module.export = True
+    return model
+
+
+def export_torchscript(pet_finder, output_dir, precision="fp32"):
+    # Traced from the already quantized eager modules in int8 mode. An .int8
+    # artifact is always treated as quantized, so a backbone left fp32 for
+    # want of calibration images must not be written as one.
+    backend = TorchScriptBackend(output_dir, precision=pet_finder.precision)
+    if pet_finder.precision == "int8":
+        fp32_modules = [
+            name
+            for name in ("feature_extractor", "secondary_extractor")
+            if getattr(pet_finder, name) is not None
+            and name not in pet_finder.quantized_modules
+        ]
+        if fp32_modules:
+            raise SystemExit(
+                f"{', '.join(fp32_modules)} not quantized; "
+                "pass --calibration or set CV_QUANT_CALIBRATION_DIR"
+            )
+    written = []
+
+    with torch.no_grad():
+        for name, module, example in _exportable_modules(pet_finder):
+            path = backend.artifact_path(name)
+            traced = torch.jit.freeze(torch.jit.trace(module.eval(), example))
+            traced.save(path)
+            written.append(path)
+
+        model = _detection_model(pet_finder)
+        example = torch.zeros(DETECTOR_INPUT_SHAPE)
+        model(example)  # dry run to build anchor grids
+        traced = torch.jit.trace(model, example, strict=False)
+        metadata = {
+            "shape": list(DETECTOR_INPUT_SHAPE),
+            "stride": int(max(model.stride)),
+            "names": model.names,
+        }
+        path = os.path.join(output_dir, f"{DETECTOR_NAME}{backend.detector_suffix}")
+        traced.save(path, _extra_files={"config.txt": json.dumps(metadata)})
+        written.append(path)
+
+    return written
+
+
+def export_onnx(pet_finder, output_dir, precision="fp32", opset=17):
+    # Exported from fp32 modules; int8 copies are made with ONNX Runtime
+    backend = OnnxRuntimeBackend(output_dir)
+    int8_backend = OnnxRuntimeBackend(output_dir, precision="int8")
+    written = []
+
+    with torch.no_grad():
+        for name, module, example in _exportable_modules(pet_finder):
+            path = backend.artifact_path(name)
+            torch.onnx.export(
+                module.eval(),
+                example,
+                path,
+                opset_version=opset,
+                input_names=["input"],
+                output_names=["output"],
+                dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
+            )
+            written.append(path)
+            if precision == "int8":
+                written.append(
+                    quantize_onnx_artifact(path, int8_backend.artifact_path(name))
+                )
+
+        model = _detection_model(pet_finder)
+        example = torch.zeros(DETECTOR_INPUT_SHAPE)
+        model(example)
+        path = os.path.join(output_dir, f"{DETECTOR_NAME}{backend.detector_suffix}")
+        torch.onnx.export(
+            model,
+            example,
+            path,
+            opset_version=opset,
+            input_names=["images"],
+            output_names=["output0"],
+        )
+        _add_detector_metadata(path, model)
+        written.append(path)
+
+    return written
+
+
+def _add_detector_metadata(path, model):
+    """Store stride and class names the way YOLOv5's loader expects them"""
+    try:
+        import onnx
+    except ImportError:
+        logger.warning("onnx is not installed, detector metadata not written")
+        return
+
+    onnx_model = onnx.load(path)
+    for key, value in {"stride": int(max(model.stride)), "names": model.names}.items():
+        meta = onnx_model.metadata_props.add()
+        meta.key, meta.value = key, str(value)
+    onnx.save(onnx_model, path)
+
+
+EXPORTERS = {"torchscript": export_torchscript, "onnx": export_onnx}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export PetRadar CV models")
+    parser.add_argument(
+        "--format", choices=sorted(EXPORTERS) + ["all"], default="torchscript"
+    )
+    parser.add_argument("--output", default=settings.CV_MODEL_PATH)
+    parser.add_argument(
+        "--precision", choices=PRECISIONS, default=settings.CV_PRECISION.lower()
+    )
+    parser.add_argument(
+        "--calibration",
+        default=settings.CV_QUANT_CALIBRATION_DIR,
+        help="Directory of images calibrating the int8 backbones",
+    )
+    parser.add_argument(
+        "--shared-backbone",
+        action="store_true",
+        default=settings.CV_SHARED_BACKBONE,
+        help="Export the heads for shared-backbone mode",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    from app.cv.pet_finder import SimplePetFinder
+
+    os.makedirs(args.output, exist_ok=True)
+    pet_finders = {}
+
+    def get_pet_finder(precision):
+        if precision not in pet_finders:
+            pet_finders[precision] = SimplePetFinder(
+                shared_backbone=args.shared_backbone,
+                backend="eager",
+                precision=precision,
+                calibration_dir=args.calibration,
+            )
+        return pet_finders[precision]
+
+    formats = sorted(EXPORTERS) if args.format == "all" else [args.format]
+    for fmt in formats:
+        finder_precision = args.precision if fmt == "torchscript" else "fp32"
+        pet_finder = get_pet_finder(finder_precision)
+        for path in EXPORTERS[fmt](pet_finder, args.output, precision=args.precision):
+            logger.info(f"Wrote {fmt} artifact {path}")
+
+
+if __name__ == "__main__":
+    main()
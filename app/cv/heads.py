@@ -0,0 +1,48 @@
+import torch
+
+
+class FusedClassifierHeads(torch.nn.Module):
+    """
+    Runs several Linear-ReLU-Dropout-Linear classifier heads as one projection
+
+    The hidden layers of all heads are concatenated into one Linear layer and
+    the output layers into one block-diagonal Linear layer. A single matrix
+    multiply per layer then produces the logits of every head. Weights are
+    copied from the given heads, so weights loaded into them are preserved.
+    """
+
+    def __init__(self, heads):
+        super().__init__()
+        hidden_layers = [head[0] for head in heads]
+        output_layers = [head[-1] for head in heads]
+
+        self.output_sizes = [layer.out_features for layer in output_layers]
+        hidden_sizes = [layer.out_features for layer in hidden_layers]
+        input_size = hidden_layers[0].in_features
+
+        self.hidden = torch.nn.Linear(input_size, sum(hidden_sizes))
+        self.output = torch.nn.Linear(sum(hidden_sizes), sum(self.output_sizes))
+
+        with torch.no_grad():
+            self.hidden.weight.copy_(torch.cat([l.weight for l in hidden_layers]))
+            self.hidden.bias.copy_(torch.cat([l.bias for l in hidden_layers]))
+
+            self.output.weight.zero_()
+            row = col = 0
+            for layer in output_layers:
+                out_size, in_size = layer.weight.shape
+                self.output.weight[row : row + out_size, col : col + in_size] = (
+                    layer.weight
+                )
+                row += out_size
+                col += in_size
+            self.output.bias.copy_(torch.cat([l.bias for l in output_layers]))
+
+        self.eval()
+
+    def forward(self, x):
+        return self.output(torch.relu(self.hidden(x)))
+
+    def split(self, logits):
+        """Split fused logits back into one tensor per head"""
+        return torch.split(logits, self.output_sizes, dim=-1)
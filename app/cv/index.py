@@ -0,0 +1,414 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.cv.embedding import EmbeddingFormatError, decode_embedding
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingIndex:
+    """
+    Exact cosine similarity search over one contiguous float32 matrix
+
+    Vectors are L2-normalized on insert, so a top-k query is a single
+    matrix-vector product followed by a partial sort. Rows are appended into
+    spare capacity and deleted by moving the last row into the gap, so
+    inserts and deletes are O(dim).
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity = capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def upsert(self, key: str, vector) -> bool:
+        """Insert or replace the vector of ``key``, returns False if it is unusable"""
+        vector = _normalize(vector)
+        if vector is None:
+            return False
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty(
+                    (self._capacity, vector.shape[0]), dtype=np.float32
+                )
+            elif vector.shape[0] != self.dim:
+                logger.warning(
+                    f"Skipping vector of dimension {vector.shape[0]} for {key}, "
+                    f"index dimension is {self.dim}"
+                )
+                return False
+
+            position = self._positions.get(key)
+            if position is None:
+                position = len(self._keys)
+                if position == self._matrix.shape[0]:
+                    self._grow()
+                self._keys.append(key)
+                self._positions[key] = position
+
+            self._matrix[position] = vector
+            return True
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            position = self._positions.pop(key, None)
+            if position is None:
+                return False
+
+            last = len(self._keys) - 1
+            if position != last:
+                last_key = self._keys[last]
+                self._matrix[position] = self._matrix[last]
+                self._keys[position] = last_key
+                self._positions[last_key] = position
+            self._keys.pop()
+            return True
+
+    def search(self, vector, k: int) -> List[Tuple[str, float]]:
+        """
+        Return up to ``k`` (key, cosine similarity) pairs, most similar first
+        """
+        query = _normalize(vector)
+        with self._lock:
+            size = len(self._keys)
+            if query is None or size == 0 or k <= 0:
+                return []
+            if query.shape[0] != self.dim:
+                logger.warning(
+                    f"Query dimension {query.shape[0]} does not match index "
+                    f"dimension {self.dim}"
+                )
+                return []
+
+            scores = self._matrix[:size] @ query
+            if k < size:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(size)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._keys[i], float(scores[i])) for i in top]
+
+    def upsert_many(self, keys: List[str], vectors) -> None:
+        for key, vector in zip(keys, vectors):
+            self.upsert(key, vector)
+
+    def items(self) -> Tuple[List[str], np.ndarray]:
+        """Copy of the keys and their normalized vectors, in row order"""
+        with self._lock:
+            size = len(self._keys)
+            if self._matrix is None:
+                return [], np.empty((0, 0), dtype=np.float32)
+            return list(self._keys), self._matrix[:size].copy()
+
+    def _grow(self) -> None:
+        grown = np.empty(
+            (self._matrix.shape[0] * 2, self._matrix.shape[1]), dtype=np.float32
+        )
+        grown[: len(self._keys)] = self._matrix[: len(self._keys)]
+        self._matrix = grown
+
+
+def _normalize(vector) -> Optional[np.ndarray]:
+    if vector is None:
+        return None
+    if isinstance(vector, (bytes, bytearray, memoryview)):
+        try:
+            embedding = decode_embedding(vector)
+        except EmbeddingFormatError as e:
+            logger.warning(f"Skipping unreadable embedding: {e}")
+            return None
+        vector = embedding.vector
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    if vector.size == 0 or not np.isfinite(norm) or norm == 0:
+        return None
+    return vector / norm
+
+
+class PetEmbeddingIndex(ABC):
+    """
+    Per-species index of pet embeddings kept in sync with the database
+
+    Built from the database on first use and kept current in this process by
+    ``refresh_pet`` when a pet or its photo changes. Other API processes pick
+    up those changes on the periodic rebuild every CV_INDEX_REFRESH_SECONDS.
+
+    CV_INDEX_TYPE selects exact search or the IVF index (app/cv/ann.py). With
+    CV_INDEX_PATH set, IVF indexes are saved after each rebuild, and a fresh
+    process loads them instead of querying the database and retraining.
+
+    Subclasses set ``kind``, which names the persisted files, and load the
+    vectors in ``_load_vectors``.
+    """
+
+    kind = "pet"
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        refresh_seconds: Optional[int] = None,
+    ):
+        if session_factory is None:
+            from app.core.database import SessionLocal
+
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.refresh_seconds = (
+            settings.CV_INDEX_REFRESH_SECONDS
+            if refresh_seconds is None
+            else refresh_seconds
+        )
+        self.index_type = settings.CV_INDEX_TYPE.lower()
+        self.path = settings.CV_INDEX_PATH
+        self._indexes: Dict[str, EmbeddingIndex] = {}
+        self._species: Dict[str, str] = {}
+        self._built_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._species)
+
+    def search(
+        self, species: str, vector, k: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Return the ``k`` pets of ``species`` most similar to ``vector``
+
+        Returns:
+            List of (pet id, cosine similarity), most similar first
+        """
+        self.ensure_fresh()
+        index = self._indexes.get(species)
+        if index is None:
+            return []
+        return index.search(vector, k or settings.CV_INDEX_CANDIDATES)
+
+    def ensure_fresh(self) -> None:
+        if self._built_at is not None and (
+            not self.refresh_seconds
+            or time.monotonic() - self._built_at < self.refresh_seconds
+        ):
+            return
+        with self._lock:
+            if self._built_at is None and self._load_persisted():
+                return
+            if self._built_at is None or (
+                self.refresh_seconds
+                and time.monotonic() - self._built_at >= self.refresh_seconds
+            ):
+                self.rebuild()
+
+    def rebuild(self) -> None:
+        """Load every indexed pet's vector from the database"""
+        start = time.perf_counter()
+        grouped: Dict[str, Tuple[List[str], List[bytes]]] = {}
+
+        db = self.session_factory()
+        try:
+            rows = self._load_vectors(db)
+            for pet_id, species, feature_vector in rows:
+                keys, vectors = grouped.setdefault(species, ([], []))
+                keys.append(str(pet_id))
+                vectors.append(feature_vector)
+        finally:
+            db.close()
+
+        indexes: Dict[str, EmbeddingIndex] = {}
+        species_of: Dict[str, str] = {}
+        for species, (keys, vectors) in grouped.items():
+            index = self._new_index(species)
+            index.upsert_many(keys, vectors)
+            indexes[species] = index
+            species_of.update((key, species) for key in keys if key in index)
+
+        with self._lock:
+            self._indexes = indexes
+            self._species = species_of
+            self._built_at = time.monotonic()
+
+        logger.info(
+            f"Built {self.kind} pet index with {len(species_of)} pets in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+        self._save(indexes)
+
+    def update_pet(self, pet_id, species: Optional[str], feature_vector) -> None:
+        """Index the pet's vector, or drop the pet when there is none"""
+        key = str(pet_id)
+        with self._lock:
+            if self._built_at is None:
+                # Not built yet, the first search loads the current state
+                return
+
+            previous_species = self._species.pop(key, None)
+            if previous_species is not None:
+                self._indexes[previous_species].remove(key)
+
+            if feature_vector is None or species is None:
+                return
+
+            index = self._indexes.get(species)
+            if index is None:
+                index = self._indexes[species] = self._new_index(species)
+            if index.upsert(key, feature_vector):
+                self._species[key] = species
+
+    def remove_pet(self, pet_id) -> None:
+        self.update_pet(pet_id, None, None)
+
+    def refresh_pet(self, db, pet_id) -> None:
+        """Re-read one pet's vector and update the index"""
+        try:
+            rows = self._load_vectors(db, pet_id=pet_id)
+            if rows:
+                _, species, feature_vector = rows[0]
+                self.update_pet(pet_id, species, feature_vector)
+            else:
+                self.remove_pet(pet_id)
+        except Exception as e:
+            logger.error(f"Error updating {self.kind} pet index for {pet_id}: {e}")
+
+    @abstractmethod
+    def _load_vectors(self, db, pet_id=None) -> List[Tuple[object, str, bytes]]:
+        """(pet id, species, vector) of every indexed pet, or only ``pet_id``"""
+
+    def _new_index(self, species: str):
+        if self.index_type != "ivf":
+            return EmbeddingIndex()
+
+        from app.cv.ann import IVFIndex
+
+        # Reuse persisted centroids so a rebuild does not retrain from scratch
+        centroids = None
+        path = self._species_path(species)
+        if path and os.path.exists(path):
+            try:
+                centroids = IVFIndex.load(path)._centroids
+            except Exception as e:
+                logger.warning(f"Could not read persisted index {path}: {e}")
+        return IVFIndex(centroids=centroids)
+
+    def _species_path(self, species: str) -> Optional[str]:
+        if not self.path:
+            return None
+        slug = re.sub(r"[^a-z0-9]+", "_", species.lower()).strip("_")
+        digest = hashlib.sha1(species.encode()).hexdigest()[:8]
+        return os.path.join(self.path, f"{self.kind}_{slug}_{digest}.npz")
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, f"{self.kind}_pets.json")
+
+    def _save(self, indexes) -> None:
+        if not self.path or self.index_type != "ivf":
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            files = {}
+            for species, index in indexes.items():
+                path = self._species_path(species)
+                index.save(f"{path}.tmp")
+                os.replace(f"{path}.tmp", path)
+                files[species] = os.path.basename(path)
+
+            manifest = self._manifest_path
+            with open(f"{manifest}.tmp", "w") as f:
+                json.dump({"saved_at": time.time(), "files": files}, f)
+            os.replace(f"{manifest}.tmp", manifest)
+        except Exception as e:
+            logger.warning(f"Could not persist {self.kind} pet index: {e}")
+
+    def _load_persisted(self) -> bool:
+        """Load indexes saved within the refresh interval, returns True on success"""
+        if not self.path or self.index_type != "ivf":
+            return False
+
+        from app.cv.ann import IVFIndex
+
+        try:
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Could not read {self.kind} pet index manifest: {e}")
+            return False
+
+        age = time.time() - manifest["saved_at"]
+        if self.refresh_seconds and age >= self.refresh_seconds:
+            return False
+
+        indexes: Dict[str, EmbeddingIndex] = {}
+        species_of: Dict[str, str] = {}
+        try:
+            for species, name in manifest["files"].items():
+                index = IVFIndex.load(os.path.join(self.path, name))
+                indexes[species] = index
+                species_of.update((key, species) for key in index.keys())
+        except Exception as e:
+            logger.warning(f"Could not load persisted {self.kind} pet index: {e}")
+            return False
+
+        with self._lock:
+            self._indexes = indexes
+            self._species = species_of
+            self._built_at = time.monotonic() - max(age, 0)
+        logger.info(
+            f"Loaded {self.kind} pet index with {len(species_of)} pets from disk"
+        )
+        return True
+
+
+class LostPetIndex(PetEmbeddingIndex):
+    """
+    Main photo embeddings of currently lost pets, searched for found pet reports
+
+    Refreshed when a photo finishes processing or a pet changes; a pet that
+    is no longer lost drops out.
+    """
+
+    kind = "lost"
+
+    def _load_vectors(self, db, pet_id=None):
+        from app.repository.pet import PetRepository
+
+        return PetRepository(db).get_lost_pet_vectors(pet_id=pet_id)
+
+
+class FoundPetIndex(PetEmbeddingIndex):
+    """
+    Photo embeddings of all reported found pets, searched for lost pet photos
+
+    Refreshed when a found pet is reported, so searches reach every found pet
+    rather than only the most recent ones.
+    """
+
+    kind = "found"
+
+    def _load_vectors(self, db, pet_id=None):
+        from app.repository.found_pet import FoundPetRepository
+
+        return FoundPetRepository(db).get_found_pet_vectors(found_pet_id=pet_id)
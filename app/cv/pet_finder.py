@@ -1,8 +1,10 @@
+import io
 import os
+import time
 import torch
 import numpy as np
 import logging
-from PIL import Image, ImageColor
+from PIL import Image, ImageOps
 import torchvision.transforms as transforms
 from torchvision.models import (
     resnet50,
@@ -10,34 +12,65 @@ from torchvision.models import (
     efficientnet_b3,
     EfficientNet_B3_Weights,
 )
-from sklearn.metrics.pairwise import cosine_similarity
-import matplotlib.pyplot as plt
-import glob
-from geopy.distance import geodesic
-from collections import Counter
+
+from app.core.config import settings
+from app.cv.heads import FusedClassifierHeads
+from app.cv.colors import color_counts, color_histogram, dominant_color
+from app.cv.backends import get_backend
+from app.cv.cache import model_version
+from app.cv.bundle import ModelBundle
+from app.cv.quantization import (
+    PRECISIONS,
+    find_images,
+    quantize_dynamic_module,
+    quantize_static_module,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 
 class SimplePetFinder:
-    def __init__(self):
+    def __init__(
+        self, shared_backbone=None, backend=None, precision=None, calibration_dir=None
+    ):
         logger.info("Loading models...")
 
-        # Load YOLOv5 for pet detection
-        model_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "yolov5s.pt"
+        if settings.CV_TORCH_THREADS > 0:
+            torch.set_num_threads(settings.CV_TORCH_THREADS)
+
+        # fp32, or int8: static quantization of the backbones (calibrated on
+        # CV_QUANT_CALIBRATION_DIR) and dynamic quantization of the heads
+        self.precision = (precision or settings.CV_PRECISION).lower()
+        if self.precision not in PRECISIONS:
+            logger.warning(f"Unknown CV precision '{self.precision}', using fp32")
+            self.precision = "fp32"
+        self.calibration_dir = (
+            settings.CV_QUANT_CALIBRATION_DIR
+            if calibration_dir is None
+            else calibration_dir
         )
-        if os.path.exists(model_path):
-            logger.info(f"Loading YOLOv5 from local file: {model_path}")
-            self.detector = torch.hub.load(
-                "ultralytics/yolov5", "custom", path=model_path
-            )
-        else:
-            logger.info("Loading YOLOv5 from torch hub")
-            self.detector = torch.hub.load(
-                "ultralytics/yolov5", "yolov5s", pretrained=True
-            )
+        # Names of the modules that actually run in int8
+        self.quantized_modules = set()
+
+        # Eager PyTorch, TorchScript or ONNX Runtime (see app/cv/backends.py)
+        self.backend = get_backend(backend, precision=self.precision)
+
+        # In shared-backbone mode the EfficientNet embedding also feeds the
+        # attribute heads, so ResNet50 is never loaded
+        self.shared_backbone = (
+            settings.CV_SHARED_BACKBONE if shared_backbone is None else shared_backbone
+        )
+
+        # With CV_OFFLINE_MODELS every weight comes from the prepared bundle
+        # (python -m app.cv.bundle prepare-models) and nothing is downloaded
+        self.bundle = None
+        if settings.CV_OFFLINE_MODELS:
+            self.bundle = ModelBundle()
+            self.bundle.verify()
+
+        # Load YOLOv5 for pet detection
+        self.detector = self._load_detector()
 
         # COCO dataset: 0=person, 15=cat, 16=dog
         self.pet_classes = [15, 16]
@@ -46,15 +79,23 @@ class SimplePetFinder:
         # Initialize feature extraction models
         # Primary visual feature extractor (EfficientNet provides better features than ResNet50)
         eff_weights = EfficientNet_B3_Weights.DEFAULT
-        self.feature_extractor = efficientnet_b3(weights=eff_weights)
+        self.feature_extractor = self._load_backbone(
+            efficientnet_b3, eff_weights, "efficientnet_weights"
+        )
         self.feature_extractor.classifier = torch.nn.Identity()
         self.feature_extractor.eval()
 
         # Secondary feature extractor for breed-specific features
-        weights = ResNet50_Weights.DEFAULT
-        self.secondary_extractor = resnet50(weights=weights)
-        self.secondary_extractor.fc = torch.nn.Identity()
-        self.secondary_extractor.eval()
+        if self.shared_backbone:
+            self.secondary_extractor = None
+            head_input_size = 1536  # EfficientNet-B3 pooled feature size
+        else:
+            self.secondary_extractor = self._load_backbone(
+                resnet50, ResNet50_Weights.DEFAULT, "resnet_weights"
+            )
+            self.secondary_extractor.fc = torch.nn.Identity()
+            self.secondary_extractor.eval()
+            head_input_size = 2048
 
         # Initialize transformations
         self.transform = transforms.Compose(
@@ -111,36 +152,143 @@ class SimplePetFinder:
         # Create breed, color, age, and size classification layers
         # In a real implementation, these would be trained models
         self.breed_classifier = self._create_classifier_layer(
-            2048, len(self.breed_mapping["cat"]) + len(self.breed_mapping["dog"])
+            head_input_size,
+            len(self.breed_mapping["cat"]) + len(self.breed_mapping["dog"]),
         )
         self.color_classifier = self._create_classifier_layer(
-            2048, len(self.color_options)
+            head_input_size, len(self.color_options)
         )
         self.age_classifier = self._create_classifier_layer(
-            2048, 3
+            head_input_size, 3
         )  # young, adult, senior
         self.size_classifier = self._create_classifier_layer(
-            2048, 3
+            head_input_size, 3
         )  # small, medium, large
 
         # Set the weights file paths - would exist in a real app
+        # Heads trained on EfficientNet features are stored with a suffix
+        suffix = "_effnet" if self.shared_backbone else ""
+        weights_dir = (
+            self.bundle.path
+            if self.bundle is not None
+            else os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+        )
         self.breed_weights_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "models", "breed_classifier.pt"
+            weights_dir, f"breed_classifier{suffix}.pt"
         )
         self.color_weights_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "models", "color_classifier.pt"
+            weights_dir, f"color_classifier{suffix}.pt"
         )
         self.age_size_weights_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)),
-            "models",
-            "age_size_classifier.pt",
+            weights_dir, f"age_size_classifier{suffix}.pt"
         )
 
         # Load weights if they exist
         self._load_classifier_weights()
 
+        # Run the four heads as one batched projection
+        self.attribute_heads = FusedClassifierHeads(
+            [
+                self.breed_classifier,
+                self.color_classifier,
+                self.age_classifier,
+                self.size_classifier,
+            ]
+        )
+        self.head_output_sizes = self.attribute_heads.output_sizes
+
+        if self.precision == "int8":
+            self._quantize_models()
+
+        # Swap eager modules for exported artifacts when a backend is configured
+        self.feature_extractor = self._wrap("feature_extractor", self.feature_extractor)
+        self.secondary_extractor = self._wrap(
+            "secondary_extractor", self.secondary_extractor
+        )
+        self.attribute_heads = self._wrap(
+            "attribute_heads", self.attribute_heads, f"attribute_heads{suffix}"
+        )
+
         logger.info("Models loaded successfully!")
 
+    @property
+    def feature_precision(self):
+        """Precision of the backbone that produces the search embedding"""
+        return "int8" if "feature_extractor" in self.quantized_modules else "fp32"
+
+    @property
+    def model_version(self):
+        return model_version(self.backend.name, self.precision, self.shared_backbone)
+
+    def _load_detector(self):
+        """Load YOLOv5 from the bundle, an exported artifact, a local file or the hub"""
+        exported_detector = self.backend.detector_path()
+
+        if self.bundle is not None:
+            path = exported_detector or self.bundle.yolov5_weights
+            logger.info(f"Loading YOLOv5 from the model bundle: {path}")
+            return torch.hub.load(
+                self.bundle.yolov5_repo, "custom", path=path, source="local"
+            )
+
+        model_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "yolov5s.pt"
+        )
+        if exported_detector:
+            logger.info(f"Loading exported YOLOv5 from: {exported_detector}")
+            return torch.hub.load(
+                "ultralytics/yolov5", "custom", path=exported_detector
+            )
+        if os.path.exists(model_path):
+            logger.info(f"Loading YOLOv5 from local file: {model_path}")
+            return torch.hub.load("ultralytics/yolov5", "custom", path=model_path)
+
+        logger.info("Loading YOLOv5 from torch hub")
+        return torch.hub.load("ultralytics/yolov5", "yolov5s", pretrained=True)
+
+    def _load_backbone(self, builder, weights, bundle_file):
+        """Build a torchvision backbone with bundled or downloaded weights"""
+        if self.bundle is None:
+            return builder(weights=weights)
+
+        model = builder(weights=None)
+        path = getattr(self.bundle, bundle_file)
+        model.load_state_dict(torch.load(path, map_location="cpu"))
+        logger.info(f"Loaded {builder.__name__} weights from the model bundle")
+        return model
+
+    def warm_up(self, batch_sizes=None):
+        """
+        Run every model on synthetic images so the first request is not slow
+
+        The first forward passes pay for lazy initialization, allocator growth
+        and JIT/graph optimization. Synthetic crops are used for the backbones
+        and heads since the detector finds no pets in noise.
+
+        Args:
+            batch_sizes: Batch sizes to warm up, 1 and CV_BATCH_MAX_SIZE by default
+        """
+        batch_sizes = batch_sizes or sorted({1, settings.CV_BATCH_MAX_SIZE})
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+        crop = Image.fromarray(image[:256, :256])
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            for batch_size in batch_sizes:
+                self.detector([image] * batch_size)
+                vectors = self.extract_features_batch([crop] * batch_size)
+                if self.shared_backbone:
+                    head_inputs = vectors
+                else:
+                    head_inputs = self._secondary_features_batch([crop] * batch_size)
+            self.estimate_pet_attributes(crop, "dog", features=head_inputs[0])
+
+        logger.info(
+            f"CV models warmed up for batch sizes {batch_sizes} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
     def _create_classifier_layer(self, input_size, output_size):
         """Create a classifier layer with the given input and output sizes"""
         classifier = torch.nn.Sequential(
@@ -152,6 +300,83 @@ class SimplePetFinder:
         classifier.eval()
         return classifier
 
+    def _quantize_models(self):
+        """
+        Quantize the backbones and the attribute heads to int8
+
+        The backbones are all convolutions, so dynamic quantization (Linear
+        only) would leave them untouched; they get static quantization
+        calibrated on CV_QUANT_CALIBRATION_DIR instead. Modules with an int8
+        artifact for the configured backend are left alone, the artifact
+        replaces them anyway.
+        """
+        backbones = [
+            name
+            for name in ("feature_extractor", "secondary_extractor")
+            if getattr(self, name) is not None and not self._has_artifact(name)
+        ]
+        batches = self._calibration_batches() if backbones else []
+        if backbones and not batches:
+            logger.warning(
+                "No calibration images in CV_QUANT_CALIBRATION_DIR, "
+                "the backbones stay fp32 and only the heads are int8"
+            )
+            backbones = []
+
+        for name in backbones:
+            logger.info(f"Quantizing {name} to int8 (static, calibrated)")
+            try:
+                setattr(
+                    self, name, quantize_static_module(getattr(self, name), batches)
+                )
+                self.quantized_modules.add(name)
+            except Exception as e:
+                logger.error(
+                    f"Error quantizing {name}, keeping it fp32: {e}",
+                    exc_info=True,
+                )
+
+        logger.info("Quantizing the attribute heads to int8 (dynamic)")
+        self.attribute_heads = quantize_dynamic_module(self.attribute_heads)
+        self.quantized_modules.add("attribute_heads")
+
+    def _calibration_batches(self):
+        """Transformed pet crops of the calibration images, in inference batches"""
+        paths = find_images(self.calibration_dir, settings.CV_QUANT_CALIBRATION_IMAGES)
+        tensors = []
+        for path in paths:
+            try:
+                image = self.load_image(path)
+                # Calibrate on what the backbones see in production: the crop
+                # of the most confident pet, or the whole image without one
+                pet_boxes = self._find_pet_boxes(self.detector([image]).xyxy[0])
+                crop = (
+                    self._crop(image, pet_boxes[0]["box"])
+                    if pet_boxes
+                    else Image.fromarray(image)
+                )
+                tensors.append(self.transform(crop))
+            except Exception as e:
+                logger.warning(f"Skipping calibration image {path}: {e}")
+
+        batch_size = max(1, settings.CV_BATCH_MAX_SIZE)
+        return [
+            torch.stack(tensors[i : i + batch_size])
+            for i in range(0, len(tensors), batch_size)
+        ]
+
+    def _has_artifact(self, artifact_name):
+        path = self.backend.artifact_path(artifact_name)
+        return path is not None and os.path.exists(path)
+
+    def _wrap(self, name, module, artifact_name=None):
+        """Let the backend replace a module, and track whether it runs in int8"""
+        wrapped = self.backend.wrap(artifact_name or name, module)
+        if wrapped is not module and self.precision == "int8":
+            # Exported int8 artifacts are quantized (see app/cv/export.py)
+            self.quantized_modules.add(name)
+        return wrapped
+
     def _load_classifier_weights(self):
         """Load pre-trained weights for classifiers if they exist"""
         try:
@@ -182,63 +407,202 @@ class SimplePetFinder:
             # Initialize with pre-trained weights or continue with random initialization
             pass
 
-    def detect_pet(self, image_path):
+    def load_image(self, source):
+        """
+        Decode an image once into an RGB array shared by the whole pipeline
+
+        Args:
+            source: Path, raw bytes, file-like object, PIL Image or RGB array
+
+        Returns:
+            HxWx3 uint8 NumPy array in RGB order
+        """
+        if isinstance(source, np.ndarray):
+            return source
+
+        if isinstance(source, Image.Image):
+            img = source
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            img = Image.open(io.BytesIO(source))
+        else:
+            img = Image.open(source)
+
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return np.asarray(img)
+
+    def detect_pet(self, image):
         """
         Detect and extract a pet from an image
 
         Args:
-            image_path: Path to the image file
+            image: Path to the image file or an already decoded RGB array
 
         Returns:
             Tuple of (cropped pet image, pet class, attributes)
         """
-        try:
-            results = self.detector(image_path)
-
-            if len(results.xyxy[0]) == 0:
-                logger.warning(f"No pets detected in the image: {image_path}")
-                return None, None, None
-
-            pet_boxes = []
-            for detection in results.xyxy[0]:
-                if int(detection[5]) in self.pet_classes:
-                    pet_boxes.append(
-                        {
-                            "box": detection[:4].cpu().numpy(),  # x1, y1, x2, y2
-                            "conf": detection[4].item(),
-                            "class": "dog" if int(detection[5]) == 16 else "cat",
-                            "class_id": int(detection[5]),
-                        }
-                    )
+        result = self.analyze(image, extract_features=False)
+        return result["crop"], result["species"], result["attributes"]
+
+    def analyze(self, image, extract_features=True):
+        """
+        Run detection, cropping, attribute estimation and embedding on one image
+
+        Args:
+            image: Path, bytes, PIL Image or decoded RGB array
+            extract_features: Whether to compute the search embedding
 
-            if not pet_boxes:
-                logger.warning(f"No pets detected in the image: {image_path}")
-                return None, None, None
+        Returns:
+            Analysis dictionary, see analyze_batch
+        """
+        return self.analyze_batch([image], extract_features=extract_features)[0]
+
+    def analyze_batch(self, images, extract_features=True):
+        """
+        Run the full CV pipeline on several images, decoding each of them once
 
-            # Sort by confidence and get the best detection
-            pet_boxes.sort(key=lambda x: x["conf"], reverse=True)
-            best_box = pet_boxes[0]
+        The detector and the feature extractor each run one forward pass for
+        the whole batch. Cropping, attribute estimation and embedding all reuse
+        the decoded array.
 
-            img = Image.open(image_path)
-            x1, y1, x2, y2 = best_box["box"]
-            cropped_pet = img.crop((int(x1), int(y1), int(x2), int(y2)))
+        Args:
+            images: List of paths, bytes, PIL Images or decoded RGB arrays
+            extract_features: Whether to compute the search embeddings
 
-            # Determine attributes for the detected pet
-            attributes = self.estimate_pet_attributes(cropped_pet, best_box["class"])
+        Returns:
+            List of dictionaries with keys ``species``, ``confidence``,
+            ``bounding_box``, ``boxes``, ``crop``, ``attributes`` and
+            ``feature_vector`` (``None`` values when no pet was found)
+        """
+        if not images:
+            return []
 
-            return cropped_pet, best_box["class"], attributes
+        outputs = [self._empty_analysis() for _ in images]
+        arrays = [None] * len(images)
+        for i, image in enumerate(images):
+            try:
+                arrays[i] = self.load_image(image)
+            except Exception as e:
+                logger.error(f"Error decoding image {i}: {e}", exc_info=True)
 
+        decoded = [i for i, array in enumerate(arrays) if array is not None]
+        if not decoded:
+            return outputs
+
+        try:
+            results = self.detector([arrays[i] for i in decoded])
         except Exception as e:
-            logger.error(f"Error processing image {image_path}: {e}", exc_info=True)
-            return None, None, None
+            logger.error(f"Error running pet detection: {e}", exc_info=True)
+            return outputs
 
-    def estimate_pet_attributes(self, pet_image, pet_class):
+        crops = [None] * len(images)
+        classes = [None] * len(images)
+        for i, detections in zip(decoded, results.xyxy):
+            try:
+                pet_boxes = self._find_pet_boxes(detections)
+                if not pet_boxes:
+                    logger.warning(f"No pets detected in image {i}")
+                    continue
+
+                best_box = pet_boxes[0]
+                crops[i] = self._crop(arrays[i], best_box["box"])
+                classes[i] = best_box["class"]
+
+                outputs[i].update(
+                    {
+                        "species": best_box["class"],
+                        "confidence": best_box["conf"],
+                        "bounding_box": [int(v) for v in best_box["box"]],
+                        "boxes": [
+                            {
+                                "species": box["class"],
+                                "confidence": box["conf"],
+                                "bounding_box": [int(v) for v in box["box"]],
+                            }
+                            for box in pet_boxes
+                        ],
+                        "crop": crops[i],
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error processing image {i}: {e}", exc_info=True)
+
+        # One backbone pass per model for the whole batch. In shared-backbone
+        # mode the embedding doubles as the attribute head input.
+        vectors = [None] * len(images)
+        if extract_features or self.shared_backbone:
+            vectors = self.extract_features_batch(crops)
+        if self.shared_backbone:
+            head_inputs = vectors
+        else:
+            try:
+                head_inputs = self._secondary_features_batch(crops)
+            except Exception as e:
+                logger.error(f"Error extracting attribute features: {e}", exc_info=True)
+                head_inputs = [None] * len(images)
+
+        for i, cropped_pet in enumerate(crops):
+            if cropped_pet is None:
+                continue
+            outputs[i]["attributes"] = self.estimate_pet_attributes(
+                cropped_pet, classes[i], features=head_inputs[i]
+            )
+            if extract_features:
+                outputs[i]["feature_vector"] = vectors[i]
+                if vectors[i] is not None:
+                    # Stored with the photo so vectors of different precision
+                    # are never compared without a warning
+                    outputs[i]["attributes"][
+                        "feature_precision"
+                    ] = self.feature_precision
+
+        return outputs
+
+    def _empty_analysis(self):
+        return {
+            "species": None,
+            "confidence": 0.0,
+            "bounding_box": None,
+            "boxes": [],
+            "crop": None,
+            "attributes": None,
+            "feature_vector": None,
+        }
+
+    def _find_pet_boxes(self, detections):
+        """Return pet detections sorted by confidence, most confident first"""
+        pet_boxes = []
+        for detection in detections:
+            if int(detection[5]) in self.pet_classes:
+                pet_boxes.append(
+                    {
+                        "box": detection[:4].cpu().numpy(),  # x1, y1, x2, y2
+                        "conf": detection[4].item(),
+                        "class": "dog" if int(detection[5]) == 16 else "cat",
+                        "class_id": int(detection[5]),
+                    }
+                )
+
+        pet_boxes.sort(key=lambda x: x["conf"], reverse=True)
+        return pet_boxes
+
+    def _crop(self, image, box):
+        """Crop a detection box out of a decoded RGB array"""
+        height, width = image.shape[:2]
+        x1, y1, x2, y2 = box
+        x1, x2 = max(0, int(x1)), min(width, int(x2))
+        y1, y2 = max(0, int(y1)), min(height, int(y2))
+        return Image.fromarray(image[y1:y2, x1:x2])
+
+    def estimate_pet_attributes(self, pet_image, pet_class, features=None):
         """
         Estimate pet attributes like breed, color, age and size using neural networks
 
         Args:
             pet_image: PIL Image of the cropped pet
             pet_class: Class of the pet ('dog' or 'cat')
+            features: Optional precomputed backbone features for the crop
 
         Returns:
             Dictionary of attributes
@@ -247,20 +611,17 @@ class SimplePetFinder:
             return {}
 
         try:
-            # Extract features using the secondary extractor
-            img_tensor = self.transform(pet_image).unsqueeze(0)
+            if features is None:
+                features = self._secondary_features_batch([pet_image])[0]
 
             with torch.no_grad():
-                features = self.secondary_extractor(img_tensor)
-                feature_vector = features.squeeze()
+                feature_vector = torch.as_tensor(features, dtype=torch.float32)
 
-                # Determine which breed set to use based on pet class
-                breed_offset = 0
-                if pet_class == "dog":
-                    breed_offset = len(self.breed_mapping["cat"])
-
-                # Get breed prediction
-                breed_logits = self.breed_classifier(feature_vector).detach().cpu()
+                # All four heads in one fused projection
+                logits = self.attribute_heads(feature_vector.reshape(1, -1))
+                breed_logits, color_logits, age_logits, size_logits = torch.split(
+                    logits[0].detach().cpu(), self.head_output_sizes
+                )
 
                 # Adjust indices based on pet class
                 if pet_class == "cat":
@@ -278,27 +639,27 @@ class SimplePetFinder:
                     breed_confidence = float(breed_probs[breed_idx])
 
                 # Get color prediction based on image analysis and classifier
-                color_logits = self.color_classifier(feature_vector).detach().cpu()
                 color_probs = torch.softmax(color_logits, dim=0)
                 color_idx = torch.argmax(color_probs).item()
                 color = self.color_options[color_idx]
                 color_confidence = float(color_probs[color_idx])
 
                 # Get additional color through image analysis
-                additional_color = self.analyze_pet_colors(pet_image)
+                color_analysis = self.analyze_pet_color_histogram(pet_image)
+                additional_color = (
+                    color_analysis["dominant"] if color_analysis else None
+                )
                 colors = [{"name": color, "confidence": color_confidence}]
                 if additional_color and additional_color != color:
                     colors.append({"name": additional_color, "confidence": 0.7})
 
                 # Get age prediction
-                age_logits = self.age_classifier(feature_vector).detach().cpu()
                 age_probs = torch.softmax(age_logits, dim=0)
                 age_idx = torch.argmax(age_probs).item()
                 ages = ["young", "adult", "senior"]
                 age = ages[age_idx]
 
                 # Get size prediction
-                size_logits = self.size_classifier(feature_vector).detach().cpu()
                 size_probs = torch.softmax(size_logits, dim=0)
                 size_idx = torch.argmax(size_probs).item()
                 sizes = ["small", "medium", "large"]
@@ -311,6 +672,8 @@ class SimplePetFinder:
                     "estimated_size": size,
                     "confidence": float(breed_confidence * color_confidence),
                 }
+                if color_analysis:
+                    attributes["color_histogram"] = color_analysis["histogram"]
 
                 return attributes
 
@@ -340,6 +703,21 @@ class SimplePetFinder:
         Returns:
             Dominant color name
         """
+        result = self.analyze_pet_color_histogram(pet_image)
+        return result["dominant"] if result else None
+
+    def analyze_pet_color_histogram(self, pet_image):
+        """
+        Classify every pixel of the pet image against the fur color rules
+
+        Args:
+            pet_image: PIL Image of the pet
+
+        Returns:
+            Dictionary with the ``dominant`` color name and a ``histogram`` of
+            the share of pixels matching each color (rules overlap, so shares
+            can add up to more than 1), or None on error
+        """
         try:
             # Resize for faster processing
             resized_img = pet_image.resize((100, 100))
@@ -348,43 +726,17 @@ class SimplePetFinder:
             if resized_img.mode != "RGB":
                 resized_img = resized_img.convert("RGB")
 
-            # Extract pixels
-            pixels = list(resized_img.getdata())
-
-            # Define color ranges - (R, G, B) ranges for common pet colors
-            color_ranges = {
-                "black": lambda r, g, b: r < 50 and g < 50 and b < 50,
-                "white": lambda r, g, b: r > 200 and g > 200 and b > 200,
-                "gray": lambda r, g, b: abs(r - g) < 20
-                and abs(g - b) < 20
-                and abs(r - b) < 20
-                and 50 <= r <= 200,
-                "brown": lambda r, g, b: r > g + 20
-                and r > b + 20
-                and g < 150
-                and b < 150,
-                "golden": lambda r, g, b: r > 180 and g > 140 and b < 100,
-                "cream": lambda r, g, b: r > 200 and g > 180 and b > 150,
-                "orange": lambda r, g, b: r > 180 and 100 < g < 150 and b < 100,
-                "tabby": lambda r, g, b: 130 < r < 180
-                and 100 < g < 150
-                and 50 < b < 100,
-            }
+            pixels = np.asarray(resized_img)
+            counts = color_counts(pixels)
+            total = pixels.shape[0] * pixels.shape[1]
 
-            # Count pixels in each color range
-            color_counts = {color: 0 for color in color_ranges}
-            for r, g, b in pixels:
-                for color, color_range in color_ranges.items():
-                    if color_range(r, g, b):
-                        color_counts[color] += 1
+            # Fallback to the original color options when no rule matches
+            dominant = dominant_color(counts) or self.color_options[0]
 
-            # Get the dominant color
-            dominant_color = max(color_counts.items(), key=lambda x: x[1])
-            if dominant_color[1] > 0:
-                return dominant_color[0]
-
-            # Fallback to the original color options
-            return self.color_options[0]
+            return {
+                "dominant": dominant,
+                "histogram": color_histogram(counts, total),
+            }
 
         except Exception as e:
             logger.error(f"Error analyzing pet colors: {e}", exc_info=True)
@@ -419,6 +771,65 @@ class SimplePetFinder:
             logger.error(f"Error extracting features: {e}", exc_info=True)
             return None
 
+    def extract_features_batch(self, images):
+        """
+        Extract features from several pet images with one forward pass
+
+        Args:
+            images: List of PIL Images of pets (None entries are skipped)
+
+        Returns:
+            List of feature vectors as NumPy arrays (None where extraction failed)
+        """
+        outputs = [None] * len(images)
+        indices = [i for i, image in enumerate(images) if image is not None]
+        if not indices:
+            return outputs
+
+        try:
+            batch = torch.stack([self.transform(images[i]) for i in indices])
+
+            with torch.no_grad():
+                features = self.feature_extractor(batch)
+
+            features = features.reshape(len(indices), -1).cpu().numpy()
+            for row, i in enumerate(indices):
+                outputs[i] = features[row]
+            return outputs
+
+        except Exception as e:
+            logger.error(f"Error extracting batched features: {e}", exc_info=True)
+            return outputs
+
+    def _secondary_features_batch(self, images):
+        """
+        Compute attribute head inputs for several crops with one forward pass
+
+        Uses ResNet50, or EfficientNet-B3 in shared-backbone mode.
+
+        Args:
+            images: List of PIL Images of pets (None entries are skipped)
+
+        Returns:
+            List of feature vectors as NumPy arrays (None where extraction failed)
+        """
+        if self.shared_backbone:
+            return self.extract_features_batch(images)
+
+        outputs = [None] * len(images)
+        indices = [i for i, image in enumerate(images) if image is not None]
+        if not indices:
+            return outputs
+
+        batch = torch.stack([self.transform(images[i]) for i in indices])
+        with torch.no_grad():
+            features = self.secondary_extractor(batch)
+
+        features = features.reshape(len(indices), -1).cpu().numpy()
+        for row, i in enumerate(indices):
+            outputs[i] = features[row]
+        return outputs
+
     def compare_pets(
         self,
         features1,
@@ -495,6 +906,8 @@ class SimplePetFinder:
 
         # Visual similarity (cosine similarity between feature vectors)
         try:
+            from sklearn.metrics.pairwise import cosine_similarity
+
             scores["visual"] = float(cosine_similarity(f1, f2)[0][0])
         except Exception as e:
             logger.error(f"Error calculating cosine similarity: {e}")
@@ -561,14 +974,23 @@ class SimplePetFinder:
                 ):
                     # Calculate distance in km
                     try:
-                        distance = geodesic(location1, location2).kilometers
+                        from app.cv.scoring import haversine_km
+
+                        distance = float(
+                            haversine_km(
+                                float(location1[0]),
+                                float(location1[1]),
+                                float(location2[0]),
+                                float(location2[1]),
+                            )
+                        )
                         # Convert distance to similarity (1 when distance=0, approaching 0 as distance increases)
                         max_relevant_distance = 50  # km
                         scores["location"] = max(
                             0, 1 - (distance / max_relevant_distance)
                         )
                     except Exception as e:
-                        logger.error(f"Error calculating geodesic distance: {e}")
+                        logger.error(f"Error calculating distance: {e}")
                         scores["location"] = 0
                 else:
                     logger.warning(
@@ -0,0 +1,230 @@
+"""
+Int8 quantization helpers and the calibration/validation command
+
+Usage:
+    python -m app.cv.quantization --images ./samples --calibration ./calibration \
+        [--limit 200] [--min-cosine 0.98]
+
+In int8 mode the convolutional backbones get post-training static
+quantization: observers record activation ranges on the calibration images
+(CV_QUANT_CALIBRATION_DIR) before Conv layers are converted to int8 kernels.
+The fused attribute heads are plain Linear layers and get dynamic
+quantization. Without calibration images the backbones stay fp32.
+
+The command embeds the sample images with the fp32 and the int8 models and
+reports the cosine drift between the vectors and the speedup.
+"""
+
+import os
+import glob
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "int8")
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.webp")
+QUANTIZED_ENGINES = ("x86", "fbgemm", "qnnpack")
+
+
+def find_images(directory, limit=None):
+    """Sorted image paths in a directory, at most ``limit`` of them"""
+    if not directory:
+        return []
+    paths = sorted(
+        path
+        for pattern in IMAGE_PATTERNS
+        for path in glob.glob(os.path.join(directory, pattern))
+    )
+    return paths[:limit] if limit else paths
+
+
+def quantized_engine():
+    """The best int8 kernel library of this torch build, or None"""
+    import torch
+
+    supported = torch.backends.quantized.supported_engines
+    return next((engine for engine in QUANTIZED_ENGINES if engine in supported), None)
+
+
+def quantize_dynamic_module(module):
+    """Quantize the Linear layers of a module to int8 with dynamic activations"""
+    import torch
+
+    if module is None:
+        return None
+    quantized = torch.ao.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    quantized.eval()
+    return quantized
+
+
+def quantize_static_module(module, calibration_batches):
+    """
+    Quantize a convolutional backbone to int8 with post-training calibration
+
+    The module is traced with torch.fx and run on the calibration batches so
+    the observers see real activation ranges, then Conv and Linear layers are
+    converted to int8 kernels. Ops without an int8 kernel (SiLU, sigmoid) run
+    in fp32 between dequantize and quantize steps.
+    """
+    import copy
+
+    import torch
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    if module is None:
+        return None
+    if not calibration_batches:
+        raise ValueError("Static quantization needs at least one calibration batch")
+
+    engine = quantized_engine()
+    if engine is None:
+        raise RuntimeError("This torch build has no quantized engine")
+    torch.backends.quantized.engine = engine
+
+    prepared = prepare_fx(
+        copy.deepcopy(module).eval(),
+        get_default_qconfig_mapping(engine),
+        example_inputs=(calibration_batches[0],),
+    )
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+
+    quantized = convert_fx(prepared)
+    quantized.eval()
+    return quantized
+
+
+def quantize_onnx_artifact(source_path, target_path):
+    """Write an int8 copy of an fp32 ONNX artifact (Conv and MatMul weights)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QInt8)
+    return target_path
+
+
+def _cosine(a, b):
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / denom) if denom else 0.0
+
+
+def _timed_analysis(pet_finder, images, batch_size):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        results.extend(pet_finder.analyze_batch(images[i : i + batch_size]))
+    return results, time.perf_counter() - start
+
+
+def validate(image_paths, batch_size=8, backend=None, calibration_dir=None):
+    """
+    Compare fp32 and int8 embeddings on a sample image set
+
+    Returns:
+        Dictionary with the int8 modules, cosine drift statistics, attribute
+        agreement and timings
+    """
+    from app.cv.pet_finder import SimplePetFinder
+
+    fp32_finder = SimplePetFinder(precision="fp32", backend=backend)
+    int8_finder = SimplePetFinder(
+        precision="int8", backend=backend, calibration_dir=calibration_dir
+    )
+
+    images = [fp32_finder.load_image(path) for path in image_paths]
+
+    # Warm both models up so the timings exclude one-off allocations
+    fp32_finder.analyze_batch(images[:1])
+    int8_finder.analyze_batch(images[:1])
+
+    fp32_results, fp32_seconds = _timed_analysis(fp32_finder, images, batch_size)
+    int8_results, int8_seconds = _timed_analysis(int8_finder, images, batch_size)
+
+    cosines = []
+    breed_matches = 0
+    for fp32, int8 in zip(fp32_results, int8_results):
+        if fp32["feature_vector"] is None or int8["feature_vector"] is None:
+            continue
+        cosines.append(_cosine(fp32["feature_vector"], int8["feature_vector"]))
+        if fp32["attributes"]["breed"]["name"] == int8["attributes"]["breed"]["name"]:
+            breed_matches += 1
+
+    cosines = np.array(cosines) if cosines else np.zeros(0)
+    return {
+        "int8_modules": sorted(int8_finder.quantized_modules),
+        "feature_precision": int8_finder.feature_precision,
+        "images": len(images),
+        "compared": int(cosines.size),
+        "cosine_mean": float(cosines.mean()) if cosines.size else None,
+        "cosine_min": float(cosines.min()) if cosines.size else None,
+        "cosine_p5": float(np.percentile(cosines, 5)) if cosines.size else None,
+        "breed_agreement": breed_matches / cosines.size if cosines.size else None,
+        "fp32_seconds": fp32_seconds,
+        "int8_seconds": int8_seconds,
+        "speedup": fp32_seconds / int8_seconds if int8_seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate int8 quantization of the PetRadar CV models"
+    )
+    parser.add_argument("--images", required=True, help="Directory of sample images")
+    parser.add_argument(
+        "--calibration",
+        default=settings.CV_QUANT_CALIBRATION_DIR,
+        help="Directory of calibration images, kept apart from --images",
+    )
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument(
+        "--min-cosine",
+        type=float,
+        default=0.98,
+        help="Fail if the mean fp32/int8 cosine similarity is below this value",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    image_paths = find_images(args.images, args.limit)
+    if not image_paths:
+        raise SystemExit(f"No images found in {args.images}")
+
+    report = validate(
+        image_paths,
+        batch_size=args.batch_size,
+        backend=args.backend,
+        calibration_dir=args.calibration,
+    )
+    for key, value in report.items():
+        logger.info(f"{key}: {value}")
+
+    if report["feature_precision"] != "int8":
+        raise SystemExit(
+            "The embedding backbone was not quantized; "
+            "pass --calibration or set CV_QUANT_CALIBRATION_DIR"
+        )
+
+    if report["cosine_mean"] is None or report["cosine_mean"] < args.min_cosine:
+        raise SystemExit(
+            f"Embedding drift too high: mean cosine {report['cosine_mean']} "
+            f"< {args.min_cosine}"
+        )
+
+
+if __name__ == "__main__":
+    main()
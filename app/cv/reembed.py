@@ -0,0 +1,287 @@
+"""
+Re-run detection and embedding for every stored photo
+
+Usage:
+    python -m app.cv.reembed [--tables petphoto foundpet] [--workers 4]
+    python -m app.cv.reembed --stale-only --checkpoint reembed.json
+    python -m app.cv.reembed --restart
+
+Needed after a change to the backbone or to SimplePetFinder.transform, which
+makes every stored ``feature_vector`` stale. Rows are streamed in primary key
+order and analyzed in batches across CV worker processes. Results are written
+in one transaction per --commit-size rows, together with a checkpoint of the
+last written id, so an interrupted run resumes where it stopped.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("petphoto", "foundpet")
+DEFAULT_CHECKPOINT = "reembed_checkpoint.json"
+
+
+def _table_spec(table: str):
+    """Model and image path column of a table"""
+    from app.models.pet_photo import PetPhoto
+    from app.models.found_pet import FoundPet
+
+    return {
+        "petphoto": (PetPhoto, PetPhoto.path),
+        "foundpet": (FoundPet, FoundPet.photo_path),
+    }[table]
+
+
+def _reembed_task(paths: List[str]) -> List[Optional[Tuple[Dict[str, Any], bytes]]]:
+    """Analyze a batch of images in a worker, bypassing the analysis cache"""
+    from app.cv.registry import get_pet_finder
+    from app.cv.embedding import encode_embedding
+
+    pet_finder = get_pet_finder()
+    images = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                images.append(f.read())
+        except OSError as e:
+            logger.warning(f"Could not read {path}: {e}")
+            images.append(None)
+
+    results = [None] * len(paths)
+    readable = [i for i, image in enumerate(images) if image is not None]
+    analyses = pet_finder.analyze_batch([images[i] for i in readable])
+    for i, analysis in zip(readable, analyses):
+        if analysis["species"] is None or analysis["feature_vector"] is None:
+            continue
+        results[i] = (
+            analysis["attributes"],
+            encode_embedding(analysis["feature_vector"]),
+        )
+    return results
+
+
+class Checkpoint:
+    """Last written id per table, saved atomically to a JSON file"""
+
+    def __init__(self, path: str, model_id: str):
+        self.path = path
+        self.model_id = model_id
+        self.state: Dict[str, Any] = {"model_id": model_id, "tables": {}}
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        if state.get("model_id") != self.model_id:
+            logger.warning(
+                f"Ignoring checkpoint for model {state.get('model_id')}, "
+                f"re-embedding for {self.model_id} from the start"
+            )
+            return
+        self.state = state
+
+    def last_id(self, table: str) -> Optional[str]:
+        return self.state["tables"].get(table, {}).get("last_id")
+
+    def done(self, table: str) -> bool:
+        return self.state["tables"].get(table, {}).get("done", False)
+
+    def update(self, table: str, **values) -> None:
+        self.state["tables"].setdefault(table, {}).update(values)
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+class Reembedder:
+    def __init__(
+        self,
+        checkpoint: Checkpoint,
+        workers: int,
+        batch_size: int,
+        commit_size: int,
+        stale_only: bool,
+    ):
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.batch_size = batch_size
+        self.commit_size = commit_size
+        self.stale_only = stale_only
+        self.processed = 0
+        self.updated = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / max(time.perf_counter() - self.started, 1e-9)
+
+    def run(self, tables: List[str]) -> None:
+        from app.cv.workers import _init_worker
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        ) as executor:
+            for table in tables:
+                if self.checkpoint.done(table):
+                    logger.info(f"{table}: already re-embedded, skipping")
+                    continue
+                self._run_table(executor, table)
+
+        logger.info(
+            f"Re-embedded {self.updated} of {self.processed} images "
+            f"({self.failed} failed, {self.skipped} already current) "
+            f"at {self.throughput:.1f} images/s"
+        )
+
+    def _run_table(self, executor, table: str) -> None:
+        from app.core.database import SessionLocal
+
+        model, path_column = _table_spec(table)
+        after = self.checkpoint.last_id(table)
+        if after:
+            logger.info(f"{table}: resuming after id {after}")
+
+        db = SessionLocal()
+        try:
+            while True:
+                rows = self._page(db, model, path_column, after)
+                if not rows:
+                    break
+                after = str(rows[-1][0])
+
+                pending = [
+                    (row_id, path)
+                    for row_id, path, vector in rows
+                    if not self._current(vector)
+                ]
+                self.skipped += len(rows) - len(pending)
+                updates = self._analyze(executor, pending)
+                self._write(db, model, updates)
+                self.checkpoint.update(table, last_id=after)
+
+                logger.info(
+                    f"{table}: {self.processed} images, {self.updated} updated, "
+                    f"{self.throughput:.1f} images/s"
+                )
+            self.checkpoint.update(table, done=True)
+        finally:
+            db.close()
+
+    def _page(self, db, model, path_column, after: Optional[str]):
+        query = db.query(model.id, path_column, model.feature_vector)
+        if after is not None:
+            query = query.filter(model.id > uuid.UUID(after))
+        return query.order_by(model.id).limit(self.commit_size).all()
+
+    def _current(self, vector: Optional[bytes]) -> bool:
+        if not self.stale_only or not vector:
+            return False
+        from app.cv.embedding import decode_embedding, EmbeddingFormatError
+
+        try:
+            return decode_embedding(vector).model_id == self.checkpoint.model_id
+        except EmbeddingFormatError:
+            return False
+
+    def _analyze(self, executor, rows) -> List[Dict[str, Any]]:
+        batches = [
+            rows[start : start + self.batch_size]
+            for start in range(0, len(rows), self.batch_size)
+        ]
+        futures = [
+            executor.submit(_reembed_task, [path for _, path in batch])
+            for batch in batches
+        ]
+
+        updates = []
+        for batch, future in zip(batches, futures):
+            for (row_id, _), result in zip(batch, future.result()):
+                self.processed += 1
+                if result is None:
+                    self.failed += 1
+                    continue
+                attributes, vector = result
+                updates.append(
+                    {
+                        "id": row_id,
+                        "detected_attributes": attributes,
+                        "feature_vector": vector,
+                    }
+                )
+        return updates
+
+    def _write(self, db, model, updates: List[Dict[str, Any]]) -> None:
+        if not updates:
+            return
+        from sqlalchemy import update
+
+        # Bulk UPDATE by primary key, one transaction per page
+        db.execute(update(model), updates)
+        db.commit()
+        self.updated += len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed every stored photo")
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=list(TABLES))
+    parser.add_argument(
+        "--workers", type=int, default=settings.CV_WORKER_PROCESSES or 1
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.CV_BATCH_MAX_SIZE,
+        help="Images per model forward pass",
+    )
+    parser.add_argument(
+        "--commit-size", type=int, default=256, help="Rows per write transaction"
+    )
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint and start over"
+    )
+    parser.add_argument(
+        "--stale-only",
+        action="store_true",
+        help="Skip rows already embedded by the current model",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    from app.cv.embedding import embedding_model_id
+
+    checkpoint = Checkpoint(args.checkpoint, embedding_model_id())
+    if not args.restart:
+        checkpoint.load()
+
+    Reembedder(
+        checkpoint,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        commit_size=args.commit_size,
+        stale_only=args.stale_only,
+    ).run(args.tables)
+
+
+if __name__ == "__main__":
+    main()
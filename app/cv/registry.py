@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Process-wide model cache. Loading YOLOv5/EfficientNet/ResNet takes seconds and
+# hundreds of MB, so every service and endpoint shares the same instances.
+_models: Dict[str, Any] = {}
+# One lock per name, so a slow load only blocks lookups of the same model.
+# _lock is held just long enough to find or create that lock.
+_locks: Dict[str, threading.RLock] = {}
+_lock = threading.Lock()
+
+
+def _model_lock(name: str) -> threading.RLock:
+    with _lock:
+        lock = _locks.get(name)
+        if lock is None:
+            lock = _locks[name] = threading.RLock()
+        return lock
+
+
+def get_model(name: str, loader: Callable[[], Any]) -> Any:
+    """
+    Return the model registered under ``name``, loading it on first use
+
+    Args:
+        name: Registry key of the model
+        loader: Callable that builds the model if it is not loaded yet
+
+    Returns:
+        The shared model instance
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _model_lock(name):
+        model = _models.get(name)
+        if model is None:
+            logger.info(f"Loading model '{name}' into the registry")
+            model = loader()
+            _models[name] = model
+        return model
+
+
+def is_loaded(name: str) -> bool:
+    return name in _models
+
+
+def unload_model(name: str) -> None:
+    with _model_lock(name):
+        _models.pop(name, None)
+
+
+def clear_models() -> None:
+    for name in list(_models):
+        unload_model(name)
+
+
+async def get_model_async(getter: Callable[[], Any]) -> Any:
+    """
+    Call a registry getter from async code without blocking the event loop
+
+    A getter may load its model, which takes seconds, or wait for another
+    thread loading it, so it runs in a worker thread.
+    """
+    return await asyncio.to_thread(getter)
+
+
+def get_pet_finder():
+    """Return the process-wide SimplePetFinder instance"""
+    from app.cv.pet_finder import SimplePetFinder
+
+    return get_model("pet_finder", SimplePetFinder)
+
+
+def get_inference_scheduler():
+    """
+    Return the process-wide scheduler running the CV pipeline
+
+    This is an InferenceScheduler bound to the shared pet finder, or the CV
+    worker pool when CV_EXECUTION_MODE is "process". Both expose ``analyze``
+    and ``analyze_async``.
+    """
+    from app.cv.workers import uses_worker_processes
+
+    if uses_worker_processes():
+        return get_cv_workers()
+
+    from app.cv.batching import InferenceScheduler
+
+    return get_model(
+        "inference_scheduler", lambda: InferenceScheduler(get_pet_finder())
+    )
+
+
+def get_cv_workers():
+    """Return the process-wide CVWorkerPool"""
+    from app.cv.workers import CVWorkerPool
+
+    return get_model("cv_workers", CVWorkerPool)
+
+
+def get_analysis_cache():
+    """Return the process-wide AnalysisCache for the configured models"""
+    from app.cv.cache import AnalysisCache, default_model_version
+
+    return get_model("analysis_cache", lambda: AnalysisCache(default_model_version()))
+
+
+def get_lost_pet_index():
+    """Return the process-wide LostPetIndex of lost pet embeddings"""
+    from app.cv.index import LostPetIndex
+
+    return get_model("lost_pet_index", LostPetIndex)
+
+
+def get_found_pet_index():
+    """Return the process-wide FoundPetIndex of found pet embeddings"""
+    from app.cv.index import FoundPetIndex
+
+    return get_model("found_pet_index", FoundPetIndex)
+
+
+def warm_up_models() -> None:
+    """Load the CV models and run them once on synthetic images"""
+    from app.cv.workers import uses_worker_processes
+
+    if uses_worker_processes():
+        get_cv_workers().warm_up()
+        return
+
+    get_pet_finder().warm_up()
+    get_inference_scheduler()
@@ -0,0 +1,274 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+# Distance and time gap at which the location and time scores reach zero
+MAX_RELEVANT_DISTANCE_KM = 50
+MAX_RELEVANT_DAYS = 30
+
+COMPONENTS = ["visual", "attribute", "location", "time"]
+
+# Attributes compared for equality, with the score of a mismatch
+EXACT_ATTRIBUTES = {
+    "breed": 0.0,
+    "estimated_age": 0.5,
+    "estimated_size": 0.5,
+}
+MATCHING_FEATURE_NAMES = {
+    "breed": "breed",
+    "colors": "color",
+    "estimated_age": "age",
+    "estimated_size": "size",
+}
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km, broadcasting over array arguments"""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(value, dtype=np.float64))
+        for value in (lat1, lon1, lat2, lon2)
+    )
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def normalize_weights(weights: Optional[Dict[str, float]], defaults: Dict[str, float]):
+    """Fill in missing components and scale the weights to sum to 1"""
+    weights = dict(weights) if weights is not None else dict(defaults)
+    for component in COMPONENTS:
+        if component not in weights:
+            weights[component] = defaults.get(component, 0.25)
+
+    total = sum(weights.values())
+    if total != 1:
+        for k in weights:
+            weights[k] /= total
+    return weights
+
+
+def _is_coordinate(location) -> bool:
+    return isinstance(location, (list, tuple)) and len(location) == 2
+
+
+class BatchScorer:
+    """
+    Scores one source pet against many candidates at once
+
+    Target vectors are stacked into one matrix and attributes are encoded
+    as integer codes, so each similarity component is a handful of array
+    operations over all candidates. The scores are those of
+    SimplePetFinder.compare_pets for every (source, target) pair.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+
+    def score(
+        self,
+        source: np.ndarray,
+        targets: Sequence[np.ndarray],
+        source_attrs: Optional[Dict[str, Any]] = None,
+        target_attrs_list: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+        source_location=None,
+        target_locations: Optional[Sequence] = None,
+        source_date=None,
+        target_dates: Optional[Sequence] = None,
+        normalized: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Compute every similarity component for all targets
+
+        The optional per-target sequences are aligned with ``targets``. With
+        ``normalized`` the vectors are known to be unit length (or zero) and
+        the visual similarity is a plain dot product.
+
+        Returns:
+            Dictionary of float64 arrays keyed by component and "overall",
+            plus boolean "matches" arrays per compared attribute
+        """
+        n = len(targets)
+        visual, valid = self._visual(source, targets, normalized)
+        scores = {
+            "visual": visual,
+            "attribute": np.zeros(n),
+            "location": np.zeros(n),
+            "time": np.zeros(n),
+        }
+        matches: Dict[str, np.ndarray] = {}
+
+        if source_attrs and target_attrs_list is not None:
+            scores["attribute"], matches = self._attributes(
+                source_attrs, target_attrs_list
+            )
+        if source_location and target_locations is not None:
+            scores["location"] = self._location(source_location, target_locations)
+        if source_date and target_dates is not None:
+            scores["time"] = self._time(source_date, target_dates)
+
+        # Pairs with mismatched vector dimensions score zero on every component
+        for component in COMPONENTS:
+            scores[component] = np.where(valid, scores[component], 0.0)
+
+        scores["overall"] = sum(self.weights[k] * scores[k] for k in self.weights)
+        scores["matches"] = {
+            name: np.where(valid, match, False) for name, match in matches.items()
+        }
+        return scores
+
+    def _visual(
+        self, source: np.ndarray, targets: Sequence[np.ndarray], normalized: bool
+    ):
+        source = np.asarray(source, dtype=np.float32).reshape(-1)
+        dim = source.shape[0]
+        valid = np.array([target.size == dim for target in targets], dtype=bool)
+        if not valid.any():
+            return np.zeros(len(targets)), valid
+
+        matrix = np.stack(
+            [target.reshape(-1) for target, ok in zip(targets, valid) if ok]
+        ).astype(np.float32, copy=False)
+
+        similarity = matrix @ source
+        if not normalized:
+            # Zero vectors have zero similarity, as in sklearn's cosine_similarity
+            denominator = np.linalg.norm(matrix, axis=1) * np.linalg.norm(source)
+            similarity = np.divide(
+                similarity,
+                denominator,
+                out=np.zeros_like(similarity),
+                where=denominator > 0,
+            )
+
+        visual = np.zeros(len(targets))
+        visual[valid] = similarity
+        return visual, valid
+
+    def _attributes(self, source_attrs: Dict[str, Any], target_attrs_list):
+        n = len(target_attrs_list)
+        total = np.zeros(n)
+        count = np.zeros(n)
+        matches = {}
+
+        for attribute, mismatch in EXACT_ATTRIBUTES.items():
+            if attribute not in source_attrs:
+                continue
+            source_value = _attribute_value(attribute, source_attrs)
+            vocabulary = {source_value: 0}
+            # -1 marks targets without the attribute, 0 the source's value
+            codes = np.array(
+                [
+                    _encode(vocabulary, _attribute_value(attribute, attrs))
+                    if attrs and attribute in attrs
+                    else -1
+                    for attrs in target_attrs_list
+                ],
+                dtype=np.int64,
+            )
+            present = codes >= 0
+            matched = codes == 0
+            total += np.where(matched, 1.0, np.where(present, mismatch, 0.0))
+            count += present
+            matches[MATCHING_FEATURE_NAMES[attribute]] = matched
+
+        if "colors" in source_attrs:
+            vocabulary = {
+                color["name"]: i for i, color in enumerate(source_attrs["colors"])
+            }
+            present = np.zeros(n, dtype=bool)
+            matched = np.zeros(n, dtype=bool)
+            for i, attrs in enumerate(target_attrs_list):
+                if attrs and "colors" in attrs:
+                    present[i] = True
+                    matched[i] = any(
+                        color["name"] in vocabulary for color in attrs["colors"]
+                    )
+            total += matched
+            count += present
+            matches[MATCHING_FEATURE_NAMES["colors"]] = matched
+
+        # Targets without attributes are not compared at all
+        compared = np.array([bool(attrs) for attrs in target_attrs_list], dtype=bool)
+        score = np.where(compared, total / np.maximum(1, count), 0.0)
+        matches = {name: match & compared for name, match in matches.items()}
+        return score, matches
+
+    def _location(self, source_location, target_locations):
+        if not _is_coordinate(source_location):
+            logger.warning(f"Invalid location format: {source_location}")
+            return np.zeros(len(target_locations))
+
+        coordinates = np.full((len(target_locations), 2), np.nan)
+        for i, location in enumerate(target_locations):
+            if not location:
+                continue
+            if not _is_coordinate(location):
+                logger.warning(f"Invalid location format: {location}")
+                continue
+            try:
+                coordinates[i] = [float(location[0]), float(location[1])]
+            except (TypeError, ValueError) as e:
+                logger.error(f"Error processing location {location}: {e}")
+
+        distance = haversine_km(
+            float(source_location[0]),
+            float(source_location[1]),
+            coordinates[:, 0],
+            coordinates[:, 1],
+        )
+        score = np.maximum(0, 1 - distance / MAX_RELEVANT_DISTANCE_KM)
+        return np.nan_to_num(score, nan=0.0)
+
+    def _time(self, source_date, target_dates):
+        days = np.full(len(target_dates), np.nan)
+        for i, date in enumerate(target_dates):
+            if not date:
+                continue
+            try:
+                # timedelta.days floors, matching the per-pair comparison
+                days[i] = abs((source_date - date).days)
+            except Exception as e:
+                logger.error(f"Error calculating time difference: {e}")
+        score = np.maximum(0, 1 - days / MAX_RELEVANT_DAYS)
+        return np.nan_to_num(score, nan=0.0)
+
+
+def _attribute_value(attribute: str, attrs: Dict[str, Any]):
+    value = attrs[attribute]
+    if attribute == "breed":
+        return value["name"]
+    return value
+
+
+def _encode(vocabulary: Dict[Any, int], value) -> int:
+    return vocabulary.setdefault(value, len(vocabulary))
+
+
+def top_k_indices(overall: np.ndarray, threshold: float, k: Optional[int] = None):
+    """
+    Indices of the scores at or above ``threshold``, best first
+
+    Only the best ``k`` are partially selected and sorted. Ties keep their
+    original order.
+    """
+    candidates = np.flatnonzero(overall >= threshold)
+    if k is not None and 0 < k < len(candidates):
+        values = overall[candidates]
+        kth = values[np.argpartition(-values, k - 1)[k - 1]]
+        # Keep every score tied with the k-th, so the stable sort below picks
+        # the earliest of them
+        candidates = candidates[values >= kth]
+    order = np.argsort(-overall[candidates], kind="stable")
+    if k is not None and k > 0:
+        order = order[:k]
+    return candidates[order]
+
+
+def matching_features(matches: Dict[str, np.ndarray], index: int) -> List[str]:
+    return [name for name, matched in matches.items() if matched[index]]
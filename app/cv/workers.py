@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Set in CV worker processes, which always run the pipeline in-process
+_in_worker = False
+
+
+def uses_worker_processes() -> bool:
+    return settings.CV_EXECUTION_MODE.lower() == "process" and not _in_worker
+
+
+def _init_worker() -> None:
+    """Load the models once when a worker process starts"""
+    global _in_worker
+    _in_worker = True
+
+    from app.cv.registry import get_pet_finder
+
+    pet_finder = get_pet_finder()
+    if settings.CV_WARMUP_ON_STARTUP:
+        pet_finder.warm_up()
+    logger.info("CV worker process ready")
+
+
+def _ready_task() -> bool:
+    return True
+
+
+# Images and feature vectors cross the process boundary as file paths or
+# shared memory blocks. Only small references and the results are pickled.
+
+
+@contextmanager
+def _shared_block(data: bytes):
+    block = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    try:
+        block.buf[: len(data)] = data
+        yield block.name
+    finally:
+        block.close()
+        block.unlink()
+
+
+@contextmanager
+def _image_ref(image):
+    if isinstance(image, str):
+        yield ("path", image)
+        return
+
+    if isinstance(image, (bytes, bytearray)):
+        with _shared_block(image) as name:
+            yield ("bytes", name, len(image))
+        return
+
+    array = np.ascontiguousarray(np.asarray(image))
+    with _shared_block(array.tobytes()) as name:
+        yield ("array", name, array.shape, array.dtype.str)
+
+
+def _read_block(name: str, size: int) -> bytes:
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(block.buf[:size])
+    finally:
+        block.close()
+
+
+def _resolve_image(ref):
+    kind = ref[0]
+    if kind == "path":
+        return ref[1]
+    if kind == "bytes":
+        return _read_block(ref[1], ref[2])
+
+    _, name, shape, dtype = ref
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return np.frombuffer(_read_block(name, size), dtype=dtype).reshape(shape)
+
+
+def _analyze_task(ref) -> Dict[str, Any]:
+    from app.cv.registry import get_pet_finder
+
+    analysis = get_pet_finder().analyze(_resolve_image(ref))
+
+    # The crop is only needed inside the pipeline and is not sent back
+    analysis["crop"] = None
+    if analysis["feature_vector"] is not None:
+        analysis["feature_vector"] = np.asarray(
+            analysis["feature_vector"], dtype=np.float32
+        ).tobytes()
+    return analysis
+
+
+def _compare_task(
+    source_features: bytes,
+    block_name: str,
+    offsets: List[Optional[Tuple[int, int]]],
+    kwargs: Dict[str, Any],
+) -> Dict[str, Any]:
+    from app.services.cv_service import CVService
+
+    size = max((offset[1] for offset in offsets if offset), default=0)
+    data = _read_block(block_name, size)
+    targets = [data[offset[0] : offset[1]] if offset else None for offset in offsets]
+    return CVService().compare_images(source_features, targets, **kwargs)
+
+
+class CVWorkerPool:
+    """
+    Runs the CV pipeline in a pool of worker processes
+
+    Each worker loads the models once and limits torch to CV_TORCH_THREADS
+    threads, so detection post-processing, color analysis and the comparison
+    loop run in parallel instead of serializing on the GIL. Results match
+    InferenceScheduler.analyze except that ``crop`` is always None.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or settings.CV_WORKER_PROCESSES
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        logger.info(f"Started {self.workers} CV worker processes")
+
+    def analyze(self, image) -> Dict[str, Any]:
+        """Run detection, attributes and embedding on ``image`` in a worker"""
+        with _image_ref(image) as ref:
+            analysis = self._executor.submit(_analyze_task, ref).result()
+        return self._restore(analysis)
+
+    async def analyze_async(self, image) -> Dict[str, Any]:
+        with _image_ref(image) as ref:
+            analysis = await asyncio.wrap_future(
+                self._executor.submit(_analyze_task, ref)
+            )
+        return self._restore(analysis)
+
+    def compare_images(
+        self, source_features: bytes, target_features_list: List[bytes], **kwargs
+    ) -> Dict[str, Any]:
+        """Run CVService.compare_images in a worker, see its arguments"""
+        offsets = []
+        position = 0
+        for target in target_features_list:
+            if target is None:
+                offsets.append(None)
+                continue
+            offsets.append((position, position + len(target)))
+            position += len(target)
+
+        data = b"".join(target for target in target_features_list if target)
+        with _shared_block(data) as name:
+            return self._executor.submit(
+                _compare_task, source_features, name, offsets, kwargs
+            ).result()
+
+    def warm_up(self) -> None:
+        """Start every worker, which loads and warms up its models"""
+        futures = [self._executor.submit(_ready_task) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _restore(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        if analysis["feature_vector"] is not None:
+            analysis["feature_vector"] = np.frombuffer(
+                analysis["feature_vector"], dtype=np.float32
+            ).copy()
+        return analysis
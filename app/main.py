@@ -4,12 +4,13 @@ from sqlalchemy.orm import Session
 import os
 import json
 import logging
+import threading
 from datetime import datetime
 from uuid import UUID
 
 from app.api.routes import api_router
 from app.core.config import settings
-from app.core.database import get_db, Base, engine
+from app.core.database import get_db
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -21,13 +22,6 @@ logger.info(
     f"Database URL: {str(settings.DATABASE_URL).replace('://', '://***:***@') if settings.DATABASE_URL else 'Not set'}"
 )
 
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Database initialization error: {str(e)}")
-
-
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, datetime):
@@ -50,11 +44,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(api_router)
 
 
+@app.on_event("startup")
+def warm_up_cv_models():
+    if not settings.CV_WARMUP_ON_STARTUP:
+        return
+
+    from app.cv.registry import warm_up_models
+
+    def run():
+        try:
+            warm_up_models()
+        except Exception as e:
+            logger.error(f"CV model warm-up failed: {str(e)}", exc_info=True)
+
+    # Warm up in the background so the server accepts connections right away;
+    # requests arriving meanwhile wait for the models in the registry
+    threading.Thread(target=run, name="cv-warmup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def shutdown_cv_workers():
+    from app.cv.registry import is_loaded, get_cv_workers
+
+    if is_loaded("cv_workers"):
+        get_cv_workers().shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    from app.core.database import async_engine
+
+    await async_engine.dispose()
+
+
 @app.get("/")
 async def root():
     logger.info("Root endpoint accessed")
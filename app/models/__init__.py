@@ -8,3 +8,4 @@ from app.models.webhook import Webhook
 from app.models.verification_code import VerificationCode
 from app.models.reset_token import ResetToken
 from app.models.token import ActiveToken
+from app.models.analysis_cache import ImageAnalysisCache
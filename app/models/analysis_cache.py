@@ -0,0 +1,26 @@
+import sqlalchemy as sa
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSON, BYTEA
+
+from app.models.base import BaseModel
+
+
+class ImageAnalysisCache(BaseModel):
+    content_hash = sa.Column(sa.String(64), nullable=False)
+    model_version = sa.Column(sa.String, nullable=False)
+    species = sa.Column(sa.String, nullable=True)
+    confidence = sa.Column(sa.Float, nullable=True)
+    bounding_box = sa.Column(JSON, nullable=True)
+    boxes = sa.Column(JSON, nullable=True)
+    detected_attributes = sa.Column(JSON, nullable=True)
+    feature_vector = sa.Column(BYTEA, nullable=True)
+    size_bytes = sa.Column(sa.Integer, nullable=False, default=0)
+    last_accessed_at = sa.Column(
+        sa.DateTime, default=datetime.utcnow, nullable=False, index=True
+    )
+
+    __table_args__ = (
+        sa.UniqueConstraint(
+            "content_hash", "model_version", name="uq_imageanalysiscache_key"
+        ),
+    )
@@ -1,5 +1,5 @@
 import sqlalchemy as sa
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.dialects.postgresql import JSON, BYTEA
 from datetime import date
 
@@ -20,11 +20,26 @@ class FoundPet(BaseModel):
     distinctive_features = sa.Column(sa.Text, nullable=True)
     approximate_age = sa.Column(sa.String, nullable=True)
     size = sa.Column(sa.String, nullable=True)
-    feature_vector = sa.Column(BYTEA, nullable=True)
-    detected_attributes = sa.Column(JSON, nullable=True)
+    # Only loaded by the matching paths, see FoundPetRepository
+    feature_vector = deferred(sa.Column(BYTEA, nullable=True), group="embedding")
+    detected_attributes = deferred(sa.Column(JSON, nullable=True), group="embedding")
 
     # Relationships
     finder = relationship("User", back_populates="found_pets")
     matches = relationship(
         "Match", back_populates="found_pet", cascade="all, delete-orphan"
     )
+
+
+# Found pet feeds, see migration c3e8a1d6f402
+sa.Index(
+    "ix_foundpet_species_found_date",
+    FoundPet.species,
+    FoundPet.found_date.desc().nulls_last(),
+    FoundPet.id.desc(),
+)
+sa.Index(
+    "ix_foundpet_found_date",
+    FoundPet.found_date.desc().nulls_last(),
+    FoundPet.id.desc(),
+)
@@ -23,3 +23,13 @@ class Match(BaseModel):
     # Relationships
     lost_pet = relationship("Pet", back_populates="matches")
     found_pet = relationship("FoundPet", back_populates="matches")
+
+    # One match per pair, the target of the upsert in AsyncMatchRepository
+    __table_args__ = (
+        sa.UniqueConstraint(
+            "lost_pet_id", "found_pet_id", name="uq_match_lost_pet_found_pet"
+        ),
+    )
+
+
+sa.Index("ix_match_found_pet_id", Match.found_pet_id)
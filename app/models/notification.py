@@ -15,3 +15,12 @@ class Notification(BaseModel):
 
     # Relationships
     user = relationship("User", back_populates="notifications")
+
+
+sa.Index(
+    "ix_notification_user_read_created",
+    Notification.user_id,
+    Notification.is_read,
+    Notification.created_at.desc().nulls_last(),
+    Notification.id.desc(),
+)
@@ -32,3 +32,19 @@ class Pet(BaseModel):
     matches = relationship(
         "Match", back_populates="lost_pet", cascade="all, delete-orphan"
     )
+
+
+# Lost pet feeds, see migration c3e8a1d6f402
+sa.Index(
+    "ix_pet_lost_species_lost_date",
+    Pet.species,
+    Pet.lost_date.desc().nulls_last(),
+    Pet.id.desc(),
+    postgresql_where=Pet.status == "lost",
+)
+sa.Index(
+    "ix_pet_lost_lost_date",
+    Pet.lost_date.desc().nulls_last(),
+    Pet.id.desc(),
+    postgresql_where=Pet.status == "lost",
+)
@@ -1,5 +1,5 @@
 import sqlalchemy as sa
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.dialects.postgresql import JSON, BYTEA
 
 from app.models.base import BaseModel
@@ -15,7 +15,11 @@ class PetPhoto(BaseModel):
         sa.String, default="pending", nullable=False
     )  # pending, processing, completed, failed
     detected_attributes = sa.Column(JSON, nullable=True)
-    feature_vector = sa.Column(BYTEA, nullable=True)
+    # Only loaded by the matching paths, see PetPhotoRepository
+    feature_vector = deferred(sa.Column(BYTEA, nullable=True), group="embedding")
 
     # Relationships
     pet = relationship("Pet", back_populates="photos")
+
+
+sa.Index("ix_petphoto_pet_main", PetPhoto.pet_id, PetPhoto.is_main)
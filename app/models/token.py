@@ -7,7 +7,7 @@ from app.models.base import BaseModel
 class ActiveToken(BaseModel):
     user_id = sa.Column(sa.UUID(as_uuid=True), sa.ForeignKey("user.id"), nullable=False)
     token_hash = sa.Column(sa.String, nullable=False, index=True, unique=True)
-    expires_at = sa.Column(sa.DateTime, nullable=False)
+    expires_at = sa.Column(sa.DateTime, nullable=False, index=True)
     device_info = sa.Column(sa.String, nullable=True)
 
     @property
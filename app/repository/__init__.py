@@ -1,5 +1,16 @@
-from app.repository.user import UserRepository
-from app.repository.pet import PetRepository, PetPhotoRepository
-from app.repository.found_pet import FoundPetRepository
-from app.repository.match import MatchRepository
-from app.repository.notification import NotificationRepository
+from app.repository.user import UserRepository, AsyncUserRepository
+from app.repository.pet import (
+    PetRepository,
+    PetPhotoRepository,
+    AsyncPetRepository,
+    AsyncPetPhotoRepository,
+)
+from app.repository.found_pet import FoundPetRepository, AsyncFoundPetRepository
+from app.repository.match import MatchRepository, AsyncMatchRepository
+from app.repository.notification import (
+    NotificationRepository,
+    AsyncNotificationRepository,
+)
+from app.repository.webhook import WebhookRepository, AsyncWebhookRepository
+from app.repository.analysis_cache import AnalysisCacheRepository
+from app.repository.unit_of_work import async_unit_of_work, unit_of_work
@@ -0,0 +1,86 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+
+from app.models.analysis_cache import ImageAnalysisCache
+from app.repository.base import BaseRepository
+from app.repository.unit_of_work import commit
+
+
+class AnalysisCacheRepository(BaseRepository[ImageAnalysisCache, Any, Any]):
+    def __init__(self, db: Session):
+        super().__init__(db, ImageAnalysisCache)
+
+    def get_entry(
+        self, *, content_hash: str, model_version: str, touch: bool = True
+    ) -> Optional[ImageAnalysisCache]:
+        entry = (
+            self.db.query(ImageAnalysisCache)
+            .filter(
+                ImageAnalysisCache.content_hash == content_hash,
+                ImageAnalysisCache.model_version == model_version,
+            )
+            .first()
+        )
+        if entry and touch:
+            entry.last_accessed_at = datetime.utcnow()
+            commit(self.db)
+        return entry
+
+    def upsert_entry(
+        self, *, content_hash: str, model_version: str, values: Dict[str, Any]
+    ) -> ImageAnalysisCache:
+        entry = self.get_entry(
+            content_hash=content_hash, model_version=model_version, touch=False
+        )
+        if entry is None:
+            entry = ImageAnalysisCache(
+                content_hash=content_hash, model_version=model_version
+            )
+            self.db.add(entry)
+
+        for field, value in values.items():
+            setattr(entry, field, value)
+        entry.last_accessed_at = datetime.utcnow()
+
+        commit(self.db, entry)
+        return entry
+
+    def total_size(self) -> int:
+        return self.db.query(
+            func.coalesce(func.sum(ImageAnalysisCache.size_bytes), 0)
+        ).scalar()
+
+    def evict_to_size(self, *, max_bytes: int, batch_size: int = 500) -> int:
+        """Delete least recently used entries until the table fits in max_bytes"""
+        excess = self.total_size() - max_bytes
+        if excess <= 0:
+            return 0
+
+        evicted = 0
+        while excess > 0:
+            rows = (
+                self.db.query(ImageAnalysisCache.id, ImageAnalysisCache.size_bytes)
+                .order_by(ImageAnalysisCache.last_accessed_at)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+
+            ids = []
+            for entry_id, size_bytes in rows:
+                if excess <= 0:
+                    break
+                ids.append(entry_id)
+                excess -= size_bytes
+
+            self.db.query(ImageAnalysisCache).filter(
+                ImageAnalysisCache.id.in_(ids)
+            ).delete(synchronize_session=False)
+            commit(self.db)
+            evicted += len(ids)
+
+        return evicted
@@ -1,10 +1,13 @@
 from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import uuid
 
 from app.models.base import BaseModel as DBBaseModel
+from app.repository.unit_of_work import async_commit, commit
 
 ModelType = TypeVar("ModelType", bound=DBBaseModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -45,8 +48,7 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit(self.db, db_obj)
         return db_obj
 
     def update(
@@ -61,12 +63,81 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit(self.db, db_obj)
         return db_obj
 
     def remove(self, *, id: uuid.UUID) -> ModelType:
         obj = self.db.query(self.model).get(id)
         self.db.delete(obj)
-        self.db.commit()
+        commit(self.db)
+        return obj
+
+
+class AsyncBaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    BaseRepository for an AsyncSession, used by the async endpoints
+
+    Relationships are not lazy loaded under asyncio: methods whose results
+    are serialized with their relationships load them eagerly.
+    """
+
+    def __init__(self, db: AsyncSession, model: Type[ModelType]):
+        self.db = db
+        self.model = model
+
+    async def get(self, id: Any) -> Optional[ModelType]:
+        return await self.db.scalar(select(self.model).where(self.model.id == id))
+
+    async def get_by(self, **kwargs) -> Optional[ModelType]:
+        query = select(self.model)
+        for key, value in kwargs.items():
+            query = query.where(getattr(self.model, key) == value)
+        return (await self.db.scalars(query.limit(1))).first()
+
+    async def get_multi(
+        self, *, skip: int = 0, limit: int = 100, **kwargs
+    ) -> List[ModelType]:
+        query = select(self.model)
+        for key, value in kwargs.items():
+            if value is not None:
+                query = query.where(getattr(self.model, key) == value)
+        return list(await self.db.scalars(query.offset(skip).limit(limit)))
+
+    async def count(self, **kwargs) -> int:
+        query = select(func.count()).select_from(self.model)
+        for key, value in kwargs.items():
+            if value is not None:
+                query = query.where(getattr(self.model, key) == value)
+        return await self.db.scalar(query)
+
+    async def create(
+        self, *, obj_in: Union[CreateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        # Native values: asyncpg rejects the strings jsonable_encoder makes of
+        # dates, which psycopg2 casts implicitly
+        obj_in_data = obj_in if isinstance(obj_in, dict) else obj_in.dict()
+        db_obj = self.model(**obj_in_data)
+        self.db.add(db_obj)
+        await async_commit(self.db, db_obj)
+        return db_obj
+
+    async def update(
+        self, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        obj_data = jsonable_encoder(db_obj)
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        for field in obj_data:
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+        self.db.add(db_obj)
+        await async_commit(self.db, db_obj)
+        return db_obj
+
+    async def remove(self, *, id: uuid.UUID) -> ModelType:
+        obj = await self.db.get(self.model, id)
+        await self.db.delete(obj)
+        await async_commit(self.db)
         return obj
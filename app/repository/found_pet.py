@@ -1,27 +1,56 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import date
 import uuid
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, undefer, undefer_group
+from sqlalchemy import desc, and_, or_, select
 
 from app.models.found_pet import FoundPet
 from app.schemas.found_pet import FoundPetCreate
-from app.repository.base import BaseRepository
+from app.repository.base import AsyncBaseRepository, BaseRepository
+from app.repository.pagination import count_rows, keyset_filter, keyset_order
+from app.repository.unit_of_work import async_commit, commit
 
 
 class FoundPetRepository(BaseRepository[FoundPet, FoundPetCreate, Any]):
     def __init__(self, db: Session):
         super().__init__(db, FoundPet)
 
-    def get_with_details(self, found_pet_id: uuid.UUID) -> Optional[FoundPet]:
+    def get_with_details(
+        self, found_pet_id: uuid.UUID, with_vectors: bool = False
+    ) -> Optional[FoundPet]:
+        query = self.db.query(FoundPet).options(joinedload(FoundPet.finder))
+        if with_vectors:
+            query = query.options(undefer_group("embedding"))
+        else:
+            query = query.options(undefer(FoundPet.detected_attributes))
+        return query.filter(FoundPet.id == found_pet_id).first()
+
+    def get_with_vectors(self, found_pet_id: uuid.UUID) -> Optional[FoundPet]:
+        """The found pet with its feature vector and detected attributes loaded"""
         return (
             self.db.query(FoundPet)
-            .options(joinedload(FoundPet.finder))
+            .options(undefer_group("embedding"))
             .filter(FoundPet.id == found_pet_id)
             .first()
         )
 
+    def get_found_pet_vectors(
+        self, *, found_pet_id: Optional[uuid.UUID] = None
+    ) -> List[Tuple[uuid.UUID, str, bytes]]:
+        """
+        Feature vectors of found pets as (found pet id, species, vector)
+
+        Found pets whose photo has no feature vector are left out.
+        """
+        query = self.db.query(
+            FoundPet.id, FoundPet.species, FoundPet.feature_vector
+        ).filter(FoundPet.feature_vector.isnot(None))
+        if found_pet_id is not None:
+            query = query.filter(FoundPet.id == found_pet_id)
+        return [tuple(row) for row in query.yield_per(1000)]
+
     def get_user_found_pets(
         self, *, user_id: uuid.UUID, skip: int = 0, limit: int = 100
     ) -> List[FoundPet]:
@@ -34,18 +63,20 @@ class FoundPetRepository(BaseRepository[FoundPet, FoundPetCreate, Any]):
             .all()
         )
 
-    def get_found_pets(
+    def _found_pets_query(
         self,
         *,
-        skip: int = 0,
-        limit: int = 20,
         species: Optional[str] = None,
         location: Optional[str] = None,
         date_from: Optional[date] = None,
         date_to: Optional[date] = None,
-    ) -> List[FoundPet]:
+        found_pet_ids: Optional[List[uuid.UUID]] = None,
+    ):
         query = self.db.query(FoundPet)
 
+        if found_pet_ids is not None:
+            query = query.filter(FoundPet.id.in_(found_pet_ids))
+
         if species:
             query = query.filter(FoundPet.species == species)
 
@@ -58,31 +89,62 @@ class FoundPetRepository(BaseRepository[FoundPet, FoundPetCreate, Any]):
         if date_to:
             query = query.filter(FoundPet.found_date <= date_to)
 
-        return query.order_by(desc(FoundPet.found_date)).offset(skip).limit(limit).all()
+        return query
 
-    def count_found_pets(
+    def get_found_pets(
         self,
         *,
+        skip: int = 0,
+        limit: int = 20,
         species: Optional[str] = None,
         location: Optional[str] = None,
         date_from: Optional[date] = None,
         date_to: Optional[date] = None,
-    ) -> int:
-        query = self.db.query(func.count(FoundPet.id))
-
-        if species:
-            query = query.filter(FoundPet.species == species)
-
-        if location:
-            query = query.filter(FoundPet.location.ilike(f"%{location}%"))
-
-        if date_from:
-            query = query.filter(FoundPet.found_date >= date_from)
+        with_vectors: bool = False,
+        cursor: Optional[str] = None,
+        found_pet_ids: Optional[List[uuid.UUID]] = None,
+    ) -> List[FoundPet]:
+        """
+        Found pets matching the filters, newest first
+
+        Feature vectors and detected attributes are deferred unless
+        ``with_vectors`` is set, since only the matching paths use them. With
+        ``cursor`` the page starts after the cursor's row and ``skip`` is
+        ignored. ``found_pet_ids`` limits the result to those found pets, e.g.
+        the embedding index candidates.
+        """
+        if found_pet_ids is not None and not found_pet_ids:
+            return []
+        query = self._found_pets_query(
+            species=species,
+            location=location,
+            date_from=date_from,
+            date_to=date_to,
+            found_pet_ids=found_pet_ids,
+        )
+        if with_vectors:
+            query = query.options(undefer_group("embedding"))
 
-        if date_to:
-            query = query.filter(FoundPet.found_date <= date_to)
+        query = keyset_order(query, FoundPet.found_date, FoundPet.id)
+        if cursor:
+            query = keyset_filter(query, FoundPet.found_date, FoundPet.id, cursor)
+        else:
+            query = query.offset(skip)
+        return query.limit(limit).all()
 
-        return query.scalar()
+    def count_found_pets(
+        self,
+        *,
+        species: Optional[str] = None,
+        location: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        estimate: bool = False,
+    ) -> int:
+        query = self._found_pets_query(
+            species=species, location=location, date_from=date_from, date_to=date_to
+        )
+        return count_rows(query, estimate=estimate)
 
     def create_found_pet(
         self,
@@ -110,8 +172,7 @@ class FoundPetRepository(BaseRepository[FoundPet, FoundPetCreate, Any]):
             feature_vector=feature_vector,
         )
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit(self.db, db_obj)
         return db_obj
 
     def update_detected_attributes(
@@ -130,6 +191,47 @@ class FoundPetRepository(BaseRepository[FoundPet, FoundPetCreate, Any]):
             found_pet.feature_vector = feature_vector
 
         self.db.add(found_pet)
-        self.db.commit()
-        self.db.refresh(found_pet)
+        commit(self.db, found_pet)
         return found_pet
+
+
+class AsyncFoundPetRepository(AsyncBaseRepository[FoundPet, FoundPetCreate, Any]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db, FoundPet)
+
+    async def get_with_details(self, found_pet_id: uuid.UUID) -> Optional[FoundPet]:
+        return await self.db.scalar(
+            select(FoundPet)
+            .options(joinedload(FoundPet.finder), undefer(FoundPet.detected_attributes))
+            .where(FoundPet.id == found_pet_id)
+        )
+
+    async def create_found_pet(
+        self,
+        *,
+        obj_in: FoundPetCreate,
+        finder_id: uuid.UUID,
+        photo_url: str,
+        photo_path: str,
+        detected_attributes: Optional[Dict] = None,
+        feature_vector: Optional[bytes] = None,
+    ) -> FoundPet:
+        db_obj = FoundPet(
+            finder_id=finder_id,
+            species=obj_in.species,
+            photo_url=photo_url,
+            photo_path=photo_path,
+            description=obj_in.description,
+            location=obj_in.location,
+            found_date=obj_in.found_date,
+            color=obj_in.color,
+            distinctive_features=obj_in.distinctive_features,
+            approximate_age=obj_in.approximate_age,
+            size=obj_in.size,
+            detected_attributes=detected_attributes,
+            feature_vector=feature_vector,
+        )
+        self.db.add(db_obj)
+        await async_commit(self.db)
+        # With the finder and detected attributes, as the endpoint returns it
+        return await self.get_with_details(db_obj.id)
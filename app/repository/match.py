@@ -1,14 +1,18 @@
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
 from datetime import datetime
 import uuid
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, and_
+from sqlalchemy import Row, and_, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.models.match import Match
 from app.models.pet import Pet
 from app.models.found_pet import FoundPet
-from app.repository.base import BaseRepository
+from app.repository.base import AsyncBaseRepository, BaseRepository
+from app.repository.pagination import keyset_filter, keyset_order
+from app.repository.unit_of_work import async_commit, commit
 
 
 class MatchRepository(BaseRepository[Match, Any, Any]):
@@ -47,8 +51,7 @@ class MatchRepository(BaseRepository[Match, Any, Any]):
                 existing.similarity = similarity
                 existing.matching_features = matching_features
                 self.db.add(existing)
-                self.db.commit()
-                self.db.refresh(existing)
+                commit(self.db, existing)
             return existing
 
         db_obj = Match(
@@ -59,8 +62,7 @@ class MatchRepository(BaseRepository[Match, Any, Any]):
             matching_features=matching_features,
         )
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit(self.db, db_obj)
         return db_obj
 
     def update_match_status(
@@ -75,8 +77,7 @@ class MatchRepository(BaseRepository[Match, Any, Any]):
             match.confirmation_date = datetime.utcnow()
 
         self.db.add(match)
-        self.db.commit()
-        self.db.refresh(match)
+        commit(self.db, match)
         return match
 
     def get_user_matches(
@@ -86,6 +87,7 @@ class MatchRepository(BaseRepository[Match, Any, Any]):
         status: Optional[str] = None,
         skip: int = 0,
         limit: int = 20,
+        cursor: Optional[str] = None,
     ) -> List[Match]:
         query = self.db.query(Match).join(
             Pet, and_(Pet.id == Match.lost_pet_id, Pet.owner_id == user_id)
@@ -94,7 +96,7 @@ class MatchRepository(BaseRepository[Match, Any, Any]):
         if status:
             query = query.filter(Match.status == status)
 
-        return query.order_by(desc(Match.created_at)).offset(skip).limit(limit).all()
+        return self._page(query, skip=skip, limit=limit, cursor=cursor)
 
     def get_finder_matches(
         self,
@@ -103,6 +105,7 @@ class MatchRepository(BaseRepository[Match, Any, Any]):
         status: Optional[str] = None,
         skip: int = 0,
         limit: int = 20,
+        cursor: Optional[str] = None,
     ) -> List[Match]:
         query = self.db.query(Match).join(
             FoundPet,
@@ -112,4 +115,199 @@ class MatchRepository(BaseRepository[Match, Any, Any]):
         if status:
             query = query.filter(Match.status == status)
 
-        return query.order_by(desc(Match.created_at)).offset(skip).limit(limit).all()
+        return self._page(query, skip=skip, limit=limit, cursor=cursor)
+
+    def _page(
+        self, query, *, skip: int, limit: int, cursor: Optional[str]
+    ) -> List[Match]:
+        query = keyset_order(query, Match.created_at, Match.id)
+        if cursor:
+            query = keyset_filter(query, Match.created_at, Match.id, cursor)
+        else:
+            query = query.offset(skip)
+        return query.limit(limit).all()
+
+
+class AsyncMatchRepository(AsyncBaseRepository[Match, Any, Any]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db, Match)
+
+    @staticmethod
+    def _with_pets(query):
+        # Serialized as MatchDetail, with both pets and their people
+        return query.options(
+            joinedload(Match.lost_pet).joinedload(Pet.owner),
+            joinedload(Match.found_pet).joinedload(FoundPet.finder),
+        )
+
+    async def get_with_details(self, match_id: uuid.UUID) -> Optional[Match]:
+        return await self.db.scalar(
+            self._with_pets(select(Match)).where(Match.id == match_id)
+        )
+
+    async def get_by_pet_ids(
+        self, *, lost_pet_id: uuid.UUID, found_pet_id: uuid.UUID
+    ) -> Optional[Match]:
+        return await self.db.scalar(
+            select(Match).where(
+                Match.lost_pet_id == lost_pet_id, Match.found_pet_id == found_pet_id
+            )
+        )
+
+    async def create_match(
+        self,
+        *,
+        lost_pet_id: uuid.UUID,
+        found_pet_id: uuid.UUID,
+        similarity: float,
+        matching_features: Optional[List[str]] = None,
+    ) -> Match:
+        existing = await self.get_by_pet_ids(
+            lost_pet_id=lost_pet_id, found_pet_id=found_pet_id
+        )
+
+        if existing:
+            if similarity > existing.similarity:
+                existing.similarity = similarity
+                existing.matching_features = matching_features
+                self.db.add(existing)
+                await async_commit(self.db, existing)
+            return existing
+
+        db_obj = Match(
+            lost_pet_id=lost_pet_id,
+            found_pet_id=found_pet_id,
+            similarity=similarity,
+            status="pending",
+            matching_features=matching_features,
+        )
+        self.db.add(db_obj)
+        await async_commit(self.db, db_obj)
+        return db_obj
+
+    async def upsert_matches(
+        self, *, found_pet_id: uuid.UUID, matches: List[Dict[str, Any]]
+    ) -> List[Row]:
+        """
+        Insert the matches of a found pet in one statement
+
+        A pair that already has a match keeps it, its similarity and matching
+        features are raised when the new score is higher. Commits.
+
+        Args:
+            found_pet_id: ID of the found pet
+            matches: Dicts with ``pet_id``, ``similarity`` and optionally
+                ``matching_features``
+
+        Returns:
+            Rows with ``id``, ``lost_pet_id``, ``found_pet_id`` and
+            ``similarity`` of the matches that were inserted
+        """
+        # A pair may occur once per statement, ON CONFLICT cannot update a
+        # row it inserted
+        best: Dict[uuid.UUID, Dict[str, Any]] = {}
+        for match in matches:
+            pet_id = match["pet_id"]
+            if pet_id not in best or match["similarity"] > best[pet_id]["similarity"]:
+                best[pet_id] = match
+        if not best:
+            return []
+
+        now = datetime.utcnow()
+        statement = insert(Match).values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "lost_pet_id": pet_id,
+                    "found_pet_id": found_pet_id,
+                    "similarity": match["similarity"],
+                    "status": "pending",
+                    "matching_features": match.get("matching_features", []),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for pet_id, match in best.items()
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            constraint="uq_match_lost_pet_found_pet",
+            set_={
+                "similarity": statement.excluded.similarity,
+                "matching_features": statement.excluded.matching_features,
+                "updated_at": statement.excluded.updated_at,
+            },
+            where=Match.similarity < statement.excluded.similarity,
+        ).returning(
+            Match.id,
+            Match.lost_pet_id,
+            Match.found_pet_id,
+            Match.similarity,
+            # xmax is 0 for a row this statement inserted, set when it updated
+            literal_column("xmax = 0").label("inserted"),
+        )
+
+        rows = (await self.db.execute(statement)).all()
+        await async_commit(self.db)
+        return [row for row in rows if row.inserted]
+
+    async def update_match_status(
+        self, *, match_id: uuid.UUID, status: str
+    ) -> Optional[Match]:
+        match = await self.get(id=match_id)
+        if not match:
+            return None
+
+        match.status = status
+        if status == "confirmed":
+            match.confirmation_date = datetime.utcnow()
+
+        self.db.add(match)
+        await async_commit(self.db, match)
+        return match
+
+    async def get_user_matches(
+        self,
+        *,
+        user_id: uuid.UUID,
+        status: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> List[Match]:
+        query = select(Match).join(
+            Pet, and_(Pet.id == Match.lost_pet_id, Pet.owner_id == user_id)
+        )
+
+        if status:
+            query = query.where(Match.status == status)
+
+        return await self._page(query, skip=skip, limit=limit, cursor=cursor)
+
+    async def get_finder_matches(
+        self,
+        *,
+        user_id: uuid.UUID,
+        status: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> List[Match]:
+        query = select(Match).join(
+            FoundPet,
+            and_(FoundPet.id == Match.found_pet_id, FoundPet.finder_id == user_id),
+        )
+
+        if status:
+            query = query.where(Match.status == status)
+
+        return await self._page(query, skip=skip, limit=limit, cursor=cursor)
+
+    async def _page(
+        self, query, *, skip: int, limit: int, cursor: Optional[str]
+    ) -> List[Match]:
+        query = keyset_order(self._with_pets(query), Match.created_at, Match.id)
+        if cursor:
+            query = keyset_filter(query, Match.created_at, Match.id, cursor)
+        else:
+            query = query.offset(skip)
+        return list((await self.db.scalars(query.limit(limit))).unique())
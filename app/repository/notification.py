@@ -1,12 +1,15 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import uuid
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func
 
 from app.models.notification import Notification
 from app.schemas.notification import NotificationCreate, NotificationUpdate
-from app.repository.base import BaseRepository
+from app.repository.base import AsyncBaseRepository, BaseRepository
+from app.repository.pagination import keyset_filter, keyset_order
+from app.repository.unit_of_work import async_commit, commit
 
 
 class NotificationRepository(
@@ -23,6 +26,7 @@ class NotificationRepository(
         limit: int = 20,
         is_read: Optional[bool] = None,
         type: Optional[str] = None,
+        cursor: Optional[str] = None,
     ) -> List[Notification]:
         query = self.db.query(Notification).filter(Notification.user_id == user_id)
 
@@ -32,12 +36,14 @@ class NotificationRepository(
         if type:
             query = query.filter(Notification.type == type)
 
-        return (
-            query.order_by(desc(Notification.created_at))
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        query = keyset_order(query, Notification.created_at, Notification.id)
+        if cursor:
+            query = keyset_filter(
+                query, Notification.created_at, Notification.id, cursor
+            )
+        else:
+            query = query.offset(skip)
+        return query.limit(limit).all()
 
     def count_user_notifications(
         self,
@@ -65,8 +71,7 @@ class NotificationRepository(
 
         notification.is_read = True
         self.db.add(notification)
-        self.db.commit()
-        self.db.refresh(notification)
+        commit(self.db, notification)
         return notification
 
     def mark_all_as_read(self, *, user_id: uuid.UUID) -> int:
@@ -76,5 +81,21 @@ class NotificationRepository(
             .update({Notification.is_read: True})
         )
 
-        self.db.commit()
+        commit(self.db)
         return result
+
+
+class AsyncNotificationRepository(
+    AsyncBaseRepository[Notification, NotificationCreate, NotificationUpdate]
+):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db, Notification)
+
+    async def create_many(
+        self, *, notifications: List[Dict[str, Any]]
+    ) -> List[Notification]:
+        """Insert notifications in one batch and one commit"""
+        db_objs = [Notification(**data) for data in notifications]
+        self.db.add_all(db_objs)
+        await async_commit(self.db)
+        return db_objs
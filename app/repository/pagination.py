@@ -0,0 +1,111 @@
+import json
+import uuid
+import base64
+import logging
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, desc, or_
+from sqlalchemy.orm import Query
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(sort_value: Any, row_id: uuid.UUID) -> str:
+    """Opaque cursor pointing just past the row with this sort key and id"""
+    if isinstance(sort_value, datetime):
+        value = ["dt", sort_value.isoformat()]
+    elif isinstance(sort_value, date):
+        value = ["d", sort_value.isoformat()]
+    else:
+        value = None
+    payload = json.dumps([value, str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, uuid.UUID]:
+    """
+    Sort key and id encoded by ``encode_cursor``
+
+    Raises:
+        InvalidCursorError: If the cursor was not produced by encode_cursor
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if value is None:
+            sort_value = None
+        elif value[0] == "dt":
+            sort_value = datetime.fromisoformat(value[1])
+        elif value[0] == "d":
+            sort_value = date.fromisoformat(value[1])
+        else:
+            raise ValueError(f"Unknown cursor value type {value[0]}")
+        return sort_value, uuid.UUID(row_id)
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}") from e
+
+
+def keyset_order(query: Query, sort_column, id_column) -> Query:
+    """Newest first on ``sort_column`` with the id as tie-breaker, NULLs last"""
+    return query.order_by(desc(sort_column).nulls_last(), desc(id_column))
+
+
+def keyset_filter(query: Query, sort_column, id_column, cursor: str) -> Query:
+    """Rows after ``cursor`` in the order of ``keyset_order``"""
+    sort_value, row_id = decode_cursor(cursor)
+    if sort_value is None:
+        return query.filter(sort_column.is_(None), id_column < row_id)
+    return query.filter(
+        or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id),
+            sort_column.is_(None),
+        )
+    )
+
+
+def next_cursor(items: List[Any], limit: int, sort_attr: str) -> Optional[str]:
+    """Cursor of the page after ``items``, None when this is the last page"""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(getattr(last, sort_attr), last.id)
+
+
+def estimate_count(query: Query) -> Optional[int]:
+    """
+    Row estimate of the query planner, None if it cannot be obtained
+
+    Much cheaper than COUNT(*) on large tables, and accurate enough for
+    "about N results". Relies on up to date table statistics.
+    """
+    try:
+        bind = query.session.get_bind()
+        statement = query.order_by(None).statement.compile(
+            dialect=bind.dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = (
+            query.session.connection()
+            .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}")
+            .scalar()
+        )
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"Could not estimate row count: {e}")
+        return None
+
+
+def count_rows(query: Query, estimate: bool = False) -> int:
+    """Exact number of rows of a list query, or the planner's estimate"""
+    if estimate:
+        estimated = estimate_count(query)
+        if estimated is not None:
+            return estimated
+    return query.order_by(None).count()
@@ -1,14 +1,18 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from datetime import date
 import uuid
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload, undefer
+from sqlalchemy import Row, desc, select, update
 
+from app.core.db_routing import read_replica
 from app.models.pet import Pet
 from app.models.pet_photo import PetPhoto
 from app.schemas.pet import PetCreate, PetUpdate, PetStatusUpdate, PetPhotoCreate
-from app.repository.base import BaseRepository
+from app.repository.base import AsyncBaseRepository, BaseRepository
+from app.repository.pagination import count_rows, keyset_filter, keyset_order
+from app.repository.unit_of_work import async_commit, commit
 
 
 class PetRepository(BaseRepository[Pet, PetCreate, PetUpdate]):
@@ -36,16 +40,14 @@ class PetRepository(BaseRepository[Pet, PetCreate, PetUpdate]):
             query = query.filter(Pet.status == status)
         return query.order_by(desc(Pet.created_at)).offset(skip).limit(limit).all()
 
-    def get_lost_pets(
+    def _lost_pets_query(
         self,
         *,
-        skip: int = 0,
-        limit: int = 20,
         species: Optional[str] = None,
         location: Optional[str] = None,
         date_from: Optional[date] = None,
         date_to: Optional[date] = None,
-    ) -> List[Pet]:
+    ):
         query = self.db.query(Pet).filter(Pet.status == "lost")
 
         if species:
@@ -60,7 +62,34 @@ class PetRepository(BaseRepository[Pet, PetCreate, PetUpdate]):
         if date_to:
             query = query.filter(Pet.lost_date <= date_to)
 
-        return query.order_by(desc(Pet.lost_date)).offset(skip).limit(limit).all()
+        return query
+
+    def get_lost_pets(
+        self,
+        *,
+        skip: int = 0,
+        limit: int = 20,
+        species: Optional[str] = None,
+        location: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        cursor: Optional[str] = None,
+    ) -> List[Pet]:
+        """
+        Lost pets, most recently lost first
+
+        With ``cursor`` (see app/repository/pagination.py) the page starts
+        after the cursor's row and ``skip`` is ignored.
+        """
+        query = self._lost_pets_query(
+            species=species, location=location, date_from=date_from, date_to=date_to
+        )
+        query = keyset_order(query, Pet.lost_date, Pet.id)
+        if cursor:
+            query = keyset_filter(query, Pet.lost_date, Pet.id, cursor)
+        else:
+            query = query.offset(skip)
+        return query.limit(limit).all()
 
     def update_status(
         self, *, pet_id: uuid.UUID, status_data: PetStatusUpdate
@@ -74,10 +103,92 @@ class PetRepository(BaseRepository[Pet, PetCreate, PetUpdate]):
             setattr(pet, field, value)
 
         self.db.add(pet)
-        self.db.commit()
-        self.db.refresh(pet)
+        commit(self.db, pet)
         return pet
 
+    def get_lost_pet_vectors(
+        self, *, pet_id: Optional[uuid.UUID] = None
+    ) -> List[Tuple[uuid.UUID, str, bytes]]:
+        """
+        Main photo feature vectors of lost pets as (pet id, species, vector)
+
+        The main photo is the one flagged ``is_main``, else the oldest photo.
+        Pets whose main photo has no feature vector yet are left out.
+        """
+        query = (
+            self.db.query(
+                Pet.id, Pet.species, PetPhoto.feature_vector, PetPhoto.is_main
+            )
+            .join(PetPhoto, PetPhoto.pet_id == Pet.id)
+            .filter(Pet.status == "lost")
+        )
+        if pet_id is not None:
+            query = query.filter(Pet.id == pet_id)
+        query = query.order_by(Pet.id, desc(PetPhoto.is_main), PetPhoto.created_at)
+
+        vectors = []
+        current_pet = None
+        for row_pet_id, species, feature_vector, _ in query.yield_per(1000):
+            if row_pet_id == current_pet:
+                continue
+            current_pet = row_pet_id
+            if feature_vector:
+                vectors.append((row_pet_id, species, feature_vector))
+        return vectors
+
+    @read_replica
+    def get_lost_pet_candidates(
+        self,
+        *,
+        species: str,
+        pet_ids: Optional[List[uuid.UUID]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Row]:
+        """
+        Lost pets of a species with their main photo, in one query
+
+        Rows have ``pet_id``, ``name``, ``lost_date``, ``lost_location``,
+        ``photo_url``, ``feature_vector`` and ``detected_attributes``, most
+        recently lost first. The main photo is picked as in
+        ``get_lost_pet_vectors`` and pets without its vector are left out.
+
+        Args:
+            species: Species of the pets
+            pet_ids: Only these pets, e.g. the embedding index candidates
+            limit: Maximum number of pets
+        """
+        main_photos = (
+            self.db.query(
+                Pet.id.label("pet_id"),
+                Pet.name,
+                Pet.lost_date,
+                Pet.lost_location,
+                PetPhoto.url.label("photo_url"),
+                PetPhoto.feature_vector,
+                PetPhoto.detected_attributes,
+            )
+            .join(PetPhoto, PetPhoto.pet_id == Pet.id)
+            .filter(Pet.status == "lost", Pet.species == species)
+        )
+        if pet_ids is not None:
+            if not pet_ids:
+                return []
+            main_photos = main_photos.filter(Pet.id.in_(pet_ids))
+        main_photos = (
+            main_photos.distinct(Pet.id)
+            .order_by(Pet.id, desc(PetPhoto.is_main), PetPhoto.created_at)
+            .subquery()
+        )
+
+        query = (
+            self.db.query(main_photos)
+            .filter(main_photos.c.feature_vector.isnot(None))
+            .order_by(desc(main_photos.c.lost_date))
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
     def count_lost_pets(
         self,
         *,
@@ -85,22 +196,12 @@ class PetRepository(BaseRepository[Pet, PetCreate, PetUpdate]):
         location: Optional[str] = None,
         date_from: Optional[date] = None,
         date_to: Optional[date] = None,
+        estimate: bool = False,
     ) -> int:
-        query = self.db.query(func.count(Pet.id)).filter(Pet.status == "lost")
-
-        if species:
-            query = query.filter(Pet.species == species)
-
-        if location:
-            query = query.filter(Pet.lost_location.ilike(f"%{location}%"))
-
-        if date_from:
-            query = query.filter(Pet.lost_date >= date_from)
-
-        if date_to:
-            query = query.filter(Pet.lost_date <= date_to)
-
-        return query.scalar()
+        query = self._lost_pets_query(
+            species=species, location=location, date_from=date_from, date_to=date_to
+        )
+        return count_rows(query, estimate=estimate)
 
 
 class PetPhotoRepository:
@@ -124,12 +225,14 @@ class PetPhotoRepository:
             image_processing_status="pending",
         )
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit(self.db, db_obj)
         return db_obj
 
-    def get(self, *, id: uuid.UUID) -> Optional[PetPhoto]:
-        return self.db.query(PetPhoto).filter(PetPhoto.id == id).first()
+    def get(self, *, id: uuid.UUID, with_vectors: bool = False) -> Optional[PetPhoto]:
+        query = self.db.query(PetPhoto)
+        if with_vectors:
+            query = query.options(undefer(PetPhoto.feature_vector))
+        return query.filter(PetPhoto.id == id).first()
 
     def get_pet_photos(self, *, pet_id: uuid.UUID) -> List[PetPhoto]:
         return self.db.query(PetPhoto).filter(PetPhoto.pet_id == pet_id).all()
@@ -160,6 +263,86 @@ class PetPhotoRepository:
             photo.feature_vector = feature_vector
 
         self.db.add(photo)
-        self.db.commit()
-        self.db.refresh(photo)
+        commit(self.db, photo)
+        return photo
+
+
+class AsyncPetRepository(AsyncBaseRepository[Pet, PetCreate, PetUpdate]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db, Pet)
+
+    async def get_with_details(self, pet_id: uuid.UUID) -> Optional[Pet]:
+        return await self.db.scalar(
+            select(Pet)
+            .options(joinedload(Pet.owner), selectinload(Pet.photos))
+            .where(Pet.id == pet_id)
+        )
+
+    async def get_many_with_owner(self, pet_ids: List[uuid.UUID]) -> List[Pet]:
+        return list(
+            await self.db.scalars(
+                select(Pet).options(joinedload(Pet.owner)).where(Pet.id.in_(pet_ids))
+            )
+        )
+
+    async def update_status(
+        self, *, pet_id: uuid.UUID, status_data: PetStatusUpdate
+    ) -> Optional[Pet]:
+        pet = await self.get(id=pet_id)
+        if not pet:
+            return None
+
+        update_data = status_data.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(pet, field, value)
+
+        self.db.add(pet)
+        await async_commit(self.db, pet)
+        return pet
+
+
+class AsyncPetPhotoRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(
+        self, *, pet_id: uuid.UUID, obj_in: PetPhotoCreate, url: str, path: str
+    ) -> PetPhoto:
+        if obj_in.is_main:
+            await self.db.execute(
+                update(PetPhoto)
+                .where(PetPhoto.pet_id == pet_id, PetPhoto.is_main == True)
+                .values(is_main=False)
+            )
+
+        db_obj = PetPhoto(
+            pet_id=pet_id,
+            url=url,
+            path=path,
+            is_main=obj_in.is_main,
+            description=obj_in.description,
+            image_processing_status="pending",
+        )
+        self.db.add(db_obj)
+        await async_commit(self.db, db_obj)
+        return db_obj
+
+    async def get(
+        self, *, id: uuid.UUID, with_vectors: bool = False
+    ) -> Optional[PetPhoto]:
+        query = select(PetPhoto)
+        if with_vectors:
+            query = query.options(undefer(PetPhoto.feature_vector))
+        return await self.db.scalar(query.where(PetPhoto.id == id))
+
+    async def update_processing_status(
+        self, *, photo_id: uuid.UUID, status: str
+    ) -> PetPhoto:
+        photo = await self.get(id=photo_id)
+        if not photo:
+            raise ValueError("Photo not found")
+
+        photo.image_processing_status = status
+        self.db.add(photo)
+        await async_commit(self.db, photo)
         return photo
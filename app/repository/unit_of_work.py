@@ -0,0 +1,134 @@
+"""
+Unit of work for the repositories
+
+Repository methods that write end with commit() / async_commit() instead of
+calling db.commit() and db.refresh() themselves. Outside a unit of work that
+commits right away, as before. Inside ``with unit_of_work(db):`` (or
+``async with async_unit_of_work(db):``) it only flushes, so generated ids and
+constraint errors still surface at the call, and the whole block commits
+once at its end or rolls back on an exception:
+
+    with unit_of_work(db):
+        user_repo.revoke_token(token=old_token)
+        user_repo.store_token(user_id=user_id, token=new_token)
+
+Objects are refreshed only when a commit expired them. A flush expires
+nothing and the sessions of AsyncSessionLocal keep their values on commit,
+so there the refresh round trip is skipped.
+
+Side effects that must only see committed data (emails, webhooks, the
+in-memory embedding indexes) go through after_commit() / async_after_commit():
+they run at once outside a unit and after its commit inside one, and are
+dropped on a rollback.
+
+Units are opened per operation (the auth endpoints, the photo pipeline and
+each background task), not per request in get_db/get_async_db. Several
+endpoints send email during the request or hand rows to worker threads that
+use sessions of their own; a request-wide transaction would keep those
+emails waiting in an open transaction and hide the rows from the workers.
+"""
+
+import inspect
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+_KEY = "unit_of_work"
+_CALLBACKS = "after_commit"
+
+
+def in_unit_of_work(db) -> bool:
+    return bool(db.info.get(_KEY))
+
+
+@contextmanager
+def unit_of_work(db: Session):
+    """Run the repository calls on ``db`` in one transaction, committed at the end"""
+    if in_unit_of_work(db):
+        # Nested units join the outer one
+        yield db
+        return
+
+    db.info[_KEY] = True
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.info.pop(_KEY, None)
+        callbacks = db.info.pop(_CALLBACKS, [])
+
+    for callback, args in callbacks:
+        callback(*args)
+
+
+@asynccontextmanager
+async def async_unit_of_work(db: AsyncSession):
+    """unit_of_work for an AsyncSession"""
+    if in_unit_of_work(db):
+        yield db
+        return
+
+    db.info[_KEY] = True
+    try:
+        yield db
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    finally:
+        db.info.pop(_KEY, None)
+        callbacks = db.info.pop(_CALLBACKS, [])
+
+    for callback, args in callbacks:
+        result = callback(*args)
+        if inspect.isawaitable(result):
+            await result
+
+
+def commit(db: Session, *objs: Any) -> None:
+    """Commit and refresh ``objs``, or only flush inside a unit of work"""
+    if in_unit_of_work(db):
+        db.flush()
+        return
+
+    db.commit()
+    if db.expire_on_commit:
+        for obj in objs:
+            db.refresh(obj)
+
+
+async def async_commit(db: AsyncSession, *objs: Any) -> None:
+    """commit for an AsyncSession"""
+    if in_unit_of_work(db):
+        await db.flush()
+        return
+
+    await db.commit()
+    if db.sync_session.expire_on_commit:
+        for obj in objs:
+            await db.refresh(obj)
+
+
+def after_commit(db: Session, callback: Callable[..., Any], *args: Any) -> None:
+    """Call ``callback(*args)`` now, or after the commit inside a unit of work"""
+    if in_unit_of_work(db):
+        db.info.setdefault(_CALLBACKS, []).append((callback, args))
+        return
+    callback(*args)
+
+
+async def async_after_commit(
+    db: AsyncSession, callback: Callable[..., Any], *args: Any
+) -> None:
+    """after_commit for an AsyncSession, ``callback`` may be a coroutine function"""
+    if in_unit_of_work(db):
+        db.info.setdefault(_CALLBACKS, []).append((callback, args))
+        return
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
@@ -3,8 +3,10 @@ import uuid
 import hashlib
 from datetime import datetime, timedelta
 
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, update
 
 from app.models.user import User
 from app.models.pet import Pet
@@ -12,7 +14,8 @@ from app.models.verification_code import VerificationCode
 from app.models.reset_token import ResetToken
 from app.models.token import ActiveToken
 from app.schemas.user import UserCreate, UserUpdate
-from app.repository.base import BaseRepository
+from app.repository.base import AsyncBaseRepository, BaseRepository
+from app.repository.unit_of_work import async_commit, commit
 from app.core.security import get_password_hash, verify_password
 
 
@@ -33,8 +36,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             is_verified=False,
         )
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit(self.db, db_obj)
         return db_obj
 
     def authenticate(self, *, email: str, password: str) -> Optional[User]:
@@ -51,8 +53,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             raise ValueError("User not found")
         user.password_hash = get_password_hash(new_password)
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        commit(self.db, user)
         return user
 
     def mark_verified(self, *, user_id: uuid.UUID) -> User:
@@ -61,8 +62,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             raise ValueError("User not found")
         user.is_verified = True
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        commit(self.db, user)
         return user
 
     def get_user_statistics(self, *, user_id: uuid.UUID) -> Dict[str, int]:
@@ -112,8 +112,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             metadata=metadata or {},
         )
         self.db.add(verification_code)
-        self.db.commit()
-        self.db.refresh(verification_code)
+        commit(self.db, verification_code)
         return verification_code
 
     def verify_code(
@@ -152,14 +151,14 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             VerificationCode.user_id == user_id,
             VerificationCode.code == code,
         ).update({"is_used": True})
-        self.db.commit()
+        commit(self.db)
 
     def delete_verification_code(self, *, user_id: uuid.UUID, code: str) -> None:
         self.db.query(VerificationCode).filter(
             VerificationCode.user_id == user_id,
             VerificationCode.code == code,
         ).delete()
-        self.db.commit()
+        commit(self.db)
 
     def store_reset_token(
         self, *, user_id: uuid.UUID, token: str, expires_minutes: int
@@ -177,8 +176,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             is_used=False,
         )
         self.db.add(reset_token)
-        self.db.commit()
-        self.db.refresh(reset_token)
+        commit(self.db, reset_token)
         return reset_token
 
     def get_user_by_reset_token(self, *, token: str) -> Optional[User]:
@@ -215,7 +213,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
         self.db.query(ResetToken).filter(
             ResetToken.token == token,
         ).update({"is_used": True})
-        self.db.commit()
+        commit(self.db)
 
     def _hash_token(self, token: str) -> str:
         return hashlib.sha256(token.encode()).hexdigest()
@@ -241,8 +239,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             device_info=device_info,
         )
         self.db.add(active_token)
-        self.db.commit()
-        self.db.refresh(active_token)
+        commit(self.db, active_token)
         return active_token
 
     def is_token_valid(self, token: str) -> bool:
@@ -268,7 +265,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             .delete()
         )
 
-        self.db.commit()
+        commit(self.db)
         return deleted > 0
 
     def revoke_all_user_tokens(self, user_id: uuid.UUID) -> int:
@@ -276,7 +273,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
             self.db.query(ActiveToken).filter(ActiveToken.user_id == user_id).delete()
         )
 
-        self.db.commit()
+        commit(self.db)
         return result
 
     def clean_expired_tokens(self) -> int:
@@ -284,7 +281,7 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
         result = (
             self.db.query(ActiveToken).filter(ActiveToken.expires_at < now).delete()
         )
-        self.db.commit()
+        commit(self.db)
         return result
 
     def update_email(self, *, user_id: uuid.UUID, new_email: str) -> User:
@@ -296,6 +293,78 @@ class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
         user.is_verified = True
 
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        commit(self.db, user)
         return user
+
+
+class AsyncUserRepository(AsyncBaseRepository[User, UserCreate, UserUpdate]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db, User)
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        return await self.db.scalar(select(User).where(User.email == email))
+
+    async def create(self, *, obj_in: UserCreate) -> User:
+        # bcrypt is deliberately slow, keep it off the event loop
+        password_hash = await run_in_threadpool(get_password_hash, obj_in.password)
+        db_obj = User(
+            email=obj_in.email,
+            password_hash=password_hash,
+            first_name=obj_in.first_name,
+            last_name=obj_in.last_name,
+            phone=obj_in.phone,
+            is_verified=False,
+        )
+        self.db.add(db_obj)
+        await async_commit(self.db, db_obj)
+        return db_obj
+
+    async def store_verification_code(
+        self,
+        *,
+        user_id: uuid.UUID,
+        code: str,
+        expires_minutes: int,
+        metadata: Dict = None,
+    ) -> VerificationCode:
+        expires_at = datetime.utcnow() + timedelta(minutes=expires_minutes)
+
+        await self.db.execute(
+            update(VerificationCode)
+            .where(
+                VerificationCode.user_id == user_id, VerificationCode.is_used == False
+            )
+            .values(is_used=True)
+        )
+
+        verification_code = VerificationCode(
+            user_id=user_id,
+            code=code,
+            expires_at=expires_at,
+            is_used=False,
+            metadata=metadata or {},
+        )
+        self.db.add(verification_code)
+        await async_commit(self.db, verification_code)
+        return verification_code
+
+    async def store_reset_token(
+        self, *, user_id: uuid.UUID, token: str, expires_minutes: int
+    ) -> ResetToken:
+        expires_at = datetime.utcnow() + timedelta(minutes=expires_minutes)
+
+        await self.db.execute(
+            update(ResetToken)
+            .where(ResetToken.user_id == user_id, ResetToken.is_used == False)
+            .values(is_used=True)
+        )
+
+        reset_token = ResetToken(
+            user_id=user_id,
+            token=token,
+            expires_at=expires_at,
+            is_used=False,
+        )
+        self.db.add(reset_token)
+        await async_commit(self.db, reset_token)
+        return reset_token
@@ -1,11 +1,13 @@
 from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, select
 import uuid
 
 from app.models.webhook import Webhook
 from app.schemas.webhook import WebhookCreate, WebhookUpdate
-from app.repository.base import BaseRepository
+from app.repository.base import AsyncBaseRepository, BaseRepository
+from app.repository.unit_of_work import async_commit, commit
 
 
 class WebhookRepository(BaseRepository[Webhook, WebhookCreate, WebhookUpdate]):
@@ -31,8 +33,7 @@ class WebhookRepository(BaseRepository[Webhook, WebhookCreate, WebhookUpdate]):
             is_active=True,
         )
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit(self.db, db_obj)
         return db_obj
 
     def deactivate_webhook(self, *, webhook_id: uuid.UUID) -> Optional[Webhook]:
@@ -42,6 +43,56 @@ class WebhookRepository(BaseRepository[Webhook, WebhookCreate, WebhookUpdate]):
 
         webhook.is_active = False
         self.db.add(webhook)
-        self.db.commit()
-        self.db.refresh(webhook)
+        commit(self.db, webhook)
+        return webhook
+
+
+class AsyncWebhookRepository(
+    AsyncBaseRepository[Webhook, WebhookCreate, WebhookUpdate]
+):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db, Webhook)
+
+    async def get_user_webhooks(
+        self, *, user_id: uuid.UUID, active_only: bool = True
+    ) -> List[Webhook]:
+        query = select(Webhook).where(Webhook.user_id == user_id)
+
+        if active_only:
+            query = query.where(Webhook.is_active == True)
+
+        return list(await self.db.scalars(query.order_by(desc(Webhook.created_at))))
+
+    async def get_users_webhooks(
+        self, *, user_ids: List[uuid.UUID], event_type: str
+    ) -> List[Webhook]:
+        """Active webhooks of several users subscribed to ``event_type``"""
+        query = select(Webhook).where(
+            Webhook.user_id.in_(user_ids), Webhook.is_active == True
+        )
+        webhooks = await self.db.scalars(query.order_by(desc(Webhook.created_at)))
+        return [webhook for webhook in webhooks if event_type in webhook.event_types]
+
+    async def create_webhook(
+        self, *, user_id: uuid.UUID, obj_in: WebhookCreate
+    ) -> Webhook:
+        db_obj = Webhook(
+            user_id=user_id,
+            url=obj_in.url,
+            event_types=obj_in.event_types,
+            secret=obj_in.secret,
+            is_active=True,
+        )
+        self.db.add(db_obj)
+        await async_commit(self.db, db_obj)
+        return db_obj
+
+    async def deactivate_webhook(self, *, webhook_id: uuid.UUID) -> Optional[Webhook]:
+        webhook = await self.get(id=webhook_id)
+        if not webhook:
+            return None
+
+        webhook.is_active = False
+        self.db.add(webhook)
+        await async_commit(self.db, webhook)
         return webhook
@@ -60,7 +60,9 @@ class FoundPetList(BaseSchema):
 
 class FoundPetListResponse(BaseSchema):
     items: List[FoundPetList]
-    total: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     page: int
     limit: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
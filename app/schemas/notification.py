@@ -32,8 +32,10 @@ class NotificationUpdate(BaseSchema):
 
 class NotificationList(BaseSchema):
     items: List[Notification]
-    total: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     page: int
     limit: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
     unread_count: int
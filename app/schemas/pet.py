@@ -101,7 +101,9 @@ class PetList(BaseSchema):
 
 class PetListResponse(BaseSchema):
     items: List[PetList]
-    total: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     page: int
     limit: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
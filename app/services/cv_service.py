@@ -3,10 +3,25 @@ import numpy as np
 import uuid
 import time
 import logging
-from typing import List, Dict, Any, Optional, Tuple, BinaryIO
-from tempfile import NamedTemporaryFile
-
-from app.cv.pet_finder import SimplePetFinder
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO, Union
+
+from app.cv.registry import (
+    get_pet_finder,
+    get_inference_scheduler,
+    get_analysis_cache,
+    get_cv_workers,
+    get_lost_pet_index,
+    get_found_pet_index,
+)
+from app.cv.workers import uses_worker_processes
+from app.cv.embedding import compatible, decode_embedding, unit_vector
+from app.cv.scoring import (
+    COMPONENTS,
+    BatchScorer,
+    matching_features,
+    normalize_weights,
+    top_k_indices,
+)
 from app.core.config import settings
 
 # Set up logging
@@ -15,7 +30,6 @@ logger = logging.getLogger(__name__)
 
 class CVService:
     def __init__(self):
-        self.pet_finder = SimplePetFinder()
         self.detection_threshold = getattr(settings, "CV_DETECTION_THRESHOLD", 0.5)
         self.similarity_threshold = getattr(settings, "CV_SIMILARITY_THRESHOLD", 0.6)
         self.default_weights = {
@@ -26,47 +40,72 @@ class CVService:
         }
         logger.info("CVService initialized with pet finder")
 
-    def analyze_image(self, image_path: str) -> Dict[str, Any]:
+    # The CV stack is loaded on first use, so creating the service (and
+    # importing it) stays cheap, and processes that hand the pipeline to CV
+    # workers never load the models themselves
+
+    @property
+    def pet_finder(self):
+        return get_pet_finder()
+
+    @property
+    def inference(self):
+        return get_inference_scheduler()
+
+    @property
+    def workers(self):
+        return get_cv_workers() if uses_worker_processes() else None
+
+    @property
+    def analysis_cache(self):
+        return get_analysis_cache()
+
+    def analyze_image(self, image: Union[str, bytes]) -> Dict[str, Any]:
         """
         Analyze an image to detect pets and their attributes
 
         Args:
-            image_path: Path to the image file
+            image: Path to the image file or raw image bytes
 
         Returns:
             Dictionary with detected animals information and processing time
         """
         start_time = time.time()
+        source = image if isinstance(image, str) else "<uploaded content>"
         try:
-            logger.info(f"Analyzing image at path: {image_path}")
-            cropped_pet, pet_class, attributes = self.pet_finder.detect_pet(image_path)
+            logger.info(f"Analyzing image: {source}")
+            if isinstance(image, bytes):
+                analysis = self.analysis_cache.get_or_analyze(
+                    image, self.inference.analyze
+                )
+            else:
+                analysis = self.inference.analyze(image)
 
-            if cropped_pet is None:
-                logger.warning(f"No animals detected in image: {image_path}")
+            if analysis["species"] is None:
+                logger.warning(f"No animals detected in image: {source}")
                 return {"detected_animals": [], "processing_time_ms": 0}
 
-            bounding_box = [0, 0, cropped_pet.width, cropped_pet.height]
-
+            attributes = analysis["attributes"]
             processing_time = int((time.time() - start_time) * 1000)  # Convert to ms
 
             result = {
                 "detected_animals": [
                     {
-                        "species": pet_class,
+                        "species": analysis["species"],
                         "confidence": (
                             attributes.get("confidence", 0.0) if attributes else 0.0
                         ),
-                        "bounding_box": bounding_box,
+                        "bounding_box": analysis["bounding_box"],
                         "attributes": attributes or {},
                     }
                 ],
                 "processing_time_ms": processing_time,
             }
-            logger.info(f"Successfully analyzed image: {image_path}")
+            logger.info(f"Successfully analyzed image: {source}")
             return result
 
         except Exception as e:
-            logger.error(f"Error analyzing image {image_path}: {str(e)}", exc_info=True)
+            logger.error(f"Error analyzing image {source}: {str(e)}", exc_info=True)
             processing_time = int((time.time() - start_time) * 1000)
             return {
                 "error": str(e),
@@ -84,17 +123,8 @@ class CVService:
         Returns:
             Dictionary with detected animals information and processing time
         """
-        with NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-            temp_path = temp_file.name
-            image_content.seek(0)
-            temp_file.write(image_content.read())
-
-        try:
-            result = self.analyze_image(temp_path)
-            return result
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        image_content.seek(0)
+        return self.analyze_image(image_content.read())
 
     def compare_images(
         self,
@@ -105,10 +135,13 @@ class CVService:
         location_data: Optional[Dict] = None,
         date_data: Optional[Dict] = None,
         feature_weights: Optional[Dict] = None,
+        top_k: Optional[int] = None,
     ) -> Dict[str, Any]:
         """
         Compare a source image against multiple target images
 
+        All targets are scored in one batch, see app/cv/scoring.py
+
         Args:
             source_features: Feature vector for source image
             target_features_list: List of feature vectors for target images
@@ -117,10 +150,23 @@ class CVService:
             location_data: Dictionary with source and target location information
             date_data: Dictionary with source and target date information
             feature_weights: Dictionary with weights for each component
+            top_k: Keep only the best ``top_k`` matches above the threshold
 
         Returns:
             Dictionary with comparison results and metadata
         """
+        if self.workers is not None and source_features and target_features_list:
+            return self.workers.compare_images(
+                source_features,
+                target_features_list,
+                source_attrs=source_attrs,
+                target_attrs_list=target_attrs_list,
+                location_data=location_data,
+                date_data=date_data,
+                feature_weights=feature_weights,
+                top_k=top_k,
+            )
+
         start_time = time.time()
 
         if not source_features or not target_features_list:
@@ -139,17 +185,7 @@ class CVService:
                 },
             }
 
-        if feature_weights is None:
-            feature_weights = self.default_weights.copy()
-
-        for component in ["visual", "attribute", "location", "time"]:
-            if component not in feature_weights:
-                feature_weights[component] = self.default_weights.get(component, 0.25)
-
-        total_weight = sum(feature_weights.values())
-        if total_weight != 1:
-            for k in feature_weights:
-                feature_weights[k] /= total_weight
+        feature_weights = normalize_weights(feature_weights, self.default_weights)
 
         try:
             logger.info(
@@ -157,23 +193,32 @@ class CVService:
             )
 
             try:
-                source_array = np.frombuffer(source_features, dtype=np.float32)
+                source = decode_embedding(source_features)
             except Exception as e:
-                logger.error(f"Error converting source features to numpy array: {e}")
+                logger.error(f"Error decoding source feature vector: {e}")
                 raise ValueError(f"Invalid source feature vector format: {e}")
 
             target_arrays = []
             valid_indices = []
+            incompatible = 0
 
             for i, target_feature in enumerate(target_features_list):
                 try:
-                    target_array = np.frombuffer(target_feature, dtype=np.float32)
-                    target_arrays.append(target_array)
-                    valid_indices.append(i)
+                    target = decode_embedding(target_feature)
                 except Exception as e:
-                    logger.error(
-                        f"Error converting target feature {i} to numpy array: {e}"
-                    )
+                    logger.error(f"Error decoding target feature {i}: {e}")
+                    continue
+                if not compatible(source, target):
+                    incompatible += 1
+                    continue
+                target_arrays.append(unit_vector(target))
+                valid_indices.append(i)
+
+            if incompatible:
+                logger.warning(
+                    f"Skipped {incompatible} target vectors from a different model "
+                    f"than the source ({source.model_id or 'legacy'})"
+                )
 
             if not target_arrays:
                 logger.warning("No valid target feature vectors")
@@ -184,79 +229,75 @@ class CVService:
                         "filtered_candidates": 0,
                         "processing_time_ms": int((time.time() - start_time) * 1000),
                         "search_radius_expanded": False,
+                        "incompatible_candidates": incompatible,
                         "error_occurred": True,
                         "error": "No valid target feature vectors",
                     },
                 }
 
-            comparisons = []
-            for i, target_array in enumerate(target_arrays):
-                orig_idx = valid_indices[i]
-
-                target_attrs = (
-                    target_attrs_list[orig_idx]
-                    if target_attrs_list and orig_idx < len(target_attrs_list)
-                    else None
-                )
-
-                location1 = location2 = None
-                if (
-                    location_data
-                    and "source" in location_data
-                    and "targets" in location_data
-                    and location_data["source"]
-                ):
-                    location1 = location_data["source"]
-                    location2 = (
-                        location_data["targets"][orig_idx]
-                        if location_data["targets"]
-                        and orig_idx < len(location_data["targets"])
-                        else None
-                    )
-
-                date1 = date2 = None
-                if date_data and "source" in date_data and "targets" in date_data:
-                    date1 = date_data["source"]
-                    date2 = (
-                        date_data["targets"][orig_idx]
-                        if date_data["targets"] and orig_idx < len(date_data["targets"])
-                        else None
-                    )
-
-                try:
-                    similarity = self.pet_finder.compare_pets(
-                        source_array,
-                        target_array,
-                        source_attrs,
-                        target_attrs,
-                        location1,
-                        location2,
-                        date1,
-                        date2,
-                        weights=feature_weights,
-                    )
-                except Exception as e:
-                    logger.error(f"Error comparing pets: {e}")
-                    continue
-
-                try:
-                    matching_features = self.pet_finder.get_matching_features(
-                        source_attrs, target_attrs
-                    )
-                except Exception as e:
-                    logger.error(f"Error getting matching features: {e}")
-                    matching_features = []
+            def aligned(values):
+                values = values or []
+                return [values[i] if i < len(values) else None for i in valid_indices]
+
+            target_attrs = aligned(target_attrs_list)
+
+            source_location = target_locations = None
+            if (
+                location_data
+                and "source" in location_data
+                and "targets" in location_data
+                and location_data["source"]
+            ):
+                source_location = location_data["source"]
+                target_locations = aligned(location_data["targets"])
+
+            source_date = target_dates = None
+            if date_data and "source" in date_data and "targets" in date_data:
+                source_date = date_data["source"]
+                target_dates = aligned(date_data["targets"])
+
+            scores = BatchScorer(feature_weights).score(
+                unit_vector(source),
+                target_arrays,
+                source_attrs,
+                target_attrs if target_attrs_list else None,
+                source_location,
+                target_locations,
+                source_date,
+                target_dates,
+                normalized=True,
+            )
 
-                if similarity["overall"] >= self.similarity_threshold:
-                    comparisons.append(
-                        {
-                            "target_index": orig_idx,
-                            "similarity": similarity,
-                            "matching_features": matching_features,
-                        }
-                    )
+            source_precision = (source_attrs or {}).get("feature_precision", "fp32")
+            mixed_precision = np.array(
+                [
+                    (attrs or {}).get("feature_precision", "fp32") != source_precision
+                    for attrs in target_attrs
+                ],
+                dtype=bool,
+            )
+            mixed_precision_count = int(mixed_precision.sum())
 
-            comparisons.sort(key=lambda x: x["similarity"]["overall"], reverse=True)
+            comparisons = []
+            for i in top_k_indices(scores["overall"], self.similarity_threshold, top_k):
+                comparison = {
+                    "target_index": valid_indices[i],
+                    "similarity": {
+                        component: float(scores[component][i])
+                        for component in COMPONENTS + ["overall"]
+                    },
+                    "matching_features": matching_features(scores["matches"], i),
+                }
+                if mixed_precision[i]:
+                    comparison["mixed_precision"] = True
+                comparisons.append(comparison)
+
+            if mixed_precision_count:
+                logger.warning(
+                    f"Compared a {source_precision} feature vector with "
+                    f"{mixed_precision_count} vectors of a different precision; "
+                    "visual similarity may be skewed"
+                )
 
             processing_time = int((time.time() - start_time) * 1000)
 
@@ -265,6 +306,7 @@ class CVService:
                 "search_metadata": {
                     "total_candidates_considered": len(target_features_list),
                     "filtered_candidates": len(comparisons),
+                    "incompatible_candidates": incompatible,
                     "processing_time_ms": processing_time,
                     "search_radius_expanded": False,
                     "similarity_threshold": self.similarity_threshold,
@@ -371,6 +413,38 @@ class CVService:
                 },
             }
 
+    def find_candidates(
+        self, species: str, feature_vector, k: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Nearest lost pets of a species by embedding similarity
+
+        Args:
+            species: Species to search within
+            feature_vector: Query embedding
+            k: Number of candidates, CV_INDEX_CANDIDATES by default
+
+        Returns:
+            List of (pet id, cosine similarity), most similar first
+        """
+        return get_lost_pet_index().search(species, feature_vector, k)
+
+    def find_found_pet_candidates(
+        self, species: str, feature_vector, k: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Nearest found pets of a species by embedding similarity
+
+        Args:
+            species: Species to search within
+            feature_vector: Query embedding
+            k: Number of candidates, CV_INDEX_CANDIDATES by default
+
+        Returns:
+            List of (found pet id, cosine similarity), most similar first
+        """
+        return get_found_pet_index().search(species, feature_vector, k)
+
     def find_potential_matches(
         self,
         pet_photo_id: str,
@@ -383,6 +457,10 @@ class CVService:
         """
         Find potential matches for a lost or found pet
 
+        Scores exactly the given targets. To search every lost or found pet,
+        take the targets from find_candidates / find_found_pet_candidates
+        first, as the found pet matching and GET /found-pets do.
+
         Args:
             pet_photo_id: ID of the source pet photo
             feature_vector: Feature vector of the source pet photo
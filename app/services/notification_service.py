@@ -1,11 +1,14 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import uuid
+import asyncio
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.repository.notification import NotificationRepository
-from app.repository.user import UserRepository
-from app.repository.pet import PetRepository
+from app.repository.notification import AsyncNotificationRepository
+from app.repository.user import AsyncUserRepository
+from app.repository.pet import AsyncPetRepository
+from app.repository.found_pet import AsyncFoundPetRepository
+from app.repository.unit_of_work import async_after_commit
 from app.schemas.notification import NotificationCreate
 from app.models.match import Match
 from app.models.pet import Pet
@@ -14,11 +17,12 @@ from app.services.webhook_service import WebhookService
 
 
 class NotificationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.notification_repo = NotificationRepository(db)
-        self.user_repo = UserRepository(db)
-        self.pet_repo = PetRepository(db)
+        self.notification_repo = AsyncNotificationRepository(db)
+        self.user_repo = AsyncUserRepository(db)
+        self.pet_repo = AsyncPetRepository(db)
+        self.found_pet_repo = AsyncFoundPetRepository(db)
         self.email_service = EmailService()
         self.webhook_service = WebhookService(db)
 
@@ -39,10 +43,10 @@ class NotificationService:
             message=message,
             data=data or {},
         )
-        notification = self.notification_repo.create(obj_in=notification_data)
+        notification = await self.notification_repo.create(obj_in=notification_data)
 
         if send_email:
-            user = self.user_repo.get(id=user_id)
+            user = await self.user_repo.get(id=user_id)
             if user and user.email:
                 email_methods = {
                     "pet_lost_confirmation": self.email_service.send_pet_lost_confirmation,
@@ -60,7 +64,7 @@ class NotificationService:
         return notification
 
     async def create_pet_lost_notification(self, *, pet):
-        user = self.user_repo.get(id=pet.owner_id)
+        user = await self.user_repo.get(id=pet.owner_id)
         if not user:
             return False
 
@@ -93,11 +97,11 @@ class NotificationService:
         return True
 
     async def create_match_found_notification(self, *, match):
-        pet = self.pet_repo.get_with_details(pet_id=match.lost_pet_id)
+        pet = await self.pet_repo.get_with_details(pet_id=match.lost_pet_id)
         if not pet:
             return False
 
-        user = self.user_repo.get(id=pet.owner_id)
+        user = await self.user_repo.get(id=pet.owner_id)
         if not user:
             return False
 
@@ -138,16 +142,111 @@ class NotificationService:
 
         return True
 
+    async def create_match_found_notifications(self, *, matches: List) -> int:
+        """
+        create_match_found_notification for many new matches at once
+
+        The pets and owners are loaded in one query, the webhooks in another
+        and the notifications are inserted in one batch. Emails and webhooks
+        are sent after the commit, so no transaction waits on SMTP or HTTP;
+        inside a unit of work that is the commit at the end of the unit.
+
+        Args:
+            matches: Matches, or rows with ``id``, ``lost_pet_id``,
+                ``found_pet_id`` and ``similarity``
+
+        Returns:
+            The number of notifications created
+        """
+        if not matches:
+            return 0
+
+        pets = {
+            pet.id: pet
+            for pet in await self.pet_repo.get_many_with_owner(
+                [match.lost_pet_id for match in matches]
+            )
+        }
+        webhooks = await self.webhook_service.get_subscribed_webhooks(
+            user_ids=list({pet.owner_id for pet in pets.values()}),
+            event_type="match_found",
+        )
+
+        notifications = []
+        emails = []
+        deliveries = []
+        for match in matches:
+            pet = pets.get(match.lost_pet_id)
+            if not pet or not pet.owner:
+                continue
+            user = pet.owner
+
+            notifications.append(
+                {
+                    "user_id": pet.owner_id,
+                    "type": "match_found",
+                    "title": "Найдено возможное совпадение",
+                    "message": f"Мы нашли питомца, похожего на вашего {pet.name}, с вероятностью {match.similarity:.0%}",
+                    "data": {
+                        "match_id": str(match.id),
+                        "pet_id": str(pet.id),
+                        "pet_name": pet.name,
+                        "similarity": match.similarity,
+                        "found_pet_id": str(match.found_pet_id),
+                    },
+                }
+            )
+            if user.email:
+                emails.append(
+                    {
+                        "to_email": user.email,
+                        "user_name": f"{user.first_name} {user.last_name}",
+                        "pet_name": pet.name,
+                        "similarity": match.similarity,
+                        "match_id": str(match.id),
+                    }
+                )
+            for webhook in webhooks.get(pet.owner_id, []):
+                deliveries.append(
+                    (
+                        webhook,
+                        {
+                            "match_id": str(match.id),
+                            "pet_id": str(pet.id),
+                            "found_pet_id": str(match.found_pet_id),
+                            "similarity": match.similarity,
+                        },
+                    )
+                )
+
+        if not notifications:
+            return 0
+        await self.notification_repo.create_many(notifications=notifications)
+
+        async def send():
+            await asyncio.gather(
+                *(
+                    self.email_service.send_match_found_notification(**email)
+                    for email in emails
+                ),
+                self.webhook_service.deliver(
+                    event_type="match_found", deliveries=deliveries
+                ),
+            )
+
+        await async_after_commit(self.db, send)
+        return len(notifications)
+
     async def create_match_confirmed_notification(self, *, match):
-        found_pet = self.db.query(match.found_pet).first()
+        found_pet = await self.found_pet_repo.get(id=match.found_pet_id)
         if not found_pet:
             return False
 
-        finder = self.user_repo.get(id=found_pet.finder_id)
+        finder = await self.user_repo.get(id=found_pet.finder_id)
         if not finder:
             return False
 
-        lost_pet = self.pet_repo.get(id=match.lost_pet_id)
+        lost_pet = await self.pet_repo.get(id=match.lost_pet_id)
         if not lost_pet:
             return False
 
@@ -210,7 +309,7 @@ class NotificationService:
     async def send_verification_email(
         self, *, user_id: uuid.UUID, verification_code: str
     ):
-        user = self.user_repo.get(id=user_id)
+        user = await self.user_repo.get(id=user_id)
         if not user or not user.email:
             return False
 
@@ -221,7 +320,7 @@ class NotificationService:
         )
 
     async def send_password_reset_email(self, *, email: str, reset_token: str):
-        user = self.user_repo.get_by_email(email=email)
+        user = await self.user_repo.get_by_email(email=email)
         if not user:
             return False
 
@@ -234,7 +333,7 @@ class NotificationService:
     async def send_email_change_verification(
         self, *, user_id: uuid.UUID, new_email: str, verification_code: str
     ):
-        user = self.user_repo.get(id=user_id)
+        user = await self.user_repo.get(id=user_id)
         if not user:
             return False
 
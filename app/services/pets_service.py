@@ -8,16 +8,30 @@ import logging
 import time
 from concurrent.futures import ThreadPoolExecutor
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import UploadFile, BackgroundTasks
 
 from app.core.config import settings
-from app.repository.pet import PetRepository, PetPhotoRepository
-from app.repository.found_pet import FoundPetRepository
-from app.repository.match import MatchRepository
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.repository.pet import (
+    PetRepository,
+    PetPhotoRepository,
+    AsyncPetRepository,
+    AsyncPetPhotoRepository,
+)
+from app.repository.found_pet import FoundPetRepository, AsyncFoundPetRepository
+from app.repository.match import AsyncMatchRepository
+from app.repository.unit_of_work import async_unit_of_work, unit_of_work
 from app.schemas.pet import PetCreate, PetUpdate, PetStatusUpdate, PetPhotoCreate
 from app.schemas.found_pet import FoundPetCreate
-from app.cv.pet_finder import SimplePetFinder
+from app.cv.registry import (
+    get_inference_scheduler,
+    get_analysis_cache,
+    get_lost_pet_index,
+    get_found_pet_index,
+    get_model_async,
+)
+from app.cv.embedding import encode_embedding
 from app.services.notification_service import NotificationService
 from app.services.cv_service import CVService
 
@@ -28,19 +42,40 @@ _background_tasks = {}
 
 
 class PetsService:
-    def __init__(self, db: Session):
+    """
+    Pets, photos and found pet reports
+
+    Request handlers use the async session passed in. The photo analysis and
+    match finding run in worker threads, each with its own sync session, and
+    background tasks open their own async session since the request's one is
+    closed once the response is sent.
+    """
+
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.pet_repo = PetRepository(db)
-        self.photo_repo = PetPhotoRepository(db)
-        self.found_pet_repo = FoundPetRepository(db)
-        self.match_repo = MatchRepository(db)
-        self.pet_finder = SimplePetFinder()
+        self.pet_repo = AsyncPetRepository(db)
+        self.photo_repo = AsyncPetPhotoRepository(db)
+        self.found_pet_repo = AsyncFoundPetRepository(db)
+        self.match_repo = AsyncMatchRepository(db)
         self.notification_service = NotificationService(db)
         self.cv_service = CVService()
 
         os.makedirs(os.path.join(settings.UPLOADS_DIR, "pets"), exist_ok=True)
         os.makedirs(os.path.join(settings.UPLOADS_DIR, "found_pets"), exist_ok=True)
 
+    @property
+    def inference(self):
+        # Loaded on first CV use, not for every pets request
+        return get_inference_scheduler()
+
+    @property
+    def analysis_cache(self):
+        return get_analysis_cache()
+
+    @property
+    def lost_pet_index(self):
+        return get_lost_pet_index()
+
     async def create_pet(
         self,
         owner_id: uuid.UUID,
@@ -53,7 +88,7 @@ class PetsService:
         pet_data = pet_in.dict()
         pet_data["owner_id"] = owner_id
 
-        pet = self.pet_repo.create(obj_in=pet_data)
+        pet = await self.pet_repo.create(obj_in=pet_data)
 
         if photo:
             await self.upload_pet_photo(
@@ -64,18 +99,22 @@ class PetsService:
                 background_tasks=background_tasks,
             )
 
-            pet = self.pet_repo.get_with_details(pet_id=pet.id)
-
-        return pet
+        return await self.pet_repo.get_with_details(pet_id=pet.id)
 
     async def update_pet(self, pet_id: uuid.UUID, pet_in: PetUpdate):
-        pet = self.pet_repo.get(id=pet_id)
+        pet = await self.pet_repo.get(id=pet_id)
         if not pet:
             return None
-        return self.pet_repo.update(db_obj=pet, obj_in=pet_in)
+        pet = await self.pet_repo.update(db_obj=pet, obj_in=pet_in)
+        await self._refresh_lost_pet_index_async(pet.id)
+        return await self.pet_repo.get_with_details(pet_id=pet.id)
 
     async def update_pet_status(self, pet_id: uuid.UUID, status_in: PetStatusUpdate):
-        return self.pet_repo.update_status(pet_id=pet_id, status_data=status_in)
+        pet = await self.pet_repo.update_status(pet_id=pet_id, status_data=status_in)
+        if not pet:
+            return None
+        await self._refresh_lost_pet_index_async(pet.id)
+        return await self.pet_repo.get_with_details(pet_id=pet.id)
 
     async def upload_pet_photo(
         self,
@@ -97,7 +136,7 @@ class PetsService:
         photo_in = PetPhotoCreate(is_main=is_main, description=description)
         photo_url = f"/uploads/{file_path}"
 
-        photo = self.photo_repo.create(
+        photo = await self.photo_repo.create(
             pet_id=pet_id, obj_in=photo_in, url=photo_url, path=absolute_path
         )
 
@@ -108,7 +147,11 @@ class PetsService:
             )
         else:
             logger.info(f"Running synchronous processing for photo {photo.id}")
-            self._process_pet_photo(photo.id, absolute_path)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(
+                _thread_pool, self._process_pet_photo, photo.id, absolute_path
+            )
+            await self.db.refresh(photo)
 
         return photo
 
@@ -123,10 +166,7 @@ class PetsService:
 
             photo_id_uuid = uuid.UUID(photo_id)
 
-            self.photo_repo.update_processing_status(
-                photo_id=photo_id_uuid, status="processing"
-            )
-
+            # _process_pet_photo marks the photo as processing when it starts
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(
                 _thread_pool, self._process_pet_photo, photo_id_uuid, file_path
@@ -140,39 +180,58 @@ class PetsService:
                 f"Error in background processing of photo {photo_id}: {str(e)}",
                 exc_info=True,
             )
-            self.photo_repo.update_processing_status(
-                photo_id=uuid.UUID(photo_id), status="failed"
-            )
+            async with AsyncSessionLocal() as db:
+                await AsyncPetPhotoRepository(db).update_processing_status(
+                    photo_id=uuid.UUID(photo_id), status="failed"
+                )
             _background_tasks[task_id] = {"status": "failed", "error": str(e)}
 
     def _process_pet_photo(self, photo_id: uuid.UUID, file_path: str):
-        try:
-            self.photo_repo.update_processing_status(
-                photo_id=photo_id, status="processing"
-            )
+        # Runs in a worker thread, with a session of its own
+        with SessionLocal() as db:
+            photo_repo = PetPhotoRepository(db)
+            try:
+                photo_repo.update_processing_status(
+                    photo_id=photo_id, status="processing"
+                )
+
+                analysis = self._analyze_photo_file(file_path)
+                if analysis["species"] is None:
+                    photo_repo.update_processing_status(
+                        photo_id=photo_id, status="failed"
+                    )
+                    return
 
-            cropped_pet, pet_class, attributes = self.pet_finder.detect_pet(file_path)
-            if cropped_pet is None:
-                self.photo_repo.update_processing_status(
-                    photo_id=photo_id, status="failed"
+                feature_vector = analysis["feature_vector"]
+                feature_bytes = (
+                    encode_embedding(feature_vector)
+                    if feature_vector is not None
+                    else None
                 )
-                return
 
-            feature_vector = self.pet_finder.extract_features(cropped_pet)
-            feature_bytes = (
-                feature_vector.tobytes() if feature_vector is not None else None
-            )
+                # Flushed only, so the commit at the end skips the refresh
+                with unit_of_work(db):
+                    photo = photo_repo.update_processing_status(
+                        photo_id=photo_id,
+                        status="completed",
+                        detected_attributes=analysis["attributes"],
+                        feature_vector=feature_bytes,
+                    )
+                    pet_id = photo.pet_id
+                # After the commit, the index never holds an uncommitted vector
+                self._refresh_lost_pet_index(db, pet_id)
 
-            self.photo_repo.update_processing_status(
-                photo_id=photo_id,
-                status="completed",
-                detected_attributes=attributes,
-                feature_vector=feature_bytes,
-            )
+            except Exception as e:
+                logger.error(
+                    f"Error processing photo {photo_id}: {str(e)}", exc_info=True
+                )
+                photo_repo.update_processing_status(photo_id=photo_id, status="failed")
 
-        except Exception as e:
-            logger.error(f"Error processing photo {photo_id}: {str(e)}", exc_info=True)
-            self.photo_repo.update_processing_status(photo_id=photo_id, status="failed")
+    def _analyze_photo_file(self, file_path: str) -> Dict[str, Any]:
+        """Analyze a stored photo, reusing the cached analysis of identical bytes"""
+        with open(file_path, "rb") as f:
+            content = f.read()
+        return self.analysis_cache.get_or_analyze(content, self.inference.analyze)
 
     def _process_photo_task(
         self, photo_id: uuid.UUID, file_path: str
@@ -187,52 +246,52 @@ class PetsService:
         Returns:
             Dictionary with processing results
         """
-        try:
-            result = self.cv_service.analyze_image(file_path)
+        with SessionLocal() as db:
+            photo_repo = PetPhotoRepository(db)
+            try:
+                analysis = self._analyze_photo_file(file_path)
 
-            if "error" in result or not result.get("detected_animals"):
-                logger.warning(f"No animals detected or error in photo {photo_id}")
-                self.photo_repo.update_processing_status(
-                    photo_id=photo_id, status="failed"
+                if analysis["species"] is None:
+                    logger.warning(f"No animals detected or error in photo {photo_id}")
+                    photo_repo.update_processing_status(
+                        photo_id=photo_id, status="failed"
+                    )
+                    return {
+                        "success": False,
+                        "reason": "No animals detected or analysis error",
+                    }
+
+                attributes = analysis["attributes"] or {}
+                feature_vector = analysis["feature_vector"]
+                feature_bytes = (
+                    encode_embedding(feature_vector)
+                    if feature_vector is not None
+                    else None
                 )
-                return {
-                    "success": False,
-                    "reason": "No animals detected or analysis error",
-                }
-
-            animal = result["detected_animals"][0]
-            attributes = animal["attributes"]
-
-            cropped_pet, pet_class, _ = self.pet_finder.detect_pet(file_path)
-            feature_bytes = None
 
-            if cropped_pet is not None:
-                feature_vector = self.pet_finder.extract_features(cropped_pet)
-                if feature_vector is not None:
-                    feature_bytes = feature_vector.tobytes()
-
-                self.photo_repo.update_processing_status(
-                    photo_id=photo_id,
-                    status="completed",
-                    detected_attributes=attributes,
-                    feature_vector=feature_bytes,
-                )
+                with unit_of_work(db):
+                    photo = photo_repo.update_processing_status(
+                        photo_id=photo_id,
+                        status="completed",
+                        detected_attributes=attributes,
+                        feature_vector=feature_bytes,
+                    )
+                    pet_id = photo.pet_id
+                # After the commit, the index never holds an uncommitted vector
+                self._refresh_lost_pet_index(db, pet_id)
 
                 return {
                     "success": True,
-                    "species": animal["species"],
+                    "species": analysis["species"],
                     "attributes": attributes,
                 }
-            else:
-                self.photo_repo.update_processing_status(
-                    photo_id=photo_id, status="failed"
-                )
-                return {"success": False, "reason": "Could not crop pet from image"}
 
-        except Exception as e:
-            logger.error(f"Error processing photo {photo_id}: {str(e)}", exc_info=True)
-            self.photo_repo.update_processing_status(photo_id=photo_id, status="failed")
-            return {"success": False, "error": str(e)}
+            except Exception as e:
+                logger.error(
+                    f"Error processing photo {photo_id}: {str(e)}", exc_info=True
+                )
+                photo_repo.update_processing_status(photo_id=photo_id, status="failed")
+                return {"success": False, "error": str(e)}
 
     async def report_found_pet(
         self,
@@ -250,17 +309,20 @@ class PetsService:
             content = await file.read()
             await out_file.write(content)
 
-        cropped_pet, pet_class, attributes = self.pet_finder.detect_pet(absolute_path)
+        # Resolved off the event loop, the first lookup loads the models
+        analysis_cache = await get_model_async(get_analysis_cache)
+        inference = await get_model_async(get_inference_scheduler)
+        analysis = await analysis_cache.get_or_analyze_async(
+            content, inference.analyze_async
+        )
+        attributes = analysis["attributes"]
 
         feature_bytes = None
-        if cropped_pet is not None:
-            feature_vector = self.pet_finder.extract_features(cropped_pet)
-            feature_bytes = (
-                feature_vector.tobytes() if feature_vector is not None else None
-            )
+        if analysis["feature_vector"] is not None:
+            feature_bytes = encode_embedding(analysis["feature_vector"])
 
         photo_url = f"/uploads/{file_path}"
-        found_pet = self.found_pet_repo.create_found_pet(
+        found_pet = await self.found_pet_repo.create_found_pet(
             obj_in=found_pet_in,
             finder_id=finder_id,
             photo_url=photo_url,
@@ -268,8 +330,9 @@ class PetsService:
             detected_attributes=attributes,
             feature_vector=feature_bytes,
         )
+        await self._refresh_found_pet_index_async(found_pet.id)
 
-        if cropped_pet is not None and feature_bytes is not None:
+        if analysis["species"] is not None and feature_bytes is not None:
             if background_tasks:
                 logger.info(
                     f"Scheduling background match finding for found pet {found_pet.id}"
@@ -281,7 +344,10 @@ class PetsService:
                 logger.info(
                     f"Running synchronous match finding for found pet {found_pet.id}"
                 )
-                self._find_matches_for_found_pet(found_pet.id)
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(
+                    _thread_pool, self._find_matches_for_found_pet, found_pet.id
+                )
 
         return found_pet
 
@@ -312,7 +378,9 @@ class PetsService:
                 "completed_at": time.time(),
             }
 
-            await self.notify_about_matches(found_pet_id_uuid, matches)
+            # The request's session is closed once the response is sent
+            async with AsyncSessionLocal() as db:
+                await PetsService(db).notify_about_matches(found_pet_id_uuid, matches)
 
         except Exception as e:
             logger.error(
@@ -328,42 +396,34 @@ class PetsService:
         Find potential matches for a found pet using the CV service
         """
         start_time = time.time()
-        found_pet = self.found_pet_repo.get(id=found_pet_id)
-        if not found_pet or not found_pet.feature_vector:
-            logger.warning(
-                f"Found pet {found_pet_id} not found or has no feature vector"
-            )
-            return []
-
-        lost_pets = self.pet_repo.get_lost_pets(species=found_pet.species, limit=1000)
-
-        target_features: List[Tuple[str, bytes, Dict]] = []
-        for pet in lost_pets:
-            photos = self.photo_repo.get_pet_photos(pet_id=pet.id)
-            if not photos:
-                continue
-
-            main_photo = next((p for p in photos if p.is_main), photos[0])
-            if not main_photo.feature_vector:
-                continue
-
-            target_features.append(
-                (
-                    str(pet.id),
-                    main_photo.feature_vector,
-                    main_photo.detected_attributes or {},
+        # Runs in a worker thread, with a session of its own
+        with SessionLocal() as db:
+            found_pet = FoundPetRepository(db).get_with_vectors(found_pet_id)
+            if not found_pet or not found_pet.feature_vector:
+                logger.warning(
+                    f"Found pet {found_pet_id} not found or has no feature vector"
                 )
-            )
+                return []
 
-        if not target_features:
+            candidates = self._lost_pet_candidates(PetRepository(db), found_pet)
+        if not candidates:
             logger.info(
                 f"No potential matches found for pet {found_pet_id} - no suitable target features"
             )
             return []
 
+        target_features: List[Tuple[str, bytes, Dict]] = [
+            (
+                str(candidate.pet_id),
+                candidate.feature_vector,
+                candidate.detected_attributes or {},
+            )
+            for candidate in candidates
+        ]
+
         location_data = None
         if found_pet.location and any(
-            pet.lost_location for pet in lost_pets if hasattr(pet, "lost_location")
+            candidate.lost_location for candidate in candidates
         ):
             location_data = {
                 "source": None,
@@ -372,13 +432,7 @@ class PetsService:
 
         date_data = None
         if found_pet.found_date:
-            target_dates = []
-            for pet in lost_pets:
-                if hasattr(pet, "lost_date") and pet.lost_date:
-                    target_dates.append(pet.lost_date)
-                else:
-                    target_dates.append(None)
-
+            target_dates = [candidate.lost_date for candidate in candidates]
             if any(target_dates):
                 date_data = {"source": found_pet.found_date, "targets": target_dates}
 
@@ -391,29 +445,22 @@ class PetsService:
             date_data=date_data,
         )
 
+        candidates_by_id = {
+            str(candidate.pet_id): candidate for candidate in candidates
+        }
         potential_matches = []
         for comp in result.get("comparisons", []):
-            target_id = comp.get("target_id")
-            if not target_id:
-                continue
-
-            pet = next((p for p in lost_pets if str(p.id) == target_id), None)
-            if not pet:
+            candidate = candidates_by_id.get(comp.get("target_id"))
+            if not candidate:
                 continue
 
-            photos = self.photo_repo.get_pet_photos(pet_id=pet.id)
-            if not photos:
-                continue
-
-            main_photo = next((p for p in photos if p.is_main), photos[0])
-
             potential_matches.append(
                 {
-                    "pet_id": pet.id,
-                    "name": pet.name,
+                    "pet_id": candidate.pet_id,
+                    "name": candidate.name,
                     "similarity": comp["similarity"]["overall"],
-                    "photo_url": main_photo.url if main_photo else None,
-                    "lost_date": pet.lost_date,
+                    "photo_url": candidate.photo_url,
+                    "lost_date": candidate.lost_date,
                     "matching_features": comp.get("matching_features", []),
                 }
             )
@@ -423,46 +470,87 @@ class PetsService:
         )
         return potential_matches
 
+    def _lost_pet_candidates(self, pet_repo: PetRepository, found_pet) -> List:
+        """
+        Lost pets of the found pet's species worth scoring in full
+
+        With the embedding index these are the CV_INDEX_CANDIDATES visually
+        nearest lost pets out of all of them, otherwise the 1000 most
+        recently lost pets. Each row carries the pet's main photo, see
+        PetRepository.get_lost_pet_candidates.
+        """
+        if not settings.CV_INDEX_ENABLED:
+            return pet_repo.get_lost_pet_candidates(
+                species=found_pet.species, limit=1000
+            )
+
+        hits = self.cv_service.find_candidates(
+            found_pet.species, found_pet.feature_vector
+        )
+        if not hits:
+            return []
+
+        candidates = pet_repo.get_lost_pet_candidates(
+            species=found_pet.species,
+            pet_ids=[uuid.UUID(pet_id) for pet_id, _ in hits],
+        )
+        candidates_by_id = {
+            str(candidate.pet_id): candidate for candidate in candidates
+        }
+        # Keep the index order, pets that stopped being lost are not returned
+        return [
+            candidates_by_id[pet_id] for pet_id, _ in hits if pet_id in candidates_by_id
+        ]
+
+    def _refresh_lost_pet_index(self, db, pet_id: uuid.UUID) -> None:
+        if settings.CV_INDEX_ENABLED:
+            self.lost_pet_index.refresh_pet(db, pet_id)
+
+    async def _refresh_lost_pet_index_async(self, pet_id: uuid.UUID) -> None:
+        if settings.CV_INDEX_ENABLED:
+            # The index reads through a sync session; run_sync awaits its
+            # queries instead of blocking the event loop
+            index = await get_model_async(get_lost_pet_index)
+            await self.db.run_sync(index.refresh_pet, pet_id)
+
+    async def _refresh_found_pet_index_async(self, found_pet_id: uuid.UUID) -> None:
+        if settings.CV_INDEX_ENABLED:
+            index = await get_model_async(get_found_pet_index)
+            await self.db.run_sync(index.refresh_pet, found_pet_id)
+
     async def notify_about_matches(
         self, found_pet_id: uuid.UUID, matches: List[Dict[str, Any]]
     ):
         """
-        Create notifications for potential matches
+        Save the potential matches of a found pet and notify the owners
+
+        All matches are upserted in one statement and the notifications for
+        the new ones inserted in one batch, in one transaction; emails and
+        webhooks go out after its commit.
 
         Args:
             found_pet_id: ID of the found pet
             matches: List of potential matches
         """
-        for match_data in matches:
-            try:
-                existing_match = self.match_repo.get_by_pet_ids(
-                    lost_pet_id=match_data["pet_id"], found_pet_id=found_pet_id
+        try:
+            async with async_unit_of_work(self.db):
+                # Pairs that already have a match are not notified again
+                created = await self.match_repo.upsert_matches(
+                    found_pet_id=found_pet_id, matches=matches
                 )
-
-                if existing_match:
-                    logger.info(
-                        f"Match already exists between lost pet {match_data['pet_id']} and found pet {found_pet_id}"
+                count = (
+                    await self.notification_service.create_match_found_notifications(
+                        matches=created
                     )
-                    continue
-
-                match = self.match_repo.create_match(
-                    lost_pet_id=match_data["pet_id"],
-                    found_pet_id=found_pet_id,
-                    similarity=match_data["similarity"],
-                    matching_features=match_data.get("matching_features", []),
-                )
-
-                await self.notification_service.create_match_found_notification(
-                    match=match
-                )
-                logger.info(
-                    f"Created match notification for lost pet {match_data['pet_id']} and found pet {found_pet_id}"
                 )
+            logger.info(
+                f"Created {len(created)} matches and {count} notifications for found pet {found_pet_id}"
+            )
 
-            except Exception as e:
-                logger.error(
-                    f"Error creating notification for match: {str(e)}", exc_info=True
-                )
+        except Exception as e:
+            logger.error(
+                f"Error creating notifications for matches: {str(e)}", exc_info=True
+            )
 
     def get_background_task_status(self, task_id: str) -> Dict[str, Any]:
         if task_id in _background_tasks:
@@ -1,29 +1,31 @@
 import json
 import hmac
+import asyncio
 import hashlib
 import aiohttp
 import logging
 import uuid
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.repository.webhook import WebhookRepository
+from app.models.webhook import Webhook
+from app.repository.webhook import AsyncWebhookRepository
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
 class WebhookService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.webhook_repo = WebhookRepository(db)
+        self.webhook_repo = AsyncWebhookRepository(db)
 
     async def send_webhook_notification(
         self, *, user_id: uuid.UUID, event_type: str, data: Dict[str, Any]
     ) -> int:
-        webhooks = self.webhook_repo.get_user_webhooks(
+        webhooks = await self.webhook_repo.get_user_webhooks(
             user_id=user_id, active_only=True
         )
 
@@ -36,6 +38,29 @@ class WebhookService:
 
         return success_count
 
+    async def get_subscribed_webhooks(
+        self, *, user_ids: List[uuid.UUID], event_type: str
+    ) -> Dict[uuid.UUID, List[Webhook]]:
+        """Active webhooks of the users subscribed to ``event_type``, by user"""
+        webhooks_by_user: Dict[uuid.UUID, List[Webhook]] = {}
+        for webhook in await self.webhook_repo.get_users_webhooks(
+            user_ids=user_ids, event_type=event_type
+        ):
+            webhooks_by_user.setdefault(webhook.user_id, []).append(webhook)
+        return webhooks_by_user
+
+    async def deliver(
+        self, *, event_type: str, deliveries: List[Tuple[Webhook, Dict[str, Any]]]
+    ) -> int:
+        """Send payloads to already loaded webhooks concurrently, no queries"""
+        results = await asyncio.gather(
+            *(
+                self._send_notification(webhook, event_type, data)
+                for webhook, data in deliveries
+            )
+        )
+        return sum(results)
+
     async def _send_notification(
         self, webhook, event_type: str, data: Dict[str, Any]
     ) -> bool:
@@ -13,4 +13,7 @@ poetry config virtualenvs.create false
 # Install dependencies
 poetry install --without dev 
 
+# Download the offline model bundle (CV_OFFLINE_MODELS)
+python -m app.cv.bundle prepare-models
+
 echo "Build completed successfully"
@@ -1,9 +1,14 @@
 #!/bin/bash
+set -e
 
 DEFAULT_PORT=8000
 
 APP_PORT=${PORT:-$DEFAULT_PORT}
 
+# The API does not create tables itself, bring the schema up to date first
+echo "Running database migrations"
+alembic upgrade head
+
 echo "Starting application on port: $APP_PORT"
 
 exec uvicorn app.main:app --host 0.0.0.0 --port "$APP_PORT"
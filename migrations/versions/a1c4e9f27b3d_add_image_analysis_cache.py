@@ -0,0 +1,50 @@
+"""add image analysis cache
+
+Revision ID: a1c4e9f27b3d
+Revises: 3579eddd8ab3
+Create Date: 2026-10-16 10:12:41.381204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c4e9f27b3d'
+down_revision: Union[str, None] = '3579eddd8ab3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'imageanalysiscache',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model_version', sa.String(), nullable=False),
+        sa.Column('species', sa.String(), nullable=True),
+        sa.Column('confidence', sa.Float(), nullable=True),
+        sa.Column('bounding_box', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('boxes', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('detected_attributes', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('feature_vector', postgresql.BYTEA(), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('last_accessed_at', sa.DateTime(), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash', 'model_version', name='uq_imageanalysiscache_key'),
+    )
+    op.create_index(op.f('ix_imageanalysiscache_id'), 'imageanalysiscache', ['id'], unique=False)
+    op.create_index(op.f('ix_imageanalysiscache_last_accessed_at'), 'imageanalysiscache', ['last_accessed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_imageanalysiscache_last_accessed_at'), table_name='imageanalysiscache')
+    op.drop_index(op.f('ix_imageanalysiscache_id'), table_name='imageanalysiscache')
+    op.drop_table('imageanalysiscache')
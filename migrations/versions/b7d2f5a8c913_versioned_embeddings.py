@@ -0,0 +1,112 @@
+"""versioned embeddings
+
+Revision ID: b7d2f5a8c913
+Revises: a1c4e9f27b3d
+Create Date: 2026-10-16 14:03:27.512930
+
+Rewrites the raw float32 feature vectors of pet photos and found pets in the
+versioned embedding format of app/cv/embedding.py. The format is restated
+here so the migration keeps working when the application code changes.
+
+"""
+import math
+import struct
+from array import array
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2f5a8c913'
+down_revision: Union[str, None] = 'a1c4e9f27b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('petphoto', 'foundpet')
+BATCH_SIZE = 500
+
+MAGIC = b'PEMB'
+HEADER = struct.Struct('<4sBBHI')
+FLOAT32 = 1
+# Every vector stored before this revision came from EfficientNet-B3 weights v1
+LEGACY_MODEL_ID = 'efficientnet_b3-v1'
+
+
+def _little_endian(values: array) -> array:
+    if struct.pack('=f', 1.0) != struct.pack('<f', 1.0):
+        values.byteswap()
+    return values
+
+
+def _encode(data: bytes) -> bytes:
+    values = _little_endian(array('f', data))
+    norm = math.sqrt(sum(value * value for value in values))
+    if math.isfinite(norm) and norm > 0:
+        values = array('f', (value / norm for value in values))
+    model = LEGACY_MODEL_ID.encode()
+    header = HEADER.pack(MAGIC, 1, FLOAT32, len(model), len(values))
+    return header + model + _little_endian(values).tobytes()
+
+
+def _decode(data: bytes) -> bytes:
+    _, _, _, id_length, dim = HEADER.unpack_from(data)
+    start = HEADER.size + id_length
+    return data[start : start + dim * 4]
+
+
+def _is_versioned(data: bytes) -> bool:
+    if data[:4] != MAGIC or len(data) < HEADER.size:
+        return False
+    _, _, dtype, id_length, dim = HEADER.unpack_from(data)
+    return dtype == FLOAT32 and len(data) == HEADER.size + id_length + dim * 4
+
+
+def _rewrite(table: str, convert) -> None:
+    """Convert every feature vector of ``table`` in id order, batch by batch"""
+    bind = op.get_bind()
+    first = sa.text(
+        f'SELECT id, feature_vector FROM {table} '
+        'WHERE feature_vector IS NOT NULL ORDER BY id LIMIT :limit'
+    )
+    following = sa.text(
+        f'SELECT id, feature_vector FROM {table} '
+        'WHERE feature_vector IS NOT NULL AND id > :after ORDER BY id LIMIT :limit'
+    )
+    update = sa.text(f'UPDATE {table} SET feature_vector = :vector WHERE id = :id')
+
+    after = None
+    while True:
+        if after is None:
+            rows = bind.execute(first, {'limit': BATCH_SIZE}).fetchall()
+        else:
+            rows = bind.execute(
+                following, {'after': after, 'limit': BATCH_SIZE}
+            ).fetchall()
+        if not rows:
+            break
+        changes = []
+        for row_id, vector in rows:
+            converted = convert(bytes(vector))
+            if converted is not None:
+                changes.append({'id': row_id, 'vector': converted})
+        if changes:
+            bind.execute(update, changes)
+        after = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        _rewrite(
+            table,
+            lambda data: None if _is_versioned(data) or len(data) % 4 else _encode(data),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Vectors stay unit-normalized, which does not change cosine similarity
+    for table in TABLES:
+        _rewrite(table, lambda data: _decode(data) if _is_versioned(data) else None)
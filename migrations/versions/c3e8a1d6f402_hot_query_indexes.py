@@ -0,0 +1,88 @@
+"""hot query indexes
+
+Revision ID: c3e8a1d6f402
+Revises: b7d2f5a8c913
+Create Date: 2026-10-16 16:41:09.208113
+
+Composite and partial indexes for the list, matching and cleanup queries of
+the repositories. The sort columns are indexed in the order of
+app/repository/pagination.py:keyset_order, so pages are read straight from
+the index. Indexes are built CONCURRENTLY, outside a transaction, so the
+tables stay writable while the migration runs; scripts/check_query_plans.py
+verifies that the queries use them.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1d6f402'
+down_revision: Union[str, None] = 'b7d2f5a8c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns, partial index predicate
+INDEXES = (
+    (
+        'ix_pet_lost_species_lost_date',
+        'pet',
+        ['species', sa.text('lost_date DESC NULLS LAST'), sa.text('id DESC')],
+        "status = 'lost'",
+    ),
+    (
+        'ix_pet_lost_lost_date',
+        'pet',
+        [sa.text('lost_date DESC NULLS LAST'), sa.text('id DESC')],
+        "status = 'lost'",
+    ),
+    (
+        'ix_foundpet_species_found_date',
+        'foundpet',
+        ['species', sa.text('found_date DESC NULLS LAST'), sa.text('id DESC')],
+        None,
+    ),
+    (
+        'ix_foundpet_found_date',
+        'foundpet',
+        [sa.text('found_date DESC NULLS LAST'), sa.text('id DESC')],
+        None,
+    ),
+    (
+        'ix_notification_user_read_created',
+        'notification',
+        ['user_id', 'is_read', sa.text('created_at DESC NULLS LAST'), sa.text('id DESC')],
+        None,
+    ),
+    ('ix_match_lost_pet_found_pet', 'match', ['lost_pet_id', 'found_pet_id'], None),
+    ('ix_match_found_pet_id', 'match', ['found_pet_id'], None),
+    ('ix_petphoto_pet_main', 'petphoto', ['pet_id', 'is_main'], None),
+    ('ix_activetoken_expires_at', 'activetoken', ['expires_at'], None),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,75 @@
+"""unique match pair
+
+Revision ID: d4f9b2e7a815
+Revises: c3e8a1d6f402
+Create Date: 2026-10-16 18:12:37.540921
+
+One match per (lost_pet_id, found_pet_id), so matches can be upserted with
+INSERT ... ON CONFLICT. Duplicate pairs are removed first, keeping the match
+the owner already confirmed or rejected, otherwise the most similar one. The
+unique index is built CONCURRENTLY and then attached as the constraint; it
+replaces the plain ix_match_lost_pet_found_pet index on the same columns.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f9b2e7a815'
+down_revision: Union[str, None] = 'c3e8a1d6f402'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        DELETE FROM match
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY lost_pet_id, found_pet_id
+                ORDER BY status <> 'pending' DESC, similarity DESC, created_at
+            ) AS position
+            FROM match
+        ) AS ranked
+        WHERE match.id = ranked.id AND ranked.position > 1
+        """
+    )
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_match_lost_pet_found_pet',
+            'match',
+            ['lost_pet_id', 'found_pet_id'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.execute(
+            'ALTER TABLE match ADD CONSTRAINT uq_match_lost_pet_found_pet '
+            'UNIQUE USING INDEX uq_match_lost_pet_found_pet'
+        )
+        op.drop_index(
+            'ix_match_lost_pet_found_pet',
+            table_name='match',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_match_lost_pet_found_pet',
+            'match',
+            ['lost_pet_id', 'found_pet_id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+    op.drop_constraint('uq_match_lost_pet_found_pet', 'match', type_='unique')
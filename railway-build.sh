@@ -10,7 +10,13 @@ poetry config virtualenvs.create false
 # Install dependencies
 poetry install --without dev 
 
+# Download the offline model bundle (CV_OFFLINE_MODELS)
+python -m app.cv.bundle prepare-models
+
 # Run migrations
 alembic upgrade head
 
+# Fail the build if a hot query stops using its index
+python scripts/check_query_plans.py
+
 echo "Railway build completed successfully"
\ No newline at end of file
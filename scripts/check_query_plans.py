@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Check that the hot repository queries are planned with their indexes
+
+Usage:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --verbose
+
+Runs each repository method against DATABASE_URL, captures the SQL it sends
+and asserts that the EXPLAIN plan of that SQL scans the index added for it by
+migration c3e8a1d6f402, or d4f9b2e7a815 for the unique match pair. Sequential
+scans are disabled for the check, so the result does not depend on how many
+rows a development database holds.
+Everything runs in one transaction that is rolled back at the end, including
+the commits of the repository methods.
+"""
+import os
+import sys
+import json
+import uuid
+import argparse
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core.database import engine  # noqa: E402
+from app.repository.pet import PetRepository  # noqa: E402
+from app.repository.found_pet import FoundPetRepository  # noqa: E402
+from app.repository.notification import NotificationRepository  # noqa: E402
+from app.repository.match import MatchRepository  # noqa: E402
+from app.repository.user import UserRepository  # noqa: E402
+
+SPECIES = "dog"
+USER_ID = uuid.uuid4()
+
+# description, repository call, index its plan must use
+CHECKS = [
+    (
+        "lost pets of a species",
+        lambda db: PetRepository(db).get_lost_pets(species=SPECIES),
+        "ix_pet_lost_species_lost_date",
+    ),
+    (
+        "lost pets",
+        lambda db: PetRepository(db).get_lost_pets(),
+        "ix_pet_lost_lost_date",
+    ),
+    (
+        "match candidates with main photo",
+        lambda db: PetRepository(db).get_lost_pet_candidates(
+            species=SPECIES, pet_ids=[uuid.uuid4()]
+        ),
+        "ix_petphoto_pet_main",
+    ),
+    (
+        "found pets of a species",
+        lambda db: FoundPetRepository(db).get_found_pets(species=SPECIES),
+        "ix_foundpet_species_found_date",
+    ),
+    (
+        "found pets",
+        lambda db: FoundPetRepository(db).get_found_pets(),
+        "ix_foundpet_found_date",
+    ),
+    (
+        "unread notifications",
+        lambda db: NotificationRepository(db).get_user_notifications(
+            user_id=USER_ID, is_read=False
+        ),
+        "ix_notification_user_read_created",
+    ),
+    (
+        "unread notification count",
+        lambda db: NotificationRepository(db).count_user_notifications(
+            user_id=USER_ID, is_read=False
+        ),
+        "ix_notification_user_read_created",
+    ),
+    (
+        "matches of a pet owner",
+        lambda db: MatchRepository(db).get_user_matches(user_id=USER_ID),
+        "uq_match_lost_pet_found_pet",
+    ),
+    (
+        "matches of a finder",
+        lambda db: MatchRepository(db).get_finder_matches(user_id=USER_ID),
+        "ix_match_found_pet_id",
+    ),
+    (
+        "expired token cleanup",
+        lambda db: UserRepository(db).clean_expired_tokens(),
+        "ix_activetoken_expires_at",
+    ),
+]
+
+
+@contextmanager
+def captured_statements(connection):
+    """SQL statements and parameters executed on ``connection``"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.lstrip().upper().startswith(
+            ("SET", "EXPLAIN", "SAVEPOINT", "RELEASE", "ROLLBACK")
+        ):
+            statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+
+
+def index_names(plan):
+    """Names of all indexes scanned anywhere in an EXPLAIN JSON plan"""
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= index_names(child)
+    return names
+
+
+def explain(connection, statement, parameters):
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {statement}", parameters
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repository query plan check")
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print the indexes of every plan"
+    )
+    args = parser.parse_args()
+
+    failures = []
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            db = Session(bind=connection, join_transaction_mode="create_savepoint")
+            for description, call, index in CHECKS:
+                with captured_statements(connection) as statements:
+                    call(db)
+                used = set()
+                for statement, parameters in statements:
+                    used |= index_names(explain(connection, statement, parameters))
+
+                ok = index in used
+                print(f"  {'ok  ' if ok else 'FAIL'} {description}: {index}")
+                if args.verbose or not ok:
+                    print(f"       plan uses: {', '.join(sorted(used)) or 'no index'}")
+                if not ok:
+                    failures.append(f"{description} does not use {index}")
+            db.close()
+        finally:
+            transaction.rollback()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Measure import-to-ready time of the API process and fail on regressions
+
+Usage:
+    python scripts/startup_benchmark.py [--runs 5] [--max-seconds 3.0]
+    python scripts/startup_benchmark.py --baseline scripts/startup_baseline.json
+    python scripts/startup_benchmark.py --baseline FILE --update-baseline
+
+Each run imports app.main in a fresh interpreter and stops once the FastAPI
+app and its routes exist. The run fails if the median time exceeds
+--max-seconds or the baseline by more than --tolerance, or if importing the
+API pulled in a heavy CV dependency.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported on first CV use, never by the API import itself
+HEAVY_MODULES = ["torch", "torchvision", "sklearn", "matplotlib", "geopy", "cv2"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+routes = len(app.main.app.routes)
+ready = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": ready, "routes": routes, "heavy_modules": heavy}}))
+"""
+
+
+def run_probe():
+    env = dict(os.environ, CV_WARMUP_ON_STARTUP="false")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit("Importing app.main failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=3.0)
+    parser.add_argument("--baseline", help="JSON file with a recorded median")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown over the baseline median (0.25 = 25%%)",
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Record this run's median"
+    )
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    times = [result["seconds"] for result in results]
+    median = statistics.median(times)
+    heavy = sorted({name for result in results for name in result["heavy_modules"]})
+
+    print(f"Import-to-ready over {args.runs} runs:")
+    print(f"  median {median:.3f}s, min {min(times):.3f}s, max {max(times):.3f}s")
+    print(f"  routes registered: {results[-1]['routes']}")
+
+    failures = []
+    if heavy:
+        failures.append(f"heavy CV modules imported at startup: {', '.join(heavy)}")
+    if median > args.max_seconds:
+        failures.append(f"median {median:.3f}s exceeds {args.max_seconds:.3f}s")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"median_seconds": median}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["median_seconds"]
+        limit = baseline * (1 + args.tolerance)
+        print(f"  baseline {baseline:.3f}s, limit {limit:.3f}s")
+        if median > limit:
+            failures.append(
+                f"median {median:.3f}s regressed past baseline {baseline:.3f}s "
+                f"(+{args.tolerance:.0%})"
+            )
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()